@@ -0,0 +1,91 @@
+"""
+Benchmark building triage rows and repository objects, as done for every repository in triage mode and
+every line of the triage sheet in pull mode, and loading a triage sheet of that many rows.
+
+Usage: python -m benchmarks.bench_rows [-n ROWS]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from scm.scm import Repository, Branch
+from utils.output import Output, Row, RowConfiguration, TriageFile
+
+
+def build_rows(count: int) -> list:
+    row_config = RowConfiguration()
+    rows = []
+    for i in range(count):
+        row = Row(row_config)
+        row.name = f"repo{i}"
+        row.owner = 'NullMode'
+        row.pull = ''
+        row.pull_branch_tag = ''
+        row.notes = ''
+        row.empty = False
+        row.archived = False
+        row.fork = i % 2 == 0
+        row.description = 'A repository description'
+        row.forks = i
+        row.open_issues = i
+        row.last_updated = '2024-01-01 12:00:00'
+        row.last_pushed = '2024-01-01 12:00:00'
+        row.url = f"https://github.com/NullMode/repo{i}"
+        row.clone_url = f"https://github.com/NullMode/repo{i}.git"
+        row.default_branch = 'main'
+        row.branch_list = 'main,dev'
+        row.tags = 2
+        row.latest_tag = '0.0.2'
+        rows.append(row)
+    return rows
+
+
+def build_repositories(count: int) -> list:
+    return [Repository(f"repo{i}", 'NullMode', 'main', [Branch('main'), Branch('dev')], False, False, False,
+                       'A repository description', i, '2024-01-01 12:00:00', f"https://github.com/NullMode/repo{i}",
+                       f"https://github.com/NullMode/repo{i}.git", 2, '0.0.2', [], i, '2024-01-01 12:00:00')
+            for i in range(count)]
+
+
+def write_triage_file(path: str, count: int) -> None:
+    row_config = RowConfiguration()
+    output = Output(row_config, path, overwrite=True)
+    for row in build_rows(count):
+        output.add_row(row)
+    output.write()
+
+
+def load_triage_file(path: str) -> list:
+    return TriageFile(path, RowConfiguration()).get_data()
+
+
+def measure(name: str, build, count: int) -> None:
+    # Time without tracemalloc as it slows allocation down
+    start = time.perf_counter()
+    build(count)
+    duration = time.perf_counter() - start
+
+    tracemalloc.start()
+    objects = build(count)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+
+    print(f"{name:<14}{count:>8} {duration:>8.3f}s {memory / 1024 / 1024:>8.1f}MB "
+          f"{duration / count * 1e6:>7.2f}us/object {memory / count:>7.0f}B/object")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--rows', help='Number of rows and repositories to build', type=int, default=50000)
+    args = parser.parse_args()
+
+    measure('Row', build_rows, args.rows)
+    measure('Repository', build_repositories, args.rows)
+    # The sheet is written afresh (before timing) on every run, so it always has the current columns
+    with tempfile.TemporaryDirectory(prefix='codetriage-bench-') as folder:
+        path = os.path.join(folder, 'triage.csv')
+        write_triage_file(path, args.rows)
+        measure('TriageFile', lambda count: load_triage_file(path), args.rows)
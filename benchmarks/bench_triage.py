@@ -0,0 +1,257 @@
+"""
+Benchmark triage against a local fake GitHub (see fake_github.py) serving synthetic organisations, and pull
+against a local git smart HTTP server, saving the results as JSON so versions can be compared.
+
+For each org size and engine this measures triage() wall time, the requests made, the repositories triaged per
+second and the peak memory allocated while triaging (from a second, traced, run). Pull throughput is measured by
+pulling synthetic repositories from the git server with pull().
+
+Usage: python -m benchmarks.bench_triage [--repos 1000 10000] [--engines rest graphql] [--latency 0.02]
+                                         [--rate-limit 5000] [--pull-repos 20] [-o results.json] [--compare old.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+from benchmarks.fake_github import SyntheticOrg, start_server_process, DEFAULT_BRANCHES, DEFAULT_TAGS
+from benchmarks.git_http_server import GitHTTPServer, make_repo
+from codetriage import triage, pull
+from scm.github import Github, ENGINES, ENGINE_REST
+from scm.scm import DEFAULT_MAX_WORKERS, DEFAULT_MAX_IN_FLIGHT
+from utils.output import Output, Row, RowConfiguration
+
+# Default org sizes to triage
+DEFAULT_REPOS = [1000]
+# Default number and size of the repositories pulled
+DEFAULT_PULL_REPOS = 20
+DEFAULT_PULL_COMMITS = 20
+DEFAULT_PULL_JOBS = 4
+# Results are saved here unless another file is given
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def make_scm(base_url: str, engine: str, workers: int, in_flight: int) -> Github:
+    scm = Github()
+    scm.base_url = base_url
+    scm.engine = engine
+    scm.max_workers = workers
+    scm.max_in_flight = in_flight
+    scm.auth_configuration = {'access_token': 'benchmark'}
+    scm.authenticate()
+    return scm
+
+
+def get_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/_stats") as response:
+        return json.load(response)
+
+
+def reset_stats(base_url: str) -> None:
+    urllib.request.urlopen(urllib.request.Request(f"{base_url}/_reset", data=b'', method='POST')).close()
+
+
+def bench_triage(args, repos: int, engine: str, folder: str) -> dict:
+    """
+    Triage a synthetic org of `repos` repositories with the engine, returning the measurements.
+    """
+    org = SyntheticOrg(repos=repos, branches=args.branches, tags=args.tags)
+    process, base_url = start_server_process(org, args.latency, args.rate_limit, args.rate_window)
+    try:
+        output_file = os.path.join(folder, f"triage-{engine}-{repos}.csv")
+        reset_stats(base_url)
+        start = time.perf_counter()
+        triage(org.owner, make_scm(base_url, engine, args.workers, args.in_flight), output_file, format='csv',
+               overwrite=True)
+        duration = time.perf_counter() - start
+        stats = get_stats(base_url)
+
+        # Tracing allocations slows triage down several times over, so memory is measured by a second run
+        peak = 0
+        if args.memory:
+            tracemalloc.start()
+            triage(org.owner, make_scm(base_url, engine, args.workers, args.in_flight), output_file, format='csv',
+                   overwrite=True)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        requests = stats['rest_requests'] + stats['graphql_requests']
+        return {
+            'name': f"triage/{engine}/{repos}",
+            'repos': repos,
+            'engine': engine,
+            'seconds': round(duration, 3),
+            'repos_per_second': round(repos / duration, 1),
+            'requests': requests,
+            'requests_per_repo': round(requests / repos, 2),
+            'rest_requests': stats['rest_requests'],
+            'graphql_requests': stats['graphql_requests'],
+            'rate_limited': stats['rate_limited'],
+            'peak_memory_mb': round(peak / 1024 / 1024, 1),
+        }
+    finally:
+        process.terminate()
+        process.join()
+
+
+def bench_pull(args, folder: str) -> dict:
+    """
+    Pull synthetic repositories from a local git server, returning the measurements.
+    """
+    root = os.path.join(folder, 'git')
+    os.makedirs(root)
+    for index in range(args.pull_repos):
+        make_repo(root, f"repo{index}", {'main': args.pull_commits, 'dev': 2}, {'v1.0': 'main'})
+    server = GitHTTPServer(root)
+    try:
+        row_config = RowConfiguration()
+        triage_file = os.path.join(folder, 'pull.csv')
+        output = Output(row_config, triage_file, overwrite=True)
+        for index in range(args.pull_repos):
+            row = Row(row_config)
+            row.name = f"repo{index}"
+            row.owner = 'BenchOrg'
+            row.pull = 'Y'
+            row.clone_url = f"{server.url}/repo{index}.git"
+            row.default_branch = 'main'
+            output.add_row(row)
+        output.write()
+
+        scm = Github()
+        scm.auth_configuration = {'access_token': 'benchmark'}
+        destination = os.path.join(folder, 'pulled')
+        start = time.perf_counter()
+        results = pull(triage_file, scm, destination, args.pull_jobs)
+        duration = time.perf_counter() - start
+
+        size = sum(os.path.getsize(os.path.join(path, name))
+                   for path, _, names in os.walk(destination) for name in names)
+        return {
+            'name': f"pull/{args.pull_repos}",
+            'repos': args.pull_repos,
+            'jobs': args.pull_jobs,
+            'seconds': round(duration, 3),
+            'repos_per_second': round(args.pull_repos / duration, 2),
+            'megabytes': round(size / 1024 / 1024, 2),
+            'failed': sum(1 for result in results if result.status != 'success'),
+        }
+    finally:
+        server.close()
+
+
+def get_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """
+    Print each benchmark's measurements next to the baseline's, with the change in time.
+    """
+    previous = {benchmark['name']: benchmark for benchmark in baseline['benchmarks']}
+    print(f"\nCompared with {baseline['version']} ({baseline['date']}):")
+    for benchmark in results['benchmarks']:
+        old = previous.get(benchmark['name'])
+        if not old:
+            print(f"{benchmark['name']:<28} new")
+            continue
+        change = (benchmark['seconds'] - old['seconds']) / old['seconds'] * 100 if old['seconds'] else 0
+        line = f"{benchmark['name']:<28} {old['seconds']:>9.3f}s -> {benchmark['seconds']:>9.3f}s {change:>+7.1f}%"
+        if 'requests' in benchmark:
+            line += f"  requests {old['requests']} -> {benchmark['requests']}"
+            line += f"  memory {old['peak_memory_mb']}MB -> {benchmark['peak_memory_mb']}MB"
+        print(line)
+
+
+def run(args) -> dict:
+    results = {
+        'version': get_version(),
+        'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'benchmarks': [],
+    }
+    folder = tempfile.mkdtemp(prefix='codetriage-bench-')
+    try:
+        for repos in args.repos:
+            for engine in args.engines:
+                benchmark = bench_triage(args, repos, engine, folder)
+                results['benchmarks'].append(benchmark)
+                print(f"{benchmark['name']:<28} {benchmark['seconds']:>9.3f}s {benchmark['repos_per_second']:>9.1f} "
+                      f"repos/s {benchmark['requests']:>8} requests {benchmark['peak_memory_mb']:>7.1f}MB peak",
+                      flush=True)
+        if args.pull_repos:
+            benchmark = bench_pull(args, folder)
+            results['benchmarks'].append(benchmark)
+            print(f"{benchmark['name']:<28} {benchmark['seconds']:>9.3f}s {benchmark['repos_per_second']:>9.2f} "
+                  f"repos/s {benchmark['megabytes']:>8.2f}MB {benchmark['failed']} failed", flush=True)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark triage and pull against local fake servers')
+    parser.add_argument('--repos', help='Sizes of the synthetic orgs to triage', type=int, nargs='+',
+                        default=DEFAULT_REPOS)
+    parser.add_argument('--engines', help='Engines to triage with', nargs='+', choices=ENGINES, default=[ENGINE_REST])
+    parser.add_argument('--branches', help='Branches per repository', type=int, default=DEFAULT_BRANCHES)
+    parser.add_argument('--tags', help='Tags per repository', type=int, default=DEFAULT_TAGS)
+    parser.add_argument('--latency', help='Seconds added to every API request', type=float, default=0.0)
+    parser.add_argument('--rate-limit', help='API requests allowed per rate limit window, 0 for no limit', type=int,
+                        default=0)
+    parser.add_argument('--rate-window', help='Seconds until the rate limit resets', type=float, default=60.0)
+    parser.add_argument('-w', '--workers', help='Workers for the rest engine', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--in-flight', help='Requests in flight for the async engine', type=int,
+                        default=DEFAULT_MAX_IN_FLIGHT)
+    parser.add_argument('--pull-repos', help='Repositories to pull, 0 to skip the pull benchmark', type=int,
+                        default=DEFAULT_PULL_REPOS)
+    parser.add_argument('--pull-commits', help='Commits on the main branch of each repository pulled', type=int,
+                        default=DEFAULT_PULL_COMMITS)
+    parser.add_argument('--pull-jobs', help='Repositories pulled at once', type=int, default=DEFAULT_PULL_JOBS)
+    parser.add_argument('--no-memory', help='Do not measure peak memory, which triages each org a second time',
+                        dest='memory', action='store_false')
+    parser.add_argument('-v', '--verbose', help='Keep the per-repository log messages', action='store_true')
+    parser.add_argument('-o', '--output', help=f'File to save the results to, by default in {RESULTS_FOLDER}')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+    # Logging every repository would dominate the time of large orgs. The modules log to the root logger, so it is
+    # quietened for the run and put back after, as main() may be called from other code
+    root_logger = logging.getLogger()
+    level = root_logger.level
+    if not args.verbose:
+        root_logger.setLevel(logging.WARNING)
+    try:
+        results = run(args)
+    finally:
+        root_logger.setLevel(level)
+
+    output = args.output or os.path.join(RESULTS_FOLDER, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['version']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare(results, json.load(file))
+    return results
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,517 @@
+"""
+A local stand-in for the GitHub REST and GraphQL APIs, for benchmarking triage and for the tests, without a token
+or the network. It serves the organisations it holds: a SyntheticOrg generates its repositories from their number
+rather than storing them, so orgs of tens of thousands of repositories cost nothing to set up, while repositories
+added with FakeGithubServer.add_repo are kept in a FakeOrg per owner.
+
+The server can add latency to every request and enforce a rate limit, answering with the same headers (and 403s
+once the budget is spent) as GitHub. GET /_stats returns the number of requests served and POST /_reset clears
+the counts and the budget.
+"""
+import json
+import multiprocessing
+import re
+import threading
+import time
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+# Default size of each synthetic repository
+DEFAULT_BRANCHES = 3
+DEFAULT_TAGS = 5
+# Every this many repositories one is empty, and one is a fork
+EMPTY_EVERY = 50
+FORK_EVERY = 7
+
+
+def make_repo_json(base_url: str, name: str, owner: str = 'NullMode', default_branch: str = 'main',
+                   description: str = None, fork: bool = False, archived: bool = False, forks_count: int = 0,
+                   open_issues_count: int = 0, updated_at: str = '2024-01-01T12:00:00Z',
+                   pushed_at: str = '2024-01-01T12:00:00Z', size: int = 10) -> dict:
+    return {
+        'name': name,
+        'full_name': f"{owner}/{name}",
+        'owner': {'login': owner, 'url': f"{base_url}/users/{owner}"},
+        'default_branch': default_branch,
+        'description': description,
+        'fork': fork,
+        'archived': archived,
+        'forks_count': forks_count,
+        'open_issues_count': open_issues_count,
+        'size': size,
+        'updated_at': updated_at,
+        'pushed_at': pushed_at,
+        'html_url': f"https://github.com/{owner}/{name}",
+        'clone_url': f"https://github.com/{owner}/{name}.git",
+        'url': f"{base_url}/repos/{owner}/{name}",
+    }
+
+
+def sort_tags(names: list, field: str = 'ALPHABETICAL', direction: str = 'ASC') -> list:
+    """
+    Order tag names (given newest first, standing in for their commit dates) as the GraphQL API orders refs.
+    """
+    ordered = list(reversed(names)) if field == 'TAG_COMMIT_DATE' else sorted(names)
+    return ordered[::-1] if direction == 'DESC' else ordered
+
+
+def get_connection(names: list, cursor: str, page_size: int) -> dict:
+    """
+    Return a page of a GraphQL connection of names, with the cursor being the offset of the page.
+    """
+    start = int(cursor) if cursor else 0
+    end = start + page_size
+    return {
+        'totalCount': len(names),
+        'pageInfo': {'hasNextPage': end < len(names), 'endCursor': str(end)},
+        'nodes': [{'name': name} for name in names[start:end]],
+    }
+
+
+class Org:
+    """
+    The repositories of one owner served by a FakeGithubServer, numbered in listing order. Branches are listed in
+    the order they are given, tags newest first.
+    """
+
+    owner = None
+    repos = 0  # Number of repositories
+
+    def get_name(self, number: int) -> str:
+        raise NotImplementedError
+
+    def get_number(self, name: str) -> int:
+        """
+        Return the number of the named repository, or None if the org has no such repository.
+        """
+        raise NotImplementedError
+
+    def get_branches(self, number: int) -> list:
+        raise NotImplementedError
+
+    def get_tags(self, number: int) -> list:
+        raise NotImplementedError
+
+    def get_repo(self, base_url: str, number: int) -> dict:
+        """
+        Return a repository as the REST API's JSON.
+        """
+        raise NotImplementedError
+
+    def get_node(self, base_url: str, number: int, query: str) -> dict:
+        """
+        Return a repository as a GraphQL node with the fields the query asks for.
+        """
+        repo = self.get_repo(base_url, number)
+        branches = self.get_branches(number)
+        empty = not branches
+        node = {
+            'name': repo['name'],
+            'owner': {'login': repo['owner']['login']},
+            'defaultBranchRef': None if empty else {'name': repo['default_branch']},
+            'isArchived': repo['archived'],
+            'isFork': repo['fork'],
+            'isEmpty': empty,
+            'description': repo['description'],
+            'forkCount': repo['forks_count'],
+            'diskUsage': repo['size'],
+            'updatedAt': repo['updated_at'],
+            'pushedAt': repo['pushed_at'],
+            'url': repo['html_url'],
+            'openIssues': {'totalCount': repo['open_issues_count']},
+            'openPullRequests': {'totalCount': 0},
+        }
+        match = re.search(r'branches: refs\(refPrefix: "refs/heads/", first: (\d+)', query)
+        if match:
+            node['branches'] = get_connection(branches, None, int(match[1]))
+        match = re.search(r'tags: refs\(refPrefix: "refs/tags/", first: (\d+)'
+                          r'(?:, orderBy: \{field: (\w+), direction: (\w+)\})?', query)
+        if match:
+            tags = sort_tags(self.get_tags(number), match[2] or 'ALPHABETICAL', match[3] or 'ASC')
+            node['tags'] = {'totalCount': len(tags), 'nodes': [{'name': tag} for tag in tags[:int(match[1])]]}
+        return node
+
+
+class SyntheticOrg(Org):
+    """
+    An organisation of `repos` repositories named repo00000, repo00001... each with `branches` branches and `tags`
+    tags, apart from the empty ones which have neither.
+    """
+
+    def __init__(self, owner: str = 'BenchOrg', repos: int = 1000, branches: int = DEFAULT_BRANCHES,
+                 tags: int = DEFAULT_TAGS):
+        self.owner = owner
+        self.repos = repos
+        self.branches = branches
+        self.tags = tags
+        self.width = max(len(str(repos - 1)), 5)
+
+    def get_name(self, number: int) -> str:
+        return f"repo{number:0{self.width}}"
+
+    def get_number(self, name: str) -> int:
+        match = re.fullmatch(r'repo(\d+)', name)
+        if not match or len(match[1]) != self.width or int(match[1]) >= self.repos:
+            return None
+        return int(match[1])
+
+    def is_empty(self, number: int) -> bool:
+        return number % EMPTY_EVERY == EMPTY_EVERY - 1
+
+    def get_branches(self, number: int) -> list:
+        if self.is_empty(number):
+            return []
+        return ['main'] + [f"branch{index}" for index in range(1, self.branches)]
+
+    def get_tags(self, number: int) -> list:
+        if self.is_empty(number):
+            return []
+        return [f"v1.{index}" for index in range(self.tags, 0, -1)]
+
+    def get_repo(self, base_url: str, number: int) -> dict:
+        return make_repo_json(base_url, self.get_name(number), self.owner,
+                              description=f"Synthetic repository {number}",
+                              fork=number % FORK_EVERY == 0,
+                              forks_count=number % 10,
+                              open_issues_count=number % 5,
+                              size=number % 1000,
+                              updated_at='2024-01-02T12:00:00Z',
+                              pushed_at=None if self.is_empty(number) else '2024-01-02T12:00:00Z')
+
+
+class FakeOrg(Org):
+    """
+    An organisation of repositories added one at a time, with the fields of their REST JSON (see make_repo_json).
+    """
+
+    def __init__(self, owner: str):
+        self.owner = owner
+        self.entries = []  # (name, branches, tags, fields)
+        self.numbers = {}
+
+    @property
+    def repos(self) -> int:
+        return len(self.entries)
+
+    def add_repo(self, name: str, branches: list, tags: list, fields: dict) -> None:
+        self.numbers[name.casefold()] = len(self.entries)
+        self.entries.append((name, list(branches), list(tags), fields))
+
+    def get_name(self, number: int) -> str:
+        return self.entries[number][0]
+
+    def get_number(self, name: str) -> int:
+        return self.numbers.get(name.casefold())
+
+    def get_branches(self, number: int) -> list:
+        return self.entries[number][1]
+
+    def get_tags(self, number: int) -> list:
+        return self.entries[number][2]
+
+    def get_repo(self, base_url: str, number: int) -> dict:
+        name, _, _, fields = self.entries[number]
+        return make_repo_json(base_url, name, self.owner, **fields)
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, without this each response waits on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/_stats':
+            return self.send_json(200, self.server.get_stats(), counted=False)
+        path = unquote(url.path)
+        with self.server.track(path):
+            if not self.server.admit(self):
+                return
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            self.route_rest(path, params)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        path = urlsplit(self.path).path
+        if path == '/_reset':
+            self.server.reset()
+            return self.send_json(200, {}, counted=False)
+        with self.server.track(path):
+            if path not in ('/graphql', '/api/graphql'):
+                return self.send_json(404, {'message': 'Not Found'})
+            if not self.server.admit(self, graphql=True):
+                return
+            request = json.loads(body)
+            with self.server.lock:
+                self.server.queries.append((self.headers.get('Authorization'), request))
+            self.send_json(200, self.resolve_graphql(request['query'], request.get('variables') or {}))
+
+    def route_rest(self, path, params):
+        server = self.server
+        base_url = server.base_url
+
+        match = re.fullmatch(r'/repos/([^/]+/[^/]+)/commits/(.+)', path)
+        if match:
+            commit = server.archives.get(match[1], {}).get(match[2])
+            if not commit:
+                return self.send_json(422 if server.find_repo(*match[1].split('/')) else 404,
+                                      {'message': 'No commit found'})
+            return self.send_json(200, {'sha': commit[0]})
+
+        match = re.fullmatch(r'/repos/([^/]+/[^/]+)/tarball/(.+)', path)
+        if match:
+            # Redirected to a download URL, as the API does
+            self.send_response(302)
+            self.send_header('Location', f"{base_url}/_codeload/{match[1]}/{match[2]}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        match = re.fullmatch(r'/_codeload/([^/]+/[^/]+)/(.+)', path)
+        if match:
+            tarball = next((data for sha, data in server.archives.get(match[1], {}).values() if sha == match[2]),
+                           None)
+            if tarball is None:
+                return self.send_json(404, {'message': 'Not Found'})
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-gzip')
+            self.send_header('Content-Length', str(len(tarball)))
+            self.end_headers()
+            self.wfile.write(tarball)
+            return
+
+        match = re.fullmatch(r'/users/([^/]+)', path)
+        if match:
+            org = server.get_org(match[1])
+            if not org:
+                return self.send_json(404, {'message': 'Not Found'})
+            return self.send_json(200, {'login': org.owner, 'type': 'Organization',
+                                        'url': f"{base_url}/users/{org.owner}"})
+
+        match = re.fullmatch(r'/users/([^/]+)/repos', path)
+        if match:
+            org = server.get_org(match[1])
+            if not org:
+                return self.send_json(404, {'message': 'Not Found'})
+            return self.send_page(path, params, org.repos, lambda number: org.get_repo(base_url, number))
+
+        match = re.fullmatch(r'/repos/([^/]+)/([^/]+)(?:/(branches|tags)(?:/(.+))?)?', path)
+        org, number = server.find_repo(match[1], match[2]) if match else (None, None)
+        if org is None:
+            return self.send_json(404, {'message': 'Not Found'})
+        if not match[3]:
+            return self.send_json(200, org.get_repo(base_url, number))
+
+        # The API lists tags by name, last first
+        names = org.get_branches(number) if match[3] == 'branches' else sorted(org.get_tags(number), reverse=True)
+        if match[4]:
+            if match[3] != 'branches' or match[4] not in names:
+                return self.send_json(404, {'message': 'Branch not found'})
+            return self.send_json(200, {'name': match[4], 'commit': {'sha': '0' * 40}})
+        return self.send_page(path, params, len(names), lambda index: {'name': names[index]})
+
+    def resolve_graphql(self, query, variables):
+        server = self.server
+        if 'repositoryOwner' in query:
+            org = server.get_org(variables['login'])
+            if not org:
+                return {'data': {'repositoryOwner': None}}
+            start = int(variables['cursor']) if variables.get('cursor') else 0
+            end = min(start + variables['pageSize'], org.repos)
+            return {'data': {'repositoryOwner': {'repositories': {
+                'totalCount': org.repos,
+                'pageInfo': {'hasNextPage': end < org.repos, 'endCursor': str(end)},
+                'nodes': [org.get_node(server.base_url, number, query) for number in range(start, end)],
+            }}}}
+
+        if 'repository(' not in query:
+            return {'data': None, 'errors': [{'message': 'Query not supported by the fake server'}]}
+        org, number = server.find_repo(variables['owner'], variables['name'])
+        if org is None:
+            return {'data': {'repository': None}, 'errors': [
+                {'type': 'NOT_FOUND', 'message': f"Could not resolve to a Repository with the name "
+                                                 f"'{variables['owner']}/{variables['name']}'."}]}
+        if '$refPrefix' in query:
+            if variables['refPrefix'] == 'refs/heads/':
+                names = org.get_branches(number)
+            else:
+                names = sort_tags(org.get_tags(number))
+            return {'data': {'repository': {'refs': get_connection(names, variables.get('cursor'),
+                                                                   variables['pageSize'])}}}
+        return {'data': {'repository': org.get_node(server.base_url, number, query)}}
+
+    def send_page(self, path, params, count, get_item):
+        per_page = min(int(params.get('per_page', 30)), 100)
+        page = int(params.get('page', 1))
+        last = max((count + per_page - 1) // per_page, 1)
+        start = (page - 1) * per_page
+        headers = {}
+        if page < last:
+            base = f"{self.server.base_url}{path}?per_page={per_page}"
+            headers['Link'] = f'<{base}&page={page + 1}>; rel="next", <{base}&page={last}>; rel="last"'
+        self.send_json(200, [get_item(index) for index in range(start, min(start + per_page, count))], headers)
+
+    def send_json(self, status, body, headers=None, counted=True):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if counted:
+            for key, value in self.server.get_rate_limit_headers().items():
+                self.send_header(key, value)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGithubServer(ThreadingHTTPServer):
+    """
+    Serves the orgs added to it (an org given here, and the repositories added with add_repo), adding `latency`
+    seconds to every API request and allowing `rate_limit` requests (0 for no limit) per `rate_window` seconds.
+
+    The paths of the API requests served are kept in `requests`, and the GraphQL queries with their Authorization
+    header in `queries`.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, org: Org = None, latency: float = 0.0, rate_limit: int = 0, rate_window: float = 60.0,
+                 port: int = 0):
+        super().__init__(('127.0.0.1', port), FakeGithubHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.orgs = {}
+        if org:
+            self.orgs[org.owner.casefold()] = org
+        self.archives = {}  # owner/name: {ref: (commit, tarball)}
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.lock = threading.Lock()
+        self.thread = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.rest_requests = 0
+            self.graphql_requests = 0
+            self.rate_limited = 0
+            self.used = 0
+            self.reset_at = time.time() + self.rate_window
+            self.requests = []
+            self.queries = []
+            self.active = 0
+            self.peak = 0
+
+    def start(self) -> 'FakeGithubServer':
+        """
+        Serve from a background thread until stop().
+        """
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def add_repo(self, name: str, owner: str = 'NullMode', branches: list = ('main',), tags: list = (),
+                 **fields) -> None:
+        """
+        Add a repository with its branches, tags (newest first) and the fields of its JSON (see make_repo_json).
+        """
+        org = self.orgs.setdefault(owner.casefold(), FakeOrg(owner))
+        org.add_repo(name, branches, tags, fields)
+
+    def add_archive(self, name: str, ref: str, commit: str, tarball: bytes, owner: str = 'NullMode') -> None:
+        self.archives.setdefault(f"{owner}/{name}", {})[ref] = (commit, tarball)
+
+    def get_org(self, owner: str) -> Org:
+        return self.orgs.get(owner.casefold())
+
+    def find_repo(self, owner: str, name: str) -> tuple:
+        """
+        Return the org and number of a repository, (None, None) if there is no such repository.
+        """
+        org = self.get_org(owner)
+        number = org.get_number(name) if org else None
+        return (org, number) if number is not None else (None, None)
+
+    def track(self, path: str):
+        """
+        Return a context manager recording a request to path while it is served.
+        """
+        server = self
+
+        class Tracked:
+            def __enter__(self):
+                with server.lock:
+                    server.requests.append(path)
+                    server.active += 1
+                    server.peak = max(server.peak, server.active)
+
+            def __exit__(self, *exc_info):
+                with server.lock:
+                    server.active -= 1
+                return False
+
+        return Tracked()
+
+    def admit(self, handler: FakeGithubHandler, graphql: bool = False) -> bool:
+        """
+        Count an API request and apply the latency, answering it with a 403 if the rate limit is spent.
+        """
+        with self.lock:
+            if self.rate_limit and time.time() >= self.reset_at:
+                self.used = 0
+                self.reset_at = time.time() + self.rate_window
+            limited = bool(self.rate_limit) and self.used >= self.rate_limit
+            if limited:
+                self.rate_limited += 1
+            else:
+                self.used += 1
+                if graphql:
+                    self.graphql_requests += 1
+                else:
+                    self.rest_requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if limited:
+            handler.send_json(403, {'message': 'API rate limit exceeded'})
+        return not limited
+
+    def get_rate_limit_headers(self) -> dict:
+        if not self.rate_limit:
+            return {}
+        with self.lock:
+            return {'X-RateLimit-Limit': str(self.rate_limit),
+                    'X-RateLimit-Remaining': str(max(self.rate_limit - self.used, 0)),
+                    'X-RateLimit-Reset': str(int(self.reset_at + 0.999))}
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {'rest_requests': self.rest_requests, 'graphql_requests': self.graphql_requests,
+                    'rate_limited': self.rate_limited}
+
+
+def serve(org: SyntheticOrg, latency: float, rate_limit: int, rate_window: float, ready) -> None:
+    server = FakeGithubServer(org, latency, rate_limit, rate_window)
+    ready.put(server.base_url)
+    server.serve_forever()
+
+
+def start_server_process(org: SyntheticOrg, latency: float = 0.0, rate_limit: int = 0,
+                         rate_window: float = 60.0) -> tuple:
+    """
+    Run a FakeGithubServer in a separate process, so serving requests doesn't compete with the code being
+    measured for the GIL. Returns the process and the server's base URL.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(org, latency, rate_limit, rate_window, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=30)
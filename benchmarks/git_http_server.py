@@ -0,0 +1,125 @@
+"""
+A local git smart HTTP server (git http-backend) serving bare repositories, for pulling without the network in the
+pull benchmark and the tests.
+"""
+import os
+import subprocess
+import threading
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+GIT_ENV = {
+    'GIT_AUTHOR_NAME': 'Code Triage',
+    'GIT_AUTHOR_EMAIL': 'codetriage@example.com',
+    'GIT_COMMITTER_NAME': 'Code Triage',
+    'GIT_COMMITTER_EMAIL': 'codetriage@example.com',
+}
+
+
+def git(*args, cwd=None):
+    return subprocess.run(['git', *args], cwd=cwd, env={**os.environ, **GIT_ENV}, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def make_repo(root: str, name: str, branches: dict = None, tags: dict = None) -> str:
+    """
+    Create a bare repository root/name.git with the given branches ({name: commit count}, each branched from the
+    first) and tags ({name: branch}), returning its path.
+    """
+    branches = branches if branches is not None else {'main': 1}
+    work = os.path.join(root, f"{name}-work")
+    git('init', '-q', '-b', next(iter(branches), 'main'), work)
+    first = True
+    for branch, commits in branches.items():
+        if not first:
+            git('checkout', '-q', '-b', branch, next(iter(branches)), cwd=work)
+        for commit in range(commits):
+            with open(os.path.join(work, f"{branch}.txt"), 'a') as file:
+                file.write(f"{branch} {commit}\n")
+            git('add', '.', cwd=work)
+            git('commit', '-q', '-m', f"{branch} {commit}", cwd=work)
+        first = False
+    for tag, branch in (tags or {}).items():
+        git('tag', '-a', tag, '-m', tag, branch, cwd=work)
+
+    bare = os.path.join(root, f"{name}.git")
+    git('clone', '-q', '--bare', work, bare)
+    return bare
+
+
+class GitHTTPHandler(BaseHTTPRequestHandler):
+    """Serves the repositories under project_root over the git smart HTTP protocol through git http-backend."""
+    project_root = None
+
+    def do_GET(self):
+        self.run_backend()
+
+    def do_POST(self):
+        self.run_backend()
+
+    def read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        body = b''
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if not size:
+                self.rfile.readline()
+                return body
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    def run_backend(self):
+        path, _, query = self.path.partition('?')
+        body = self.read_body()
+        env = {
+            **os.environ,
+            'GIT_PROJECT_ROOT': self.project_root,
+            'GIT_HTTP_EXPORT_ALL': '1',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'REQUEST_METHOD': self.command,
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'REMOTE_ADDR': self.client_address[0],
+            'GIT_PROTOCOL': self.headers.get('Git-Protocol', ''),
+        }
+        output = subprocess.run(['git', 'http-backend'], input=body, env=env, capture_output=True).stdout
+        head, _, payload = output.partition(b'\r\n\r\n')
+
+        status = 200
+        headers = []
+        for line in head.decode().split('\r\n'):
+            name, _, value = line.partition(':')
+            if name.lower() == 'status':
+                status = int(value.strip().split()[0])
+            elif name:
+                headers.append((name, value.strip()))
+
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GitHTTPServer:
+    """
+    Runs a GitHTTPHandler server on a free local port in a background thread.
+    """
+
+    def __init__(self, project_root: str):
+        handler = type('Handler', (GitHTTPHandler,), {'project_root': project_root})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
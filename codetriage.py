@@ -1,20 +1,72 @@
-from scm.github import Github
+from scm.github import Github, ENGINES, ENGINE_REST
+from scm.scm import DEFAULT_MAX_WORKERS, DEFAULT_MAX_IN_FLIGHT, UnchangedRepository, PULL_MODES, PULL_MODE_FULL, DEFAULT_SHALLOW_DEPTH, PULL_FILTERS
+from scm.cache import ResponseCache
+from scm.mirror import MirrorCache, DEFAULT_MAX_SIZE as DEFAULT_MIRRORS_MAX_SIZE
+from scm.profiler import profiler
 
 import os
 import argparse
 import csv
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from utils.output import Output, RowConfiguration, Row, TriageFile
+from utils.output import Output, RowConfiguration, Row, TriageFile, REVIEWER_COLUMNS, FORMATS
+from utils.pull import PullJob, PullResult, run_pull_jobs, format_summary, DEFAULT_PULL_JOBS, PULL_SKIPPED
+from utils.plan import PullPlan, format_bytes, ON_NO_SPACE, ON_NO_SPACE_REFUSE, DEFAULT_MIN_FREE
+from utils.journal import PullJournal
+from utils.index import RepositoryIndex, TRACKED_FIELDS
+from utils.config import TargetConfiguration
 
 logging.basicConfig(level=logging.INFO)
 
 CODE_TRIAGE_CONFIG = os.path.expanduser('~/.code-triage')
+CODE_TRIAGE_CACHE = os.path.join(CODE_TRIAGE_CONFIG, 'cache')
+CODE_TRIAGE_INDEX = os.path.join(CODE_TRIAGE_CONFIG, 'index.sqlite')
+CODE_TRIAGE_MIRRORS = os.path.join(CODE_TRIAGE_CONFIG, 'mirrors')
+# Chrome trace written with --profile
+DEFAULT_PROFILE_TRACE = 'codetriage-trace.json'
+# Number of accounts triaged at once in batch mode
+DEFAULT_BATCH_ACCOUNTS = 4
 SCM_CLASS_MAP = {
     'github': Github
 }
 
 
-def triage(owner, scm, output_file='triage2.csv'):
+def make_row(row_config, repo):
+    """
+    Create a triage sheet row for a repository, with the reviewer's columns left blank. Columns filled from
+    details that weren't gathered are left at their defaults.
+    """
+    row = Row(row_config)
+    row.name = repo.name
+    row.owner = repo.owner
+    row.pull = ""
+    row.pull_branch_tag = ""
+    row.notes = ""
+    if repo.is_empty is not None:
+        row.empty = repo.is_empty
+    row.archived = repo.is_archived
+    row.fork = repo.is_fork
+    row.description = repo.description
+    row.forks = repo.forks_count
+    row.open_issues = repo.open_issues_count
+    row.last_updated = repo.updated_at
+    row.last_pushed = repo.pushed_at
+    row.url = repo.url
+    row.clone_url = repo.clone_url
+    row.default_branch = repo.default_branch
+    if repo.size is not None:
+        row.size = repo.size
+    if repo.branches is not None:
+        row.branch_list = ','.join([branch.name for branch in repo.branches])
+    if repo.tag_count is not None:
+        row.tags = repo.tag_count
+        row.latest_tag = repo.latest_tag
+    return row
+
+@profiler.timed('codetriage.triage')
+def triage(owner, scm, output_file='triage2.csv', previous_file=None, format=None, index=None, names=None, overwrite=False, columns=None):
     """
     # If output file exists prompt for overwrite
     if os.path.exists(output_file):
@@ -31,8 +83,26 @@ def triage(owner, scm, output_file='triage2.csv'):
         return
     """
 
-    row_config = RowConfiguration()
-    output = Output(row_config, output_file)
+    # Only the details needed by the columns written are gathered, e.g. without the Branch List, Release Tags,
+    # Latest Tag and Empty columns listing the repositories is all that's needed
+    row_config = RowConfiguration(columns)
+    scm.details = row_config.get_details()
+
+    # In incremental mode only repos changed since the previous triage are refreshed, the previous
+    # sheet is read before the output is opened as they can be the same file
+    previous_rows = {}
+    if previous_file:
+        previous_rows = {row.name: row for row in TriageFile(previous_file, row_config).get_data()
+                         if row.owner.casefold() == owner.casefold()}
+        logging.info(f"Loaded {len(previous_rows)} previously triaged repos from {previous_file}")
+
+    def unchanged(name, updated_at, pushed_at):
+        row = previous_rows.get(name)
+        return row is not None and updated_at <= row.last_updated and pushed_at <= row.last_pushed
+
+    overwrite = overwrite or (previous_file is not None and
+                              os.path.abspath(previous_file) == os.path.abspath(output_file))
+    output = Output(row_config, output_file, format, overwrite=overwrite)
 
     """
     csv_writer = csv.writer(csv_file, dialect='excel')
@@ -59,72 +129,258 @@ def triage(owner, scm, output_file='triage2.csv'):
     """
 
     # Get all repositories for the user/org
-    repos = scm.get_repos(owner)
+    repos = scm.get_repos(owner, unchanged if previous_file else None, names)
 
-    logging.info(f"Writing repo metadata to CSV file: {output_file}...")
+    # Rows are written as each repo's details arrive
+    logging.info(f"Writing repo metadata to {output.format} file: {output_file}...")
     """
     for repo in repos:
         branch_list = ','.join([branch.name for branch in repo.branches])
         csv_writer.writerow([repo.name, repo.owner, "", "", "", repo.is_empty, repo.is_archived, repo.is_fork, repo.description, repo.forks_count, repo.open_issues_count, repo.updated_at, repo.url, repo.clone_url, repo.default_branch, branch_list, repo.tag_count, repo.latest_tag])
     """
 
+    carried = 0
+    refreshed = 0
     for repo in repos:
-        row = Row(row_config)
-        row.name = repo.name
-        row.owner = repo.owner
-        row.pull = ""
-        row.pull_branch_tag = ""
-        row.notes = ""
-        row.empty = repo.is_empty
-        row.archived = repo.is_archived
-        row.fork = repo.is_fork
-        row.description = repo.description
-        row.forks = repo.forks_count
-        row.open_issues = repo.open_issues_count
-        row.last_updated = repo.updated_at
-        row.url = repo.url
-        row.clone_url = repo.clone_url
-        row.default_branch = repo.default_branch
-        row.branch_list = ','.join([branch.name for branch in repo.branches])
-        row.tags = repo.tag_count
-        row.latest_tag = repo.latest_tag
+        # Unchanged repos are carried over from the previous sheet as they are
+        if isinstance(repo, UnchangedRepository):
+            output.add_row(previous_rows.pop(repo.name))
+            if index:
+                index.touch(repo.owner, repo.name)
+            carried += 1
+            continue
+
+        row = make_row(row_config, repo)
+        if index:
+            index.upsert(repo)
+
+        # Keep the reviewer's decisions for repos that changed
+        previous = previous_rows.pop(repo.name, None)
+        if previous:
+            for key in REVIEWER_COLUMNS:
+                setattr(row, key, getattr(previous, key))
+
         output.add_row(row)
+        refreshed += 1
+
+    if previous_file:
+        logging.info(f"Carried over {carried} unchanged repos, refreshed {refreshed}")
+        for name in previous_rows:
+            logging.info(f"Repo no longer exists, removed from triage sheet: {name}")
 
     output.write()
 
-def pull(triage_file, scm, destination_folder):
+def get_account_file(output_file, account):
+    """
+    Return the output file for an account when writing a sheet per account, e.g. triage-papermerge.csv.
+    """
+    stem, extension = os.path.splitext(output_file)
+    return f"{stem}-{account}{extension}"
+
+@profiler.timed('codetriage.batch_triage')
+def batch_triage(targets, scm, output_file, format=None, split=False, index=None, accounts=DEFAULT_BATCH_ACCOUNTS, columns=None):
+    """
+    Triage the targets read from a targets file, several accounts at a time. All accounts share the SCM, so
+    its rate limit scheduler paces the requests of all of them against the one budget.
+
+    :param split: Write a sheet per account (see get_account_file) rather than one merged sheet.
+    :param columns: The columns to write (see RowConfiguration.set_columns), all of them if None.
+    """
+    if split:
+        # Ask about overwriting existing sheets once up front, rather than from each account's thread
+        existing = [get_account_file(output_file, target.account) for target in targets
+                    if os.path.exists(get_account_file(output_file, target.account))]
+        if existing:
+            overwrite = input(f"Files {', '.join(existing)} already exist. Overwrite? (Y/N): ")
+            if overwrite.casefold() not in {'y', 'yes'}:
+                logging.info("Exiting...")
+                exit(1)
+
+        def triage_target(target):
+            triage(target.account, scm, get_account_file(output_file, target.account), format=format, index=index,
+                   names=target.repositories, overwrite=True, columns=columns)
+    else:
+        row_config = RowConfiguration(columns)
+        scm.details = row_config.get_details()
+        output = Output(row_config, output_file, format)
+        lock = threading.Lock()
+
+        def triage_target(target):
+            for repo in scm.get_repos(target.account, names=target.repositories):
+                row = make_row(row_config, repo)
+                with lock:
+                    output.add_row(row)
+                if index:
+                    index.upsert(repo)
+
+    with ThreadPoolExecutor(max_workers=accounts) as executor:
+        list(executor.map(triage_target, targets))
+
+    if not split:
+        output.write()
+        logging.info(f"Wrote {output.row_count} repos from {len(targets)} accounts to {output_file}")
+
+@profiler.timed('codetriage.query')
+def query(index, output_file, format=None, columns=None, **filters):
+    """
+    Export the repositories in the index matching the filters (see RepositoryIndex.query) to a triage sheet.
+    """
+    row_config = RowConfiguration(columns)
+    output = Output(row_config, output_file, format)
+    try:
+        for repo in index.query(**filters):
+            output.add_row(make_row(row_config, repo))
+    except (ValueError, sqlite3.Error) as e:
+        logging.error(f"Invalid query: {e}")
+        exit(1)
+
+    output.write()
+    logging.info(f"Exported {output.row_count} repos from the index to {output_file}")
+
+@profiler.timed('codetriage.pull')
+def pull(triage_file, scm, destination_folder, jobs=DEFAULT_PULL_JOBS, mode=PULL_MODE_FULL, depth=DEFAULT_SHALLOW_DEPTH, sync=False, filter=None, sparse_paths=None, min_free=DEFAULT_MIN_FREE, on_no_space=ON_NO_SPACE_REFUSE, plan_only=False):
     row_config = RowConfiguration()
-    triage_file = TriageFile(triage_file, row_config)
+    triage_file = TriageFile(triage_file, row_config, lazy=True)
 
-    # Download repos
-    for row in triage_file.get_data():
+    # Build the list of repos to download, reading the sheet a row at a time as only marked rows are kept
+    pull_jobs = []
+    for row in triage_file.iter_data():
         if row.pull.casefold() in {'y', 'yes'}:
-            logging.info(f"Pulling repo: {row.name}...")
-
             # Get branch to pull
             branch = row.default_branch
             if row.pull_branch_tag:
                 branch = row.pull_branch_tag
 
-            scm.pull_repo(row.owner, row.name, row.clone_url, branch, destination_folder)
+            # The row's pull mode takes priority over the one for the run
+            row_mode = row.pull_mode.casefold()
+            if row_mode and row_mode not in PULL_MODES:
+                logging.warning(f"Unknown pull mode '{row.pull_mode}' for {row.name}, using {mode}")
+                row_mode = ''
+
+            # As do the row's sparse paths, comma separated
+            row_paths = [path.strip() for path in row.sparse_paths.split(',') if path.strip()]
+
+            pull_jobs.append(PullJob(row.owner, row.name, row.clone_url, branch, row_mode or mode, depth, filter,
+                                     row_paths or sparse_paths, row.size))
+
+    # Check the repos will fit in the destination before pulling any, starting the largest first so no worker
+    # is left with a large repo at the end while the others are idle
+    plan = PullPlan(pull_jobs, destination_folder, jobs, min_free, on_no_space)
+    logging.info(f"Pull plan:\n{plan.format()}")
+    if plan_only:
+        return []
+    if not plan.fits():
+        logging.error(f"Not enough disk space in {destination_folder} to pull {format_bytes(plan.total)}, "
+                      f"{format_bytes(plan.available)} available. Use --on-no-space trim to pull the repos that fit")
+        exit(1)
+
+    # Download repos, each in isolation so one failure doesn't stop the rest, recording progress in
+    # a journal so an interrupted pull can be resumed by running it again. With sync, repos already pulled
+    # are fetched and updated in place rather than skipped
+    journal = PullJournal(destination_folder)
+    results = run_pull_jobs(scm, plan.jobs, destination_folder, jobs, journal, sync)
+    results += [PullResult(job, PULL_SKIPPED, f"Not enough disk space, {format_bytes(plan.estimates[job.name])} "
+                                              f"estimated") for job in plan.skipped]
+    # Report in the order of the sheet
+    order = {job.name: index for index, job in enumerate(pull_jobs)}
+    results.sort(key=lambda result: order[result.job.name])
+    logging.info(f"Pull summary:\n{format_summary(results)}")
+    return results
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('-m', '--mode', help='Mode: triage - create CSV containing repo information, pull - download all repos (use -t for triage sheet where you can specify what to pull)', choices=['triage', 'pull'], required=True)
+    parser.add_argument('-m', '--mode', help='Mode: triage - create CSV containing repo information, pull - download all repos (use -t for triage sheet where you can specify what to pull), query - export repos from the index (--index) to a triage sheet, batch - triage all the accounts in a targets file (--targets), prune - evict mirrors (--mirrors) beyond --mirrors-max-size or unused for --mirrors-max-age days', choices=['triage', 'pull', 'query', 'batch', 'prune'], required=True)
     parser.add_argument('-u', '--user', help='User (or organisation), required for triage mode')
     parser.add_argument('-o', '--output', help='Output file', default='triage.csv')
+    parser.add_argument('-f', '--format', help='Output file format, by default taken from the output file extension (.csv, .xlsx, .jsonl or .parquet), otherwise csv. Triage files are read in the format matching their extension', choices=FORMATS)
     parser.add_argument('-t', '--triage-file', help='Triage file with repo information', default='triage.csv')
     parser.add_argument('-s', '--scm', help='Source control system - only Github is supported at this time', choices=['github'], default='github')
     parser.add_argument('-a', '--access-token', help='Access token - either as a file or the token itself')
     parser.add_argument('-p', '--prompt', help='Prompt for access tokens or credential material', action='store_true')
     parser.add_argument('-d', '--destination', help='Destination folder for pull', default='repos')
+    parser.add_argument('-i', '--incremental', help='Triage mode: only refresh repos changed since the triage file (-t), keeping its Pull, Pull Branch/Tag and Notes columns', action='store_true')
+    parser.add_argument('-e', '--engine', help='Engine used to gather GitHub metadata - graphql fetches a page of repositories per request, async keeps many REST requests in flight from one thread (--in-flight)', choices=ENGINES, default=ENGINE_REST)
+    parser.add_argument('--cache-dir', help='Folder for the API response cache', default=CODE_TRIAGE_CACHE)
+    parser.add_argument('--no-cache', help='Do not cache API responses between runs', action='store_true')
+    parser.add_argument('-w', '--workers', help='Number of repositories to gather information for concurrently', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--in-flight', help='Number of requests in flight at once with the async engine', type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    parser.add_argument('-j', '--jobs', help='Number of repositories to pull at once', type=int, default=DEFAULT_PULL_JOBS)
+    parser.add_argument('--pull-mode', help='Pull mode: full - all history, single-branch - only the branch/tag to pull, shallow - only the latest commits of the branch/tag, tag - only the tag, archive - a snapshot of the files of the branch/tag without git history. Overridden by the Pull Mode column', choices=PULL_MODES, default=PULL_MODE_FULL)
+    parser.add_argument('--targets', help='Batch mode: targets file listing the accounts (and optionally repositories) to triage, see templates/traige_config.toml')
+    parser.add_argument('--split', help='Batch mode: write a sheet per account, named after the output file, rather than one merged sheet', action='store_true')
+    parser.add_argument('--accounts', help='Batch mode: number of accounts to triage at once, the workers (-w) are shared between them', type=int, default=DEFAULT_BATCH_ACCOUNTS)
+    parser.add_argument('--index', help=f'Triage mode: also store the repos in a local index for later queries. Query mode: the index to query (default {CODE_TRIAGE_INDEX})', nargs='?', const=CODE_TRIAGE_INDEX)
+    parser.add_argument('--all-tags', help='Triage and batch modes with --index: also store every tag of each repo in the index, by default only the tag count and latest tag are gathered', action='store_true')
+    parser.add_argument('--archived', help='Query mode: only archived repos', action='store_true', default=None)
+    parser.add_argument('--fork', help='Query mode: only forks', action='store_true', default=None)
+    parser.add_argument('--empty', help='Query mode: only empty repos', action='store_true', default=None)
+    parser.add_argument('--has-branch', help='Query mode: only repos with this branch')
+    parser.add_argument('--has-tag', help='Query mode: only repos with this tag')
+    parser.add_argument('--changed', help='Query mode: only repos where this has changed between triages', choices=TRACKED_FIELDS)
+    parser.add_argument('--where', help='Query mode: an SQL condition on the repositories table, e.g. "forks_count > 10 AND NOT is_fork"')
+    parser.add_argument('--sync', help='Pull mode: update repos already in the destination folder in place, fetching only new commits for the branch/tag to pull', action='store_true')
+    parser.add_argument('--columns', help='Triage, batch and query modes: comma separated columns (keys or labels) to write, e.g. "description,url". The columns needed to pull are always written. Leaving out branch_list, tags, latest_tag and empty saves requests per repo. Batch mode defaults to the targets file columns, otherwise all columns are written')
+    parser.add_argument('--filter', help='Pull mode: partially clone with git, leaving out file contents (blobless) or also directory listings (treeless) until they are needed. Defaults to blobless with sparse paths', choices=list(PULL_FILTERS))
+    parser.add_argument('--sparse', help='Pull mode: comma separated paths (patterns as in .gitignore, e.g. "src/,!*.png") to check out with git sparse-checkout, making a partial clone. Overridden by the Sparse Paths column')
+    parser.add_argument('--mirrors', help=f'Pull mode: fetch each repo into a local mirror of its upstream shared by all its forks, and clone from it, so history common to forks and earlier pulls is downloaded and stored once. Prune mode: the mirrors to prune (default {CODE_TRIAGE_MIRRORS})', nargs='?', const=CODE_TRIAGE_MIRRORS)
+    parser.add_argument('--mirrors-max-size', help='Pull and prune modes: gigabytes the mirrors can take up before the least recently used are evicted, copying the objects clones need out of them first', type=float, default=DEFAULT_MIRRORS_MAX_SIZE / 1024 ** 3)
+    parser.add_argument('--mirrors-max-age', help='Prune mode: also evict mirrors unused for this many days', type=float)
+    parser.add_argument('--plan', help='Pull mode: only show the pull plan - the repos in the order they would be pulled (largest first) with the disk space they are estimated to take, from the Size column - without pulling', action='store_true')
+    parser.add_argument('--min-free', help='Pull mode: gigabytes to leave free in the destination folder, the pull is refused (or trimmed, see --on-no-space) if the repos are estimated not to fit', type=float, default=DEFAULT_MIN_FREE / 1024 ** 3)
+    parser.add_argument('--on-no-space', help='Pull mode: when the repos are estimated not to fit in the destination folder, refuse to pull or trim the plan, leaving out the largest repos until the rest fit', choices=ON_NO_SPACE, default=ON_NO_SPACE_REFUSE)
+    parser.add_argument('--profile', help=f'Time the run (listing, branches, tags, emptiness checks, rate limit waits, reading and writing sheets, pulls) and count API requests and bytes, writing a Chrome trace (chrome://tracing or ui.perfetto.dev) to the file given (default {DEFAULT_PROFILE_TRACE}) and logging the slowest calls and repos', nargs='?', const=DEFAULT_PROFILE_TRACE)
+    parser.add_argument('--depth', help='Number of commits to fetch in shallow pull mode', type=int, default=DEFAULT_SHALLOW_DEPTH)
     args = parser.parse_args()
 
+    if args.profile:
+        profiler.enable()
+
+    columns = [column.strip() for column in args.columns.split(',') if column.strip()] if args.columns else None
+    targets = []
+    if args.mode == "batch":
+        if not args.targets:
+            logging.error("A targets file (--targets) is required for batch mode")
+            exit(1)
+        if args.accounts < 1:
+            logging.error("--accounts must be at least 1")
+            exit(1)
+        target_configuration = TargetConfiguration(args.targets, tuple(SCM_CLASS_MAP))
+        targets = target_configuration.targets
+        if columns is None:
+            columns = target_configuration.columns
+
+    if columns is not None:
+        try:
+            RowConfiguration(columns)
+        except ValueError as e:
+            logging.error(str(e))
+            exit(1)
+
     # Setup target SCM system
     scm_class = SCM_CLASS_MAP[args.scm]
     scm = scm_class()
+    if args.workers < 1:
+        logging.error("--workers must be at least 1")
+        exit(1)
+    if args.in_flight < 1:
+        logging.error("--in-flight must be at least 1")
+        exit(1)
+    if args.jobs < 1:
+        logging.error("--jobs must be at least 1")
+        exit(1)
+    scm.max_workers = args.workers
+    scm.max_in_flight = args.in_flight
+    if targets:
+        # Share the workers (and requests in flight) between the accounts triaged at once
+        scm.max_workers = max(1, args.workers // min(args.accounts, len(targets)))
+        scm.max_in_flight = max(1, args.in_flight // min(args.accounts, len(targets)))
+    scm.engine = args.engine
+    scm.list_tags = args.all_tags and bool(args.index)
 
-    if args.mode in ['triage', 'pull']:
+    if args.mode in ['triage', 'pull', 'batch']:
+        # Only the modes with an API client use the cache, it's hooked into the client by authenticate
+        if not args.no_cache:
+            scm.cache = ResponseCache(os.path.join(args.cache_dir, 'responses.sqlite'))
         scm.set_auth_configuration(args)
         scm.authenticate()
 
@@ -133,8 +389,49 @@ if __name__ == '__main__':
             logging.error("User (-u/--user) is required for triage mode")
             exit(1)
 
-        triage(args.user, scm, args.output)
+        index = RepositoryIndex(args.index) if args.index else None
+        triage(args.user, scm, args.output, args.triage_file if args.incremental else None, args.format, index,
+               columns=columns)
+        if index:
+            index.close()
+
+    elif args.mode == "batch":
+        index = RepositoryIndex(args.index) if args.index else None
+        batch_triage(targets, scm, args.output, args.format, args.split, index, args.accounts, columns)
+        if index:
+            index.close()
+
+    elif args.mode == "query":
+        index_path = args.index or CODE_TRIAGE_INDEX
+        if not os.path.exists(index_path):
+            logging.error(f"Index {index_path} does not exist, create it with -m triage --index")
+            exit(1)
+        index = RepositoryIndex(index_path)
+        query(index, args.output, args.format, columns, owner=args.user, archived=args.archived, fork=args.fork,
+              empty=args.empty, branch=args.has_branch, tag=args.has_tag, changed=args.changed, where=args.where)
+        index.close()
 
     elif args.mode == "pull":
-        pull(args.triage_file, scm, args.destination)
+        if args.mirrors:
+            scm.mirrors = MirrorCache(args.mirrors, int(args.mirrors_max_size * 1024 ** 3))
+        sparse_paths = [path.strip() for path in args.sparse.split(',') if path.strip()] if args.sparse else None
+        pull(args.triage_file, scm, args.destination, args.jobs, args.pull_mode, args.depth, args.sync, args.filter,
+             sparse_paths, int(args.min_free * 1024 ** 3), args.on_no_space, args.plan)
+        if scm.mirrors:
+            scm.mirrors.close()
+
+    elif args.mode == "prune":
+        mirrors = MirrorCache(args.mirrors or CODE_TRIAGE_MIRRORS)
+        max_age = args.mirrors_max_age * 24 * 60 * 60 if args.mirrors_max_age is not None else None
+        evicted = mirrors.prune(int(args.mirrors_max_size * 1024 ** 3), max_age)
+        logging.info(f"Pruned {len(evicted)} mirrors, {mirrors.size() / 1024 ** 3:.2f}GB left in {mirrors.folder}")
+        mirrors.close()
+
+    if scm.cache:
+        logging.info(f"Response cache: {scm.cache.hits} revalidated, {scm.cache.misses} fetched")
+        scm.cache.close()
+
+    if args.profile:
+        profiler.write_trace(args.profile)
+        logging.info(f"Profile written to {args.profile}:\n{profiler.format_summary()}")
 
@@ -0,0 +1,90 @@
+from .scm import ARCHIVE_FILE
+
+import json
+import os
+import shutil
+import tarfile
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Bytes copied at a time from the archive to each file
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UnsafeArchiveError(tarfile.TarError):
+    """
+    Raised when an archive entry would be written outside the folder it is extracted into.
+    """
+
+
+def get_member_path(name: str) -> str:
+    """
+    Return an archive entry's path relative to the snapshot, dropping the <owner>-<repo>-<sha>/ folder GitHub
+    puts everything in, or None for that folder itself.
+    """
+    parts = name.replace('\\', '/').split('/')[1:]
+    path = os.path.normpath('/'.join(part for part in parts if part))
+    if path == '.':
+        return None
+    if os.path.isabs(path) or path.split(os.sep)[0] == '..' or ':' in path.split(os.sep)[0]:
+        raise UnsafeArchiveError(f"Archive entry {name} is outside the archive")
+    return path
+
+
+def extract_tarball(stream, destination: str) -> int:
+    """
+    Extract a gzipped tarball from a stream as it's read, without holding the archive in memory or on disk.
+    Only directories, regular files and symbolic links pointing inside destination are extracted, other
+    entries (devices, hard links) are skipped. Returns the number of files extracted.
+
+    :raises UnsafeArchiveError: If an entry would be written outside destination.
+    :raises tarfile.TarError: If the archive is corrupt.
+    """
+    root = os.path.realpath(destination)
+    os.makedirs(root, exist_ok=True)
+    files = 0
+    with tarfile.open(fileobj=stream, mode='r|gz') as archive:
+        for member in archive:
+            path = get_member_path(member.name)
+            if path is None:
+                continue
+            target = os.path.join(root, path)
+            # A symbolic link extracted earlier could point a parent folder elsewhere
+            if not (os.path.realpath(os.path.dirname(target)) + os.sep).startswith(root + os.sep):
+                raise UnsafeArchiveError(f"Archive entry {member.name} is outside the archive")
+
+            if member.isdir():
+                os.makedirs(target, exist_ok=True)
+            elif member.isfile():
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.extractfile(member) as source, open(target, 'wb') as file:
+                    shutil.copyfileobj(source, file, COPY_BUFFER_SIZE)
+                os.chmod(target, 0o755 if member.mode & 0o111 else 0o644)
+                files += 1
+            elif member.issym():
+                link = os.path.realpath(os.path.join(os.path.dirname(target), member.linkname))
+                if os.path.isabs(member.linkname) or not (link + os.sep).startswith(root + os.sep):
+                    logging.warning(f"Skipping link {path} pointing outside the archive: {member.linkname}")
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.symlink(member.linkname, target)
+            else:
+                logging.warning(f"Skipping archive entry {path} of an unsupported type")
+    return files
+
+
+def write_archive_file(destination: str, ref: str, commit: str) -> None:
+    with open(os.path.join(destination, ARCHIVE_FILE), 'w', encoding='utf-8') as file:
+        json.dump({'ref': ref, 'commit': commit}, file)
+
+
+def read_archive_file(destination: str) -> dict:
+    """
+    Return the ref and commit an archive snapshot was downloaded from, or None if the folder isn't one.
+    """
+    try:
+        with open(os.path.join(destination, ARCHIVE_FILE), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
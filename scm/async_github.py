@@ -0,0 +1,373 @@
+from .scm import AsyncSCM, Repository, UnchangedRepository, Branch, Tag, format_datetime
+from .scm import PULL_MODE_FULL, DEFAULT_SHALLOW_DEPTH, DEFAULT_MAX_IN_FLIGHT
+from .scm import DETAIL_BRANCHES, DETAIL_TAGS, DETAIL_EMPTY
+from .github import Github, READ_AHEAD_FACTOR, REST_PAGE_SIZE
+from .ratelimit import RateLimitScheduler
+from .profiler import profiler
+from github import Consts
+from github.GithubException import GithubException, RateLimitExceededException, UnknownObjectException
+from datetime import datetime
+from collections import deque
+from urllib.parse import quote, urlsplit, parse_qs
+
+import asyncio
+import functools
+import importlib
+import sys
+import threading
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Seconds to wait for a response from the REST API
+REQUEST_TIMEOUT = 30
+# Headers of a cached response that describe how it was sent rather than its body, which is stored decoded
+TRANSPORT_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+class AsyncGithub(AsyncSCM):
+    """
+    Gathers GitHub repository metadata from the REST API with httpx, keeping up to max_in_flight requests in
+    flight over one pooled client. Requests are paced by the same rate limit scheduler as the threaded engine.
+
+    Requires httpx (poetry install --extras async).
+    """
+
+    def __init__(self, token: str = None, base_url: str = Consts.DEFAULT_BASE_URL,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, scheduler: RateLimitScheduler = None, git: Github = None):
+        super().__init__(max_in_flight)
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.client = None
+        self.semaphore = None
+        self.cache = None  # ResponseCache to revalidate GET responses with, None to always fetch from the API
+
+        # Clones are made by pygit2, which blocks, so pull_repo runs them on the loop's executor with the
+        # synchronous implementation
+        if git is None:
+            git = Github()
+            git.base_url = self.base_url
+            git.auth_configuration = {'access_token': token}
+        self.git = git
+
+    async def open(self) -> None:
+        try:
+            httpx = importlib.import_module('httpx')
+        except ImportError:
+            logging.error("The async engine requires httpx, install it with: poetry install --extras async")
+            sys.exit(1)
+
+        headers = {'Accept': 'application/vnd.github+json', 'User-Agent': 'code-triage'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        self.client = httpx.AsyncClient(base_url=self.base_url, headers=headers, limits=limits,
+                                        timeout=REQUEST_TIMEOUT)
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def close(self) -> None:
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, url: str, params: dict = None):
+        """
+        Make a GET request, raising the PyGithub exception for the status of an error response so errors are
+        handled (and rate limits backed off) the same way as with the threaded engine.
+
+        With a response cache, responses with an ETag or Last-Modified are stored and revalidated with a
+        conditional request, which doesn't count against the rate limit when the response is unchanged.
+        """
+        request = self.client.build_request('GET', url, params=params)
+        key = entry = None
+        if self.cache is not None:
+            key = self.cache.get_key(str(request.url), request.headers)
+            # The cache is an sqlite database, so it is read and written on a thread rather than blocking the loop
+            entry = await asyncio.to_thread(self.cache.get, key)
+            if entry and entry.etag:
+                request.headers['If-None-Match'] = entry.etag
+            if entry and entry.last_modified:
+                request.headers['If-Modified-Since'] = entry.last_modified
+
+        async with self.semaphore:
+            with profiler.span('api.request'):
+                response = await self.client.send(request)
+        self.scheduler.update(response.status_code, response.headers)
+        if profiler.enabled:
+            profiler.count('api.requests')
+            profiler.count('api.bytes', len(response.content))
+
+        if self.cache is not None:
+            if response.status_code == 304 and entry:
+                await asyncio.to_thread(self.cache.touch, key)
+                # Keep the fresh rate limit headers from the 304 on top of the cached ones
+                headers = {name: value for name, value in {**entry.headers, **response.headers}.items()
+                           if name.lower() not in TRANSPORT_HEADERS}
+                return type(response)(200, headers=headers, content=entry.body.encode(), request=request)
+            self.cache.miss()
+            if response.status_code == 200:
+                await asyncio.to_thread(self.cache.put, key, str(request.url), response.headers, response.text)
+
+        if response.status_code >= 400:
+            try:
+                data = response.json()
+            except ValueError:
+                data = {'message': response.text}
+            headers = dict(response.headers)
+            if response.status_code == 404:
+                raise UnknownObjectException(response.status_code, data, headers)
+            if response.status_code in (403, 429) and response.headers.get('x-ratelimit-remaining') == '0':
+                raise RateLimitExceededException(response.status_code, data, headers)
+            raise GithubException(response.status_code, data, headers)
+        return response
+
+    async def get(self, url: str, params: dict = None):
+        return await self.scheduler.call_async(self.request, url, params)
+
+    async def get_pages(self, url: str, params: dict = None):
+        """
+        Yield the items of a paginated listing, requesting the next page once the items of one are used.
+        """
+        params = dict(params or {}, per_page=REST_PAGE_SIZE)
+        while url:
+            response = await self.get(url, params)
+            for item in response.json():
+                yield item
+            url = response.links.get('next', {}).get('url')
+            params = None  # The next page's URL has the parameters
+
+    async def get_repos(self, user, unchanged=None, names=None):
+        """
+        Gather metadata for all repositories of a user or organisation, see Github.get_repos. The details of up to
+        READ_AHEAD_FACTOR * max_in_flight repositories are requested at once, and repositories are yielded in
+        listing order.
+        """
+        window = deque()
+        max_window = self.max_in_flight * READ_AHEAD_FACTOR
+        try:
+            async for count, repo in self.iter_listing(user, names):
+                if repo is None:
+                    continue
+                if unchanged and unchanged(repo['name'], self.get_str_datetime(repo['updated_at']),
+                                           self.get_str_datetime(repo['pushed_at'])):
+                    logging.info(f"Skipping unchanged repo: {repo['name']}...({count})")
+                    window.append(UnchangedRepository(repo['name'], repo['owner']['login']))
+                else:
+                    self.scheduler.add_pending()
+                    window.append(asyncio.ensure_future(self.get_repo_details(repo, count)))
+
+                while window and (len(window) >= max_window or not isinstance(window[0], asyncio.Future) or
+                                  window[0].done()):
+                    yield await self.get_result(window.popleft())
+
+            while window:
+                yield await self.get_result(window.popleft())
+        finally:
+            # Stop requesting details when the caller stops early
+            for task in window:
+                if isinstance(task, asyncio.Future):
+                    task.cancel()
+
+        self.scheduler.log_progress(force=True)
+
+    async def iter_listing(self, user, names=None):
+        """
+        Yield (count, repository JSON) for each repository listed for the user, or looked up by name (None for
+        names that weren't found).
+        """
+        if names is None:
+            try:
+                count = 0
+                async for repo in self.get_pages(f"/users/{quote(user)}/repos"):
+                    count += 1
+                    yield count, repo
+            except UnknownObjectException:
+                logging.error(f"User or organisation not found: {user}")
+            return
+
+        # Look the names up concurrently, yielding them in the order given
+        lookups = [asyncio.ensure_future(self.get_named_repo(user, name)) for name in names]
+        try:
+            for count, lookup in enumerate(lookups, start=1):
+                yield count, await lookup
+        finally:
+            for lookup in lookups:
+                lookup.cancel()
+
+    async def get_named_repo(self, user, name: str):
+        try:
+            return (await self.get(f"/repos/{quote(user)}/{quote(name)}")).json()
+        except UnknownObjectException:
+            logging.error(f"Repository not found: {user}/{name}")
+            return None
+
+    @staticmethod
+    async def get_result(result):
+        return await result if isinstance(result, asyncio.Future) else result
+
+    @profiler.timed('github.get_repo_details', lambda self, repo, *args, **kwargs: repo['name'])
+    async def get_repo_details(self, repo: dict, count: int = 1) -> Repository:
+        try:
+            logging.info(f"Processing repo: {repo['name']}...({count})")
+            requests = {}
+            if DETAIL_BRANCHES in self.details:
+                requests[DETAIL_BRANCHES] = self.get_repo_branches(repo)
+            if DETAIL_TAGS in self.details:
+                requests[DETAIL_TAGS] = self.get_tags_info(repo)
+            results = dict(zip(requests, await asyncio.gather(*requests.values())))
+
+            branches = results.get(DETAIL_BRANCHES)
+            tag_count, latest_tag = results.get(DETAIL_TAGS, (None, None))
+            is_empty = None
+            if DETAIL_EMPTY in self.details:
+                is_empty = await self.is_repo_empty(repo, branches)
+            tags = self.iter_tags(repo) if self.list_tags and tag_count is not None else None
+        finally:
+            self.scheduler.task_done()
+
+        return Repository(repo['name'],
+                          repo['owner']['login'],
+                          repo['default_branch'],
+                          branches,
+                          is_empty,
+                          repo['archived'],
+                          repo['fork'],
+                          str(repo['description']),  # Description can be None, force to string
+                          repo['forks_count'],
+                          self.get_str_datetime(repo['updated_at']),
+                          repo['html_url'],
+                          Github.get_clone_url(repo['clone_url']),
+                          tag_count,
+                          latest_tag,
+                          tags,
+                          repo['open_issues_count'],
+                          self.get_str_datetime(repo['pushed_at']),
+                          repo['size']
+        )
+
+    @profiler.timed('github.get_branches', lambda self, repo, *args, **kwargs: repo['name'])
+    async def get_repo_branches(self, repo: dict) -> list:
+        logging.info(f"Gathering branch information for {repo['name']}...")
+        return [Branch(branch['name']) async for branch in self.get_pages(f"/repos/{repo['full_name']}/branches")]
+
+    @profiler.timed('github.get_tags_info', lambda self, repo, *args, **kwargs: repo['name'])
+    async def get_tags_info(self, repo: dict) -> tuple:
+        """
+        Return a repository's tag count and latest tag from a single request for a page of one tag, whose last
+        page link gives the count.
+        """
+        logging.info(f"Gathering tag information for {repo['name']}...")
+        try:
+            response = await self.get(f"/repos/{repo['full_name']}/tags", {'per_page': 1})
+        except RateLimitExceededException:
+            raise
+        except GithubException as e:
+            logging.error(f"An error getting tags for {repo['name']}: {e}")
+            return 0, ""
+
+        tags = response.json()
+        last_page = response.links.get('last', {}).get('url')
+        count = int(parse_qs(urlsplit(last_page).query)['page'][0]) if last_page else len(tags)
+        return count, tags[0]['name'] if tags else ""
+
+    async def iter_tags(self, repo: dict):
+        """
+        Yield every tag of a repository, requesting a page at a time as the tags are used.
+        """
+        try:
+            async for tag in self.get_pages(f"/repos/{repo['full_name']}/tags"):
+                yield Tag(tag['name'])
+        except GithubException as e:
+            logging.error(f"An error listing the tags of {repo['name']}: {e}")
+
+    @profiler.timed('github.is_repo_empty', lambda self, repo, *args, **kwargs: repo['name'])
+    async def is_repo_empty(self, repo: dict, branches: list = None) -> bool:
+        """
+        Whether a repository has no commits, see Github.is_repo_empty.
+        """
+        if branches is not None:
+            return not branches
+
+        try:
+            await self.get(f"/repos/{repo['full_name']}/branches/{quote(repo['default_branch'])}")
+            return False
+        except RateLimitExceededException:
+            raise
+        except UnknownObjectException:
+            return True
+        except GithubException as e:
+            logging.error(f"An error checking whether {repo['name']} is empty: {e}")
+            return False
+
+    async def pull_repo(self, owner: str, repo_name: str, clone_url: str, branch: str, destination_folder: str,
+                        mode: str = PULL_MODE_FULL, depth: int = DEFAULT_SHALLOW_DEPTH, filter: str = None,
+                        sparse_paths: list = None) -> bool:
+        """
+        Clone a repository on the event loop's executor, see Github.pull_repo. Clones count against max_in_flight
+        like requests do.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            return await loop.run_in_executor(None, functools.partial(
+                self.git.pull_repo, owner, repo_name, clone_url, branch, destination_folder, mode, depth,
+                filter=filter, sparse_paths=sparse_paths))
+
+    @staticmethod
+    def get_str_datetime(date: str) -> str:
+        return format_datetime(datetime.fromisoformat(date) if date else None)
+
+
+class EventLoopThread:
+    """
+    Runs an event loop on a background thread, so synchronous code can await coroutines and iterate async
+    generators on it. Tasks started on the loop keep running between the calls made from the caller's thread.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine):
+        """
+        Run a coroutine on the loop and return its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def iterate(self, async_iterator):
+        """
+        Yield the items of an async iterator as they are produced on the loop.
+        """
+        while True:
+            try:
+                yield self.run(async_iterator.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def close(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def iter_repos_sync(async_scm: AsyncSCM, user, unchanged=None, names=None):
+    """
+    Synchronous facade over AsyncSCM.get_repos for callers of SCM.get_repos, e.g. triage(). The async SCM is
+    opened and closed on an event loop thread, and tag lists (with list_tags) are iterated on it too, so they
+    must be used before the next repository is requested.
+    """
+    runner = EventLoopThread()
+    try:
+        runner.run(async_scm.open())
+        repos = async_scm.get_repos(user, unchanged, names)
+        try:
+            for repo in runner.iterate(repos):
+                if isinstance(repo, Repository) and repo.tags is not None:
+                    repo.tags = runner.iterate(repo.tags)
+                yield repo
+        finally:
+            runner.run(repos.aclose())
+    finally:
+        runner.run(async_scm.close())
+        runner.close()
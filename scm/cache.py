@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Entries not stored or used within this many seconds are evicted
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+# Once the cache grows beyond this many bytes the least recently used entries are evicted
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT NOT NULL,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at);
+"""
+
+
+class CacheEntry:
+    def __init__(self, etag: str, last_modified: str, headers: dict, body: str):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.headers = headers
+        self.body = body
+
+
+class ResponseCache:
+    """
+    On-disk (SQLite) store of API responses that carry an ETag or Last-Modified header, so later runs can
+    revalidate them with conditional requests. GitHub does not count 304 Not Modified responses against the
+    rate limit, so unchanged data costs nothing from the budget.
+    """
+
+    def __init__(self, path: str, max_age: float = DEFAULT_MAX_AGE, max_size: int = DEFAULT_MAX_SIZE):
+        self.path = path
+        self.max_age = max_age
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self.evict()
+
+    @staticmethod
+    def get_key(url: str, headers: dict) -> str:
+        """
+        Key entries on the URL and the credentials used, as different tokens can see different data.
+        """
+        authorization = next((value for key, value in headers.items() if key.lower() == 'authorization'), '')
+        return hashlib.sha256(f"{authorization}\n{url}".encode()).hexdigest()
+
+    def get(self, key: str) -> CacheEntry:
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified, headers, body FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+        if not row:
+            return None
+        return CacheEntry(row[0], row[1], json.loads(row[2]), row[3])
+
+    def put(self, key: str, url: str, headers: dict, body: str) -> None:
+        headers = dict(headers)
+        lowered = {name.lower(): value for name, value in headers.items()}
+        etag = lowered.get('etag')
+        last_modified = lowered.get('last-modified')
+        if not etag and not last_modified:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             (key, url, etag, last_modified, json.dumps(headers), body, len(body), now, now))
+            self._db.commit()
+
+    def touch(self, key: str) -> None:
+        """
+        Mark an entry as still valid (revalidated with a 304) and recently used.
+        """
+        now = time.time()
+        with self._lock:
+            self.hits += 1
+            self._db.execute("UPDATE responses SET stored_at = ?, used_at = ? WHERE key = ?", (now, now, key))
+            self._db.commit()
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict(self) -> None:
+        """
+        Remove entries older than max_age, then the least recently used entries until under max_size.
+        """
+        with self._lock:
+            expired = self._db.execute("DELETE FROM responses WHERE stored_at < ?",
+                                       (time.time() - self.max_age,)).rowcount
+
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            evicted = 0
+            if total > self.max_size:
+                for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY used_at").fetchall():
+                    if total <= self.max_size:
+                        break
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    total -= size
+                    evicted += 1
+            self._db.commit()
+
+        if expired or evicted:
+            logging.info(f"Evicted {expired} expired and {evicted} least recently used entries from {self.path}")
+
+    def close(self) -> None:
+        self.evict()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,129 @@
+from github.Requester import Requester, RequestsResponse, HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass
+
+from .profiler import profiler
+
+import threading
+
+# Connection classes are injected into PyGithub's Requester class, so clients are created one at a time
+_client_lock = threading.Lock()
+
+
+class CachedResponse:
+    """
+    A response served from the response cache, mimicking PyGithub's RequestsResponse.
+    """
+
+    def __init__(self, status: int, headers: dict, text: str):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.text
+
+
+class ThreadSafeConnectionMixin:
+    """
+    PyGithub's connection classes keep the request passed to request() on the instance and only send it
+    in getresponse(), so a single persistent connection cannot be shared between worker threads. This
+    mixin keeps the pending request per thread and sends it through the shared (pooled) requests session.
+
+    When a response cache is set, GET requests for cached URLs are sent as conditional requests and a
+    304 Not Modified is answered from the cache. The hooks and cache belong to one client, see
+    get_connection_classes.
+    """
+
+    # Callables given the status and headers of every response, e.g. to track the rate limit
+    response_hooks = ()
+    cache = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = threading.local()
+
+    def request(self, verb: str, url: str, input: any, headers: dict) -> None:
+        self._pending.request = (verb, url, input, headers)
+
+    def getresponse(self) -> RequestsResponse:
+        verb, url, input, headers = self._pending.request
+        self._pending.request = None
+        return self.send(verb, url, input, headers)
+
+    def send(self, verb: str, url: str, input: any, headers: dict) -> RequestsResponse:
+        cache = self.cache
+        if cache is None or verb != 'GET':
+            return self.send_request(verb, url, input, headers)
+
+        key = cache.get_key(url, headers)
+        entry = cache.get(key)
+        if entry:
+            headers = dict(headers)
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        response = self.send_request(verb, url, input, headers)
+        if response.status == 304 and entry:
+            cache.touch(key)
+            # Keep the fresh rate limit headers from the 304 on top of the cached ones
+            return CachedResponse(200, {**entry.headers, **response.headers}, entry.body)
+
+        cache.miss()
+        if response.status == 200:
+            cache.put(key, url, response.headers, response.text)
+        return response
+
+    def send_request(self, verb: str, url: str, input: any, headers: dict) -> RequestsResponse:
+        with profiler.span('api.request'):
+            r = self.session.request(
+                verb,
+                f"{self.protocol}://{self.host}:{self.port}{url}",
+                headers=headers,
+                data=input,
+                timeout=self.timeout,
+                verify=self.verify,
+                allow_redirects=False,
+            )
+        if profiler.enabled:
+            profiler.count('api.requests')
+            profiler.count('api.bytes', len(r.content))
+        for hook in self.response_hooks:
+            hook(r.status_code, r.headers)
+        return RequestsResponse(r)
+
+
+class ThreadSafeHTTPConnection(ThreadSafeConnectionMixin, HTTPRequestsConnectionClass):
+    pass
+
+
+class ThreadSafeHTTPSConnection(ThreadSafeConnectionMixin, HTTPSRequestsConnectionClass):
+    pass
+
+
+def get_connection_classes(response_hooks: list = (), cache=None) -> tuple:
+    """
+    Return HTTP and HTTPS connection classes for one client, giving the status and headers of every response to
+    the hooks and caching GET responses in the ResponseCache (None to always fetch from the API).
+    """
+    attributes = {'response_hooks': tuple(response_hooks), 'cache': cache}
+    return (type('ClientHTTPConnection', (ThreadSafeHTTPConnection,), attributes),
+            type('ClientHTTPSConnection', (ThreadSafeHTTPSConnection,), attributes))
+
+
+def create_client(factory, response_hooks: list = (), cache=None):
+    """
+    Create a PyGithub client by calling factory, with its requests sent through connection classes of its own
+    (see get_connection_classes). PyGithub picks the connection class when a client is created, so the classes
+    are only injected while it is and the defaults restored after, leaving other clients untouched.
+    """
+    http_class, https_class = get_connection_classes(response_hooks, cache)
+    with _client_lock:
+        Requester.injectConnectionClasses(http_class, https_class)
+        try:
+            return factory()
+        finally:
+            Requester.resetConnectionClasses()
@@ -1,22 +1,130 @@
-from .scm import SCM, Repository, Branch, Tag
+from .scm import SCM, Repository, UnchangedRepository, Branch, Tag, PullError, PullSkipped
+from .scm import PULL_MODE_FULL, PULL_MODE_SHALLOW, PULL_MODE_TAG, PULL_MODE_ARCHIVE, DEFAULT_SHALLOW_DEPTH
+from .scm import PULL_FILTER_BLOBLESS, PULL_FILTERS
+from .scm import DETAIL_BRANCHES, DETAIL_TAGS, DETAIL_EMPTY, DEFAULT_MAX_IN_FLIGHT
+from .connection import create_client
+from .graphql import GraphQLClient, GraphQLError
+from .ratelimit import RateLimitScheduler
+from .archive import extract_tarball, write_archive_file, read_archive_file
+from .profiler import profiler
 from github import Auth
+from github import Consts
 from github import Github as gh
-from github.GithubException import GithubException
+from github.GithubException import GithubException, RateLimitExceededException, UnknownObjectException
 from sys import exit
+from datetime import datetime
 from pygit2 import GitError
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import nullcontext
+from collections import deque
+from requests.adapters import DEFAULT_POOLSIZE
+from urllib3 import Retry
 
+import base64
+import requests
 import shutil
+import subprocess
+import tarfile
 import os
 import logging
 import pygit2
 
 logging.basicConfig(level=logging.INFO)
 
+# Engines that can be used to gather repository metadata
+ENGINE_REST = 'rest'
+ENGINE_GRAPHQL = 'graphql'
+ENGINE_ASYNC = 'async'  # REST from an asyncio event loop, see async_github.py
+ENGINES = [ENGINE_REST, ENGINE_GRAPHQL, ENGINE_ASYNC]
+
+# Repositories listed ahead of the one being yielded, per worker, in REST get_repos
+READ_AHEAD_FACTOR = 4
+
+# Number of repositories (and refs per repository) requested per GraphQL page, 100 is the API maximum
+GRAPHQL_PAGE_SIZE = 100
+# Number of items per page of REST listings (repositories, branches, tags), 100 is the API maximum
+REST_PAGE_SIZE = 100
+# Seconds to wait for the archive download to start, or between reads of it
+ARCHIVE_TIMEOUT = 60
+
+GRAPHQL_REPO_FIELDS = """
+    name
+    owner { login }
+    defaultBranchRef { name }
+    isArchived
+    isFork
+    isEmpty
+    description
+    forkCount
+    diskUsage
+    updatedAt
+    pushedAt
+    url
+    openIssues: issues(states: OPEN) { totalCount }
+    openPullRequests: pullRequests(states: OPEN) { totalCount }
+"""
+
+# Repository fields only requested when their detail is gathered. The latest tag is the last by name, the first tag the
+# REST API lists, so every engine reports the same one
+GRAPHQL_DETAIL_FIELDS = {
+    DETAIL_BRANCHES: """
+    branches: refs(refPrefix: "refs/heads/", first: %d) {
+        totalCount
+        pageInfo { hasNextPage endCursor }
+        nodes { name }
+    }
+""" % GRAPHQL_PAGE_SIZE,
+    DETAIL_TAGS: """
+    tags: refs(refPrefix: "refs/tags/", first: 1, orderBy: {field: ALPHABETICAL, direction: DESC}) {
+        totalCount
+        nodes { name }
+    }
+""",
+}
+
+GRAPHQL_REPOS_QUERY = """
+query($login: String!, $cursor: String, $pageSize: Int!) {
+    repositoryOwner(login: $login) {
+        repositories(first: $pageSize, after: $cursor, ownerAffiliations: [OWNER],
+                     orderBy: {field: NAME, direction: ASC}) {
+            totalCount
+            pageInfo { hasNextPage endCursor }
+            nodes { %s }
+        }
+    }
+}
+"""
+
+GRAPHQL_REPO_QUERY = """
+query($owner: String!, $name: String!) {
+    repository(owner: $owner, name: $name) { %s }
+}
+"""
+
+GRAPHQL_REFS_QUERY = """
+query($owner: String!, $name: String!, $refPrefix: String!, $cursor: String, $pageSize: Int!) {
+    repository(owner: $owner, name: $name) {
+        refs(refPrefix: $refPrefix, first: $pageSize, after: $cursor) {
+            pageInfo { hasNextPage endCursor }
+            nodes { name }
+        }
+    }
+}
+"""
+
 
 class Github(SCM):
     def __init__(self):
         super().__init__()
         self._scm = 'github'
+        self.base_url = Consts.DEFAULT_BASE_URL
+        self.engine = ENGINE_REST
+        self.graphql = None
+        self.scheduler = RateLimitScheduler()
+        self.cache = None  # ResponseCache for REST responses, None to always fetch from the API
+        self.max_in_flight = DEFAULT_MAX_IN_FLIGHT  # Requests in flight at once with the async engine
+        self.mirrors = None  # MirrorCache clones borrow objects from, None to clone every repository in full
+        self.networks = {}  # Network (upstream owner/name) of each repository pulled, see get_network
 
     @staticmethod
     def authentication_options() -> list:
@@ -28,66 +136,358 @@ class Github(SCM):
             exit(1)
 
         if 'access_token' in self.auth_configuration:
-            self.client = gh(auth=Auth.Token(self.auth_configuration['access_token']))
+            # Repo details are fetched from a pool of workers sharing one client, with every response feeding
+            # this instance's rate limit scheduler (and cache). Only retry server errors at the HTTP level, rate
+            # limits are handled by the scheduler so waiting for them is visible rather than PyGithub silently
+            # sleeping. For the same reason PyGithub's fixed delay between requests is turned off, it would hold
+            # every worker to a few requests a second
+            self.client = create_client(
+                lambda: gh(auth=Auth.Token(self.auth_configuration['access_token']),
+                           base_url=self.base_url,
+                           per_page=REST_PAGE_SIZE,
+                           pool_size=max(self.max_workers, DEFAULT_POOLSIZE),
+                           seconds_between_requests=None,
+                           retry=Retry(total=5, backoff_factor=1, status_forcelist=(500, 502, 503, 504),
+                                       raise_on_status=False)),
+                [self.scheduler.update], self.cache)
+            self.graphql = GraphQLClient(self.graphql_url, self.auth_configuration['access_token'])
+            self.graphql.response_hooks.append(self.scheduler.update)
+
+    @property
+    def graphql_url(self) -> str:
+        # GitHub Enterprise serves REST from /api/v3 and GraphQL from /api/graphql
+        base_url = self.base_url.rstrip('/')
+        if base_url.endswith('/v3'):
+            base_url = base_url[:-len('/v3')]
+        return f"{base_url}/graphql"
+
+    @profiler.timed('github.get_repos')
+    def get_repos(self, user, unchanged=None, names=None):
+        """
+        Gather metadata for all repositories of a user or organisation.
+
+        :param user: The user or organisation to list repositories for.
+        :param unchanged: Optional callable given a repository's name, updated at and pushed at timestamps, returning
+                          True if the repository is known to be unchanged. Details are not fetched for those repositories,
+                          an UnchangedRepository is yielded in their place.
+        :param names: Optional list of repository names, only these repositories are fetched (by name rather than
+                      listing all of the user's repositories). Names that are not found are logged and skipped.
+        :return: A generator of Repository (or UnchangedRepository) objects in listing order, each yielded as soon as
+                 it and the repositories before it are ready.
+        """
+        if self.engine == ENGINE_GRAPHQL:
+            yield from self.get_repos_graphql(user, unchanged, names)
+            return
+        if self.engine == ENGINE_ASYNC:
+            yield from self.get_repos_async(user, unchanged, names)
+            return
+
+        if names is None:
+            # The listing goes through the scheduler too, so a rate limited page is backed off and retried
+            listing = self.scheduler.call(self.client.get_user, user).get_repos()
+            total = self.scheduler.call(lambda: listing.totalCount)
+            repos = self.iter_pages(listing)
+        else:
+            repos = names
+            total = len(names)
+
+        # Per-repo details (branches, tags, emptiness) are fetched by a bounded pool of workers, paced by
+        # the rate limit scheduler. Results are yielded in submission order so the output order matches the
+        # listing, and the listing is only read ahead by a window of repos so memory doesn't grow with the org.
+        # Listed repos need no requests of their own when none of those details are gathered
+        window = deque()
+        max_window = self.max_workers * READ_AHEAD_FACTOR
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for count, repo in enumerate(repos, start=1):
+                if names is not None:
+                    self.scheduler.add_pending()
+                    window.append(executor.submit(self.scheduler.run, self.get_named_repo_details, user, repo,
+                                                  unchanged, count, total))
+                elif unchanged and unchanged(repo.name, self.get_str_datetime(repo.updated_at),
+                                             self.get_str_datetime(repo.pushed_at)):
+                    logging.info(f"Skipping unchanged repo: {repo.name}...({count}/{total})")
+                    window.append(UnchangedRepository(repo.name, repo.owner.login))
+                elif not self.details:
+                    window.append(self.get_repo_details(repo, count, total))
+                else:
+                    self.scheduler.add_pending()
+                    window.append(executor.submit(self.scheduler.run, self.get_repo_details, repo, count, total))
+
+                while window and (len(window) >= max_window or not isinstance(window[0], Future) or
+                                  window[0].done()):
+                    result = self.get_result(window.popleft())
+                    if result:
+                        yield result
+
+            while window:
+                result = self.get_result(window.popleft())
+                if result:
+                    yield result
+
+        self.scheduler.log_progress(force=True)
 
-    def get_repos(self, user) -> list:
-        repos = self.client.get_user(user).get_repos()
-        return_repos = []
+    def iter_pages(self, paginated_list):
+        """
+        Yield the items of a PyGithub PaginatedList, requesting each page through the rate limit scheduler.
+        """
+        page = 0
+        while True:
+            items = self.scheduler.call(paginated_list.get_page, page)
+            yield from items
+            if len(items) < REST_PAGE_SIZE:
+                return
+            page += 1
 
-        count = 1
-        for repo in repos:
-            logging.info(f"Processing repo: {repo.name}...({count}/{repos.totalCount})")
+    def get_repos_async(self, user, unchanged=None, names=None):
+        """
+        Gather repository metadata with AsyncGithub, which keeps up to max_in_flight requests in flight from one
+        event loop rather than a request per worker thread.
+        """
+        # Imported here as the async engine builds on this module (and needs httpx)
+        from .async_github import AsyncGithub, iter_repos_sync
+
+        async_scm = AsyncGithub(self.auth_configuration.get('access_token'), self.base_url, self.max_in_flight,
+                                self.scheduler, self)
+        async_scm.details = self.details
+        async_scm.list_tags = self.list_tags
+        async_scm.cache = self.cache
+        yield from iter_repos_sync(async_scm, user, unchanged, names)
+
+    def get_named_repo_details(self, user, name: str, unchanged=None, count: int = 1, total: int = 1) -> Repository:
+        """
+        Look up a repository by name and gather its details, returning None if it doesn't exist.
+        """
+        try:
+            repo = self.client.get_repo(f"{user}/{name}")
+        except UnknownObjectException:
+            logging.error(f"Repository not found: {user}/{name}")
+            return None
+
+        if unchanged and unchanged(repo.name, self.get_str_datetime(repo.updated_at),
+                                   self.get_str_datetime(repo.pushed_at)):
+            logging.info(f"Skipping unchanged repo: {repo.name}...({count}/{total})")
+            return UnchangedRepository(repo.name, repo.owner.login)
+        return self.get_repo_details(repo, count, total)
+
+    @staticmethod
+    def get_result(result):
+        return result.result() if isinstance(result, Future) else result
+
+    @profiler.timed('github.get_repo_details', lambda self, repo, *args, **kwargs: repo.name)
+    def get_repo_details(self, repo, count: int = 1, total: int = 1) -> Repository:
+        logging.info(f"Processing repo: {repo.name}...({count}/{total})")
+        branches = tag_count = latest_tag = tags = is_empty = None
+        if DETAIL_BRANCHES in self.details:
             logging.info(f"Gathering branch information for {repo.name}...")
-            tmp_branches = repo.get_branches()
+            with profiler.span('github.get_branches', repo.name):
+                branches = [Branch(branch.name) for branch in repo.get_branches()]
+        if DETAIL_TAGS in self.details:
             logging.info(f"Gathering tag information for {repo.name}...")
-            tag_count, latest_tag, tags = self.get_tags_info(repo)
-            branches = []
-            for branch in tmp_branches:
-                branches.append(Branch(branch.name))
-
-            # TODO will need to support SSH clone URLs
-            if repo.clone_url.startswith("https://") and not repo.clone_url.endswith(".git"):
-               clone_url = f"{repo.clone_url}.git"
-            else:
-               clone_url = repo.clone_url
-
-            return_repos.append(
-                Repository(repo.name,
-                           repo.owner.login,
-                           repo.default_branch,
-                           branches,
-                           self.is_repo_empty(repo),
-                           repo.archived,
-                           repo.fork,
-                           str(repo.description),  # Description can be None, force to string
-                           repo.forks_count,
-                           self.get_str_datetime(repo.updated_at),
-                           repo.html_url,
-                           clone_url,
-                           tag_count,
-                           latest_tag,
-                           tags,
-                           repo.open_issues_count
-               )
-            )
-            count += 1
-        return return_repos
-
-    def is_repo_empty(self, repo) -> bool:
+            tag_count, latest_tag = self.get_tags_info(repo)
+            if self.list_tags:
+                tags = self.iter_tags(repo)
+        if DETAIL_EMPTY in self.details:
+            is_empty = self.is_repo_empty(repo, branches)
+
+        return Repository(repo.name,
+                          repo.owner.login,
+                          repo.default_branch,
+                          branches,
+                          is_empty,
+                          repo.archived,
+                          repo.fork,
+                          str(repo.description),  # Description can be None, force to string
+                          repo.forks_count,
+                          self.get_str_datetime(repo.updated_at),
+                          repo.html_url,
+                          self.get_clone_url(repo.clone_url),
+                          tag_count,
+                          latest_tag,
+                          tags,
+                          repo.open_issues_count,
+                          self.get_str_datetime(repo.pushed_at),
+                          repo.size
+        )
+
+    def get_repos_graphql(self, user, unchanged=None, names=None):
+        """
+        Gather repository metadata using the GraphQL API, pulling a page of repositories (with their
+        branches, tag count and latest tag) per request instead of several REST calls per repository.
+        Repositories are yielded a page at a time. With names, each repository is requested by name instead.
+        """
+        if names is not None:
+            for count, name in enumerate(names, start=1):
+                try:
+                    data = self.scheduler.call(self.graphql.query, GRAPHQL_REPO_QUERY % self.graphql_fields,
+                                               {'owner': user, 'name': name})
+                except GraphQLError as e:
+                    if 'NOT_FOUND' not in e.types:
+                        raise
+                    data = {'repository': None}
+                node = data['repository']
+                if not node:
+                    logging.error(f"Repository not found: {user}/{name}")
+                    continue
+
+                if unchanged and unchanged(node['name'], self.get_str_graphql_datetime(node['updatedAt']),
+                                           self.get_str_graphql_datetime(node['pushedAt'])):
+                    logging.info(f"Skipping unchanged repo: {node['name']}...({count}/{len(names)})")
+                    yield UnchangedRepository(node['name'], node['owner']['login'])
+                    continue
+
+                logging.info(f"Processing repo: {node['name']}...({count}/{len(names)})")
+                yield self.get_repo_details_graphql(node)
+            self.scheduler.log_progress(force=True)
+            return
+
+        cursor = None
+        page = 1
+        count = 0
+
+        while True:
+            logging.info(f"Requesting page {page} of repositories for {user}...")
+            data = self.scheduler.call(self.graphql.query, GRAPHQL_REPOS_QUERY % self.graphql_fields,
+                                       {'login': user, 'cursor': cursor, 'pageSize': GRAPHQL_PAGE_SIZE})
+            if not data['repositoryOwner']:
+                logging.error(f"User or organisation not found: {user}")
+                return
+
+            repositories = data['repositoryOwner']['repositories']
+            for node in repositories['nodes']:
+                count += 1
+                progress = f"({count}/{repositories['totalCount']})"
+                if unchanged and unchanged(node['name'], self.get_str_graphql_datetime(node['updatedAt']),
+                                           self.get_str_graphql_datetime(node['pushedAt'])):
+                    logging.info(f"Skipping unchanged repo: {node['name']}...{progress}")
+                    yield UnchangedRepository(node['name'], node['owner']['login'])
+                    continue
+
+                logging.info(f"Processing repo: {node['name']}...{progress}")
+                yield self.get_repo_details_graphql(node)
+
+            if not repositories['pageInfo']['hasNextPage']:
+                self.scheduler.log_progress(force=True)
+                return
+            cursor = repositories['pageInfo']['endCursor']
+            page += 1
+
+    @property
+    def graphql_fields(self) -> str:
+        """
+        The repository fields to request, leaving out the connections for details that aren't gathered.
+        """
+        return GRAPHQL_REPO_FIELDS + ''.join(fields for detail, fields in GRAPHQL_DETAIL_FIELDS.items()
+                                             if detail in self.details)
+
+    @profiler.timed('github.get_repo_details', lambda self, node: node['name'])
+    def get_repo_details_graphql(self, node: dict) -> Repository:
+        branches = None
+        if 'branches' in node:
+            branches = [Branch(branch['name']) for branch in node['branches']['nodes']]
+            page_info = node['branches']['pageInfo']
+        else:
+            page_info = {'hasNextPage': False}
+
+        # Only repositories with more branches than fit in one page need further requests
+        if page_info['hasNextPage']:
+            branches.extend(Branch(name) for name in self.iter_refs_graphql(
+                node['owner']['login'], node['name'], 'refs/heads/', page_info['endCursor']))
+
+        tag_count = latest_tag = tags = None
+        if 'tags' in node:
+            tag_count = node['tags']['totalCount']
+            latest_tag = node['tags']['nodes'][0]['name'] if node['tags']['nodes'] else ""
+            if self.list_tags:
+                tags = (Tag(name) for name in self.iter_refs_graphql(node['owner']['login'], node['name'],
+                                                                      'refs/tags/'))
+        if node['defaultBranchRef']:
+            default_branch = node['defaultBranchRef']['name']
+        else:
+            default_branch = self.get_default_branch(node['owner']['login'], node['name'])
+
+        return Repository(node['name'],
+                          node['owner']['login'],
+                          default_branch,
+                          branches,
+                          # Emptiness is part of the listing, so it's known even when not asked for
+                          node['isEmpty'],
+                          node['isArchived'],
+                          node['isFork'],
+                          str(node['description']),  # Description can be None, force to string
+                          node['forkCount'],
+                          self.get_str_graphql_datetime(node['updatedAt']),
+                          node['url'],
+                          f"{node['url']}.git",
+                          tag_count,
+                          latest_tag,
+                          tags,
+                          # Match the REST open_issues_count, which includes pull requests
+                          node['openIssues']['totalCount'] + node['openPullRequests']['totalCount'],
+                          self.get_str_graphql_datetime(node['pushedAt']),
+                          node['diskUsage']
+        )
+
+    def iter_refs_graphql(self, owner: str, name: str, prefix: str, cursor: str = None):
+        """
+        Yield the names of a repository's refs under prefix (e.g. refs/tags/), from the page after cursor onwards,
+        requesting a page at a time as the names are used.
+        """
+        while True:
+            data = self.scheduler.call(self.graphql.query, GRAPHQL_REFS_QUERY,
+                                       {'owner': owner, 'name': name, 'refPrefix': prefix, 'cursor': cursor,
+                                        'pageSize': GRAPHQL_PAGE_SIZE})
+            refs = data['repository']['refs']
+            yield from (ref['name'] for ref in refs['nodes'])
+            if not refs['pageInfo']['hasNextPage']:
+                return
+            cursor = refs['pageInfo']['endCursor']
+
+    def get_default_branch(self, owner: str, name: str) -> str:
+        """
+        Look up a repository's default branch through the REST API. GraphQL has no default branch ref for an empty
+        repository, while REST reports the branch its first push will create, so both engines write the same row.
+        """
         try:
-            # Check if the repository size is zero
-            if repo.size == 0:
-                return True
-            # Check if the repository has any branches
-            branches = repo.get_branches()
-            if branches.totalCount == 0:
-                return True
-            # If the repository has branches, check if it has any commits
-            if repo.get_commits().totalCount == 0:
-                return True
+            return self.scheduler.call(self.client.get_repo, f"{owner}/{name}").default_branch
+        except RateLimitExceededException:
+            raise
+        except GithubException as e:
+            logging.error(f"An error getting the default branch of {name}: {e}")
+            return ""
+
+    def get_str_graphql_datetime(self, date: str) -> str:
+        return self.get_str_datetime(datetime.fromisoformat(date) if date else None)
+
+    @staticmethod
+    def get_clone_url(clone_url: str) -> str:
+        """
+        Return the URL to clone a repository from, given the clone URL the REST API reports for it.
+        """
+        # TODO will need to support SSH clone URLs
+        if clone_url.startswith("https://") and not clone_url.endswith(".git"):
+            return f"{clone_url}.git"
+        return clone_url
+
+    @profiler.timed('github.is_repo_empty', lambda self, repo, *args, **kwargs: repo.name)
+    def is_repo_empty(self, repo, branches: list = None) -> bool:
+        """
+        Whether a repository has no commits. Every commit is reachable from a branch, so a repository is empty
+        exactly when it has no branches. The branches already gathered are used when given, otherwise the
+        default branch is looked up, which GitHub reports as not found only for an empty repository.
+        """
+        if branches is not None:
+            return not branches
+
+        try:
+            repo.get_branch(repo.default_branch)
             return False
+        except RateLimitExceededException:
+            # Let the scheduler back off and retry the repo rather than recording a wrong answer
+            raise
+        except UnknownObjectException:
+            return True
         except GithubException as e:
-            print(f"An error occurred: {e}")
+            logging.error(f"An error checking whether {repo.name} is empty: {e}")
             return False
 
     def get_repo_tags(self, repo) -> list:
@@ -96,20 +496,42 @@ class Github(SCM):
     def get_repo_branches(self, repo) -> list:
         return repo.get_branches()
 
+    @profiler.timed('github.get_tags_info', lambda self, repo: repo.name)
     def get_tags_info(self, repo) -> tuple:
+        """
+        Return a repository's tag count and latest tag, from at most two requests: a page of one tag whose last
+        page link gives the count, then the first page for the latest tag.
+        """
         count = 0
         latest_tag = ""
-        all_tags = []
         try:
             tags = repo.get_tags()
             count = tags.totalCount
             if count > 0:
                 latest_tag = tags[0].name
-                all_tags = [Tag(tag.name) for tag in tags]
+        except RateLimitExceededException:
+            raise
         except GithubException as e:
             logging.error(f"An error getting tags for {repo.name}: {e}")
-            return count, latest_tag, all_tags
-        return count, latest_tag, all_tags
+        return count, latest_tag
+
+    def iter_tags(self, repo):
+        """
+        Yield every tag of a repository, requesting a page at a time (paced by the rate limit scheduler) as the
+        tags are used, so repositories with many thousands of tags are never held in memory at once.
+        """
+        tags = repo.get_tags()
+        page = 0
+        while True:
+            try:
+                names = [tag.name for tag in self.scheduler.call(tags.get_page, page)]
+            except GithubException as e:
+                logging.error(f"An error listing the tags of {repo.name}: {e}")
+                return
+            yield from (Tag(name) for name in names)
+            if len(names) < REST_PAGE_SIZE:
+                return
+            page += 1
 
     def get_triage_data(self) -> list:
         repo_list = []
@@ -118,67 +540,465 @@ class Github(SCM):
 
         return repo_list
 
-    def pull_repo(self, owner: str, repo_name: str, clone_url: str, branch: str, destination_folder: str) -> bool:
+    def get_network(self, owner: str, repo_name: str) -> str:
+        """
+        Return the owner/name of the upstream a repository is a fork of (or its own for repositories that aren't
+        forks), which names the mirror it shares objects with. Repositories that can't be looked up get their own.
+        """
+        key = f"{owner}/{repo_name}"
+        if key not in self.networks:
+            try:
+                repo = self.scheduler.call(self.client.get_repo, key)
+                self.networks[key] = repo.source.full_name if repo.fork and repo.source else repo.full_name
+            except GithubException as e:
+                logging.warning(f"Could not look up the upstream of {key}, mirroring it on its own: {e}")
+                self.networks[key] = key
+        return self.networks[key]
+
+    @profiler.timed('github.pull_repo', lambda self, owner, repo_name, *args, **kwargs: repo_name)
+    def pull_repo(self, owner: str, repo_name: str, clone_url: str, branch: str, destination_folder: str,
+                  mode: str = PULL_MODE_FULL, depth: int = DEFAULT_SHALLOW_DEPTH, filter: str = None,
+                  sparse_paths: list = None) -> bool:
+        """
+        Clone a repository into destination_folder/repo_name and check out the given branch or tag ('*' for all
+        branches).
+
+        :param mode: PULL_MODE_FULL clones the whole repository, PULL_MODE_SINGLE_BRANCH fetches only the requested
+                     branch (or tag), PULL_MODE_SHALLOW does the same keeping only the last `depth` commits and
+                     PULL_MODE_TAG fetches only refs/tags/<branch>. PULL_MODE_ARCHIVE downloads a snapshot of the
+                     files, see pull_archive.
+        :param depth: Number of commits to fetch in PULL_MODE_SHALLOW.
+        :param filter: PULL_FILTER_BLOBLESS or PULL_FILTER_TREELESS for a partial clone, see pull_repo_git.
+        :param sparse_paths: Patterns (as in .gitignore) of the paths to check out, by default all of them.
+        :raises PullSkipped: If the repository is empty, not found or the branch/tag does not exist.
+        :raises PullError: If the clone failed for any other reason.
+
+        With a mirror cache, the repository is first fetched into its network's mirror and the clone borrows
+        objects from it, so it downloads nothing itself. Only full pulls are mirrored: the mirror fetches every
+        branch and tag, while single-branch, tag-only and shallow pulls fetch just the one ref. Partial clones aren't
+        mirrored either.
+        """
+        if mode == PULL_MODE_ARCHIVE:
+            return self.pull_archive(owner, repo_name, branch, destination_folder)
+        if filter or sparse_paths:
+            return self.pull_repo_git(repo_name, clone_url, branch, destination_folder, mode, depth, filter,
+                                      sparse_paths)
+
         credentials = pygit2.UserPass("x-access-token", password=self.auth_configuration['access_token'])
         callbacks = pygit2.RemoteCallbacks(credentials=credentials)
+        repo_path = os.path.join(destination_folder, repo_name)
+        depth = depth if mode == PULL_MODE_SHALLOW else 0
+        network = None
+        mirror = nullcontext()
+        if self.mirrors and mode == PULL_MODE_FULL:
+            network = self.get_network(owner, repo_name)
+            mirror = self.mirrors.use(network, owner, repo_name, clone_url, pygit2.RemoteCallbacks(credentials))
 
         try:
-            # Checkout all branches
-            if branch == '*':
-                repo_path = os.path.join(destination_folder, repo_name)
-                repo = pygit2.clone_repository(clone_url, repo_path)
-                remote = repo.remotes['origin']
-                remote.fetch()
-
-                for branch_name in repo.listall_references():
-                    try:
-                        if branch_name.startswith('refs/remotes/origin/'):
-                            branch = branch_name.replace('refs/remotes/origin/', '')
-                            if branch not in repo.branches.local:
-                                repo.create_branch(branch, repo.revparse_single(branch_name))
-                    except KeyError as e:
-                        if "reference 'refs/remotes/" in str(e) and "' not found" in str(e):
-                            logging.error(f"No branches found for {repo_name}, skipping")
-                            continue
-                    except GitError as e:
-                        if "unexpected http status code: 404" in str(e):
-                            logging.error(f"{repo_name} not found or is empty - skipping")
-                            return False
-                        if "'HEAD' is not a valid branch name" in str(e):
-                            continue
-                        logging.error(f"An error occurred cloning {repo_name}: {e}")
-                        exit(1)
-            else:
-                repo_path = os.path.join(destination_folder, repo_name)
+            with mirror as objects:
+                self.clone(repo_name, repo_path, clone_url, branch, mode, depth, callbacks, network, objects)
+        except GitError as e:
+            if "unexpected http status code: 404" in str(e):
+                raise PullSkipped(f"{repo_name} not found or is empty")
+            raise PullError(f"An error occurred cloning {repo_name}: {e}")
+        except KeyError as e:
+            raise PullSkipped(e.args[0] if e.args else str(e))
+        except ValueError as e:
+            raise PullError(f"An error occurred cloning {repo_name}: {e}")
+        return True
+
+    def clone(self, repo_name: str, repo_path: str, clone_url: str, branch: str, mode: str, depth: int, callbacks,
+              network: str = None, objects: str = None) -> None:
+        """
+        Clone for pull_repo, borrowing objects from the mirror object folder if given.
+        """
+        def add_clone(path, bare):
+            return self.mirrors.add_clone(path, network, objects)
+
+        init = add_clone if objects else None
+
+        # Checkout all branches
+        if branch == '*':
+            repo = pygit2.clone_repository(clone_url, repo_path, callbacks=callbacks, depth=depth,
+                                           repository=init)
+
+            for branch_name in repo.listall_references():
                 try:
-                    pygit2.clone_repository(clone_url, repo_path, checkout_branch=branch, callbacks=callbacks)
-                except GitError as e:
-                    if "unexpected http status code: 404" in str(e):
-                        logging.error(f"{repo_name} not found or is empty - skipping")
-                        return False
+                    if branch_name.startswith('refs/remotes/origin/'):
+                        branch = branch_name.replace('refs/remotes/origin/', '')
+                        if branch not in repo.branches.local:
+                            repo.create_branch(branch, repo.revparse_single(branch_name))
                 except KeyError as e:
                     if "reference 'refs/remotes/" in str(e) and "' not found" in str(e):
-                        # No branches found - treat as a tag
-                        tag_repo = pygit2.clone_repository(clone_url, repo_path)
-                        for remote in tag_repo.remotes:
-                            remote.fetch([f"refs/tags/*:refs/tags/*"])
-                        try:
-                            tag_ref = tag_repo.references.get(f'refs/tags/{branch}')
-                            tag_commit = tag_ref.peel()  # This gets the commit the tag points to
-                        except AttributeError:
-                            # Delete folder and error
-                            shutil.rmtree(repo_path)
-                            raise KeyError(f"No branch or tag '{branch}' not found for {repo_name}")
-
-                        # Checkout the tag
-                        tag_repo.checkout_tree(tag_commit)
-                        tag_repo.set_head(tag_commit.id)
-        except KeyError as e:
-            logging.error(f"{e} - skipping")
-            return False
-        except ValueError as e:
-            logging.error(f"An error occurred cloning {repo_name}: {e}, skipping")
-            return False
+                        logging.error(f"No branches found for {repo_name}, skipping")
+                        continue
+                except GitError as e:
+                    if "'HEAD' is not a valid branch name" in str(e):
+                        continue
+                    raise
+        elif mode == PULL_MODE_FULL:
+            try:
+                pygit2.clone_repository(clone_url, repo_path, checkout_branch=branch, callbacks=callbacks,
+                                        repository=init)
+            except KeyError as e:
+                if "reference 'refs/remotes/" in str(e) and "' not found" in str(e):
+                    # No branches found - treat as a tag, fetching all branches and only that tag
+                    shutil.rmtree(repo_path, ignore_errors=True)
+                    self.pull_ref(repo_name, repo_path, clone_url, branch, callbacks, tag_only=True,
+                                  all_branches=True, init=init)
+                else:
+                    raise
+        else:
+            self.pull_ref(repo_name, repo_path, clone_url, branch, callbacks, tag_only=mode == PULL_MODE_TAG,
+                          depth=depth, init=init)
+
+    def pull_ref(self, repo_name: str, repo_path: str, clone_url: str, ref: str, callbacks, tag_only: bool = False,
+                 depth: int = 0, all_branches: bool = False, init=None) -> None:
+        """
+        Create a repository at repo_path (with init(path, bare) if given) fetching only the given branch or tag
+        (plus all branches if all_branches is set), then check it out. Branches are checked out as a local branch
+        tracking origin, tags as a detached HEAD.
+        """
+        repo = init(repo_path, False) if init else pygit2.init_repository(repo_path)
+
+        # List the remote refs first to find out whether the ref is a branch or a tag
+        refs = {head['name'] for head in repo.remotes.create_anonymous(clone_url).ls_remotes(callbacks=callbacks)}
+        if not refs:
+            shutil.rmtree(repo_path)
+            raise PullSkipped(f"{repo_name} not found or is empty")
+
+        branch_ref = f"refs/heads/{ref}"
+        tag_ref = f"refs/tags/{ref}"
+        all_branches_refspec = '+refs/heads/*:refs/remotes/origin/*'
+
+        if not tag_only and branch_ref in refs:
+            # Later fetches stay on this branch, like git clone --single-branch
+            remote_ref = f"refs/remotes/origin/{ref}"
+            remote = repo.remotes.create('origin', clone_url, f"+{branch_ref}:{remote_ref}")
+            remote.fetch(callbacks=callbacks, depth=depth)
+
+            local_branch = repo.branches.local.create(ref, repo.get(repo.references[remote_ref].target))
+            local_branch.upstream = repo.branches.remote[f"origin/{ref}"]
+            repo.checkout(local_branch)
+        elif tag_ref in refs:
+            repo.remotes.create('origin', clone_url, all_branches_refspec if all_branches else None)
+            refspecs = [f"+{tag_ref}:{tag_ref}"]
+            if all_branches:
+                refspecs.append(all_branches_refspec)
+            else:
+                # Don't follow the other tags pointing into the tag's history
+                repo.config['remote.origin.tagopt'] = '--no-tags'
+            remote = repo.remotes['origin']
+            remote.fetch(refspecs, callbacks=callbacks, depth=depth)
+
+            # Checkout the commit the tag points to
+            tag_commit = repo.references[tag_ref].peel(pygit2.Commit)
+            repo.checkout_tree(tag_commit)
+            repo.set_head(tag_commit.id)
+        else:
+            # Delete folder and error
+            shutil.rmtree(repo_path)
+            raise PullSkipped(f"No branch or tag '{ref}' found for {repo_name}")
+
+    def resolve_commit(self, owner: str, repo_name: str, ref: str) -> str:
+        """
+        Return the commit a branch or tag points to.
+
+        :raises PullSkipped: If the repository is empty, not found or has no such branch or tag.
+        """
+        if ref == '*':
+            raise PullSkipped(f"Archive mode needs a branch or tag to download for {repo_name}, not *")
+        try:
+            return self.scheduler.call(
+                lambda: self.client.get_repo(f"{owner}/{repo_name}", lazy=True).get_commit(ref).sha)
+        except GithubException as e:
+            if e.status in (404, 409, 422):
+                raise PullSkipped(f"No branch or tag '{ref}' found for {repo_name}, or it is empty")
+            raise PullError(f"An error occurred resolving {ref} of {repo_name}: {e}")
+
+    def pull_archive(self, owner: str, repo_name: str, ref: str, destination_folder: str) -> bool:
+        """
+        Download the files of a branch or tag into destination_folder/repo_name without git history, extracting
+        the tarball as it is streamed rather than cloning. The ref is resolved to a commit first, and that
+        commit's tarball is downloaded so the files match the commit recorded in ARCHIVE_FILE.
+        """
+        commit = self.resolve_commit(owner, repo_name, ref)
+        repo_path = os.path.join(destination_folder, repo_name)
+        self.download_archive(owner, repo_name, commit, repo_path)
+        write_archive_file(repo_path, ref, commit)
         return True
 
+    def download_archive(self, owner: str, repo_name: str, commit: str, repo_path: str) -> None:
+        url = f"{self.base_url.rstrip('/')}/repos/{owner}/{repo_name}/tarball/{commit}"
+        headers = {'Authorization': f"token {self.auth_configuration['access_token']}"}
+        logging.info(f"Downloading {repo_name} at {commit}...")
+        try:
+            # The API redirects to a signed download URL, which requests follows without the token
+            with requests.get(url, headers=headers, stream=True, timeout=ARCHIVE_TIMEOUT) as response:
+                # The API's response (before any redirect) carries the rate limit headers
+                api_response = response.history[0] if response.history else response
+                self.scheduler.update(api_response.status_code, api_response.headers)
+                if response.status_code == 404:
+                    raise PullSkipped(f"{repo_name} not found or is empty")
+                response.raise_for_status()
+                response.raw.decode_content = True
+                files = extract_tarball(response.raw, repo_path)
+        except (requests.RequestException, tarfile.TarError, OSError) as e:
+            shutil.rmtree(repo_path, ignore_errors=True)
+            raise PullError(f"An error occurred downloading {repo_name}: {e}")
+        logging.info(f"Extracted {files} files of {repo_name}")
+
+    def sync_archive(self, owner: str, repo_name: str, ref: str, destination_folder: str) -> tuple:
+        """
+        Download an archive snapshot again if its branch or tag now points to another commit, replacing the
+        folder once the new snapshot is complete.
+        """
+        repo_path = os.path.join(destination_folder, repo_name)
+        snapshot = read_archive_file(repo_path)
+        if snapshot is None:
+            raise PullError(f"{repo_path} is not an archive snapshot")
+
+        commit = self.resolve_commit(owner, repo_name, ref)
+        if commit != snapshot['commit']:
+            staging = f"{repo_path}.download"
+            shutil.rmtree(staging, ignore_errors=True)
+            self.download_archive(owner, repo_name, commit, staging)
+            write_archive_file(staging, ref, commit)
+            shutil.rmtree(repo_path)
+            os.rename(staging, repo_path)
+        return snapshot['commit'], commit
+
+    def pull_repo_git(self, repo_name: str, clone_url: str, branch: str, destination_folder: str,
+                      mode: str = PULL_MODE_FULL, depth: int = DEFAULT_SHALLOW_DEPTH, filter: str = None,
+                      sparse_paths: list = None) -> bool:
+        """
+        Partially clone a repository with the git command line, as libgit2 doesn't support partial clones or
+        sparse checkouts. Only the file contents (and with PULL_FILTER_TREELESS, the directory listings) needed
+        to check out the sparse paths are downloaded, the rest are fetched by git if they are ever needed.
+        Sparse paths default to a blobless clone, as checking out fewer paths only transfers less without the
+        contents of every file.
+        """
+        repo_path = os.path.join(destination_folder, repo_name)
+        args = ['clone', '--quiet', '--no-checkout', f"--filter={PULL_FILTERS[filter or PULL_FILTER_BLOBLESS]}"]
+        if branch != '*':
+            args += ['--branch', branch]
+            if mode != PULL_MODE_FULL:
+                args.append('--single-branch')
+        if mode == PULL_MODE_TAG:
+            args.append('--no-tags')
+        elif mode == PULL_MODE_SHALLOW:
+            args += ['--depth', str(depth)]
+
+        try:
+            self.run_git(repo_name, args + ['--', clone_url, repo_path])
+            if sparse_paths:
+                self.run_git(repo_name, ['sparse-checkout', 'set', '--no-cone', '--', *sparse_paths], repo_path)
+            self.run_git(repo_name, ['checkout', '--quiet'], repo_path)
+            if branch == '*':
+                self.track_remote_branches(repo_name, repo_path)
+        except PullSkipped:
+            shutil.rmtree(repo_path, ignore_errors=True)
+            raise
+        return True
+
+    def track_remote_branches(self, repo_name: str, repo_path: str, reset: bool = False) -> None:
+        """
+        Create a local branch for each branch of origin, or with reset, move existing local branches to it.
+        """
+        current = self.run_git(repo_name, ['branch', '--show-current'], repo_path)
+        local = set(self.run_git(repo_name, ['for-each-ref', '--format=%(refname:lstrip=2)', 'refs/heads'],
+                                 repo_path).splitlines())
+        remote = self.run_git(repo_name, ['for-each-ref', '--format=%(refname:lstrip=3)', 'refs/remotes/origin'],
+                              repo_path).splitlines()
+        for name in remote:
+            if name == 'HEAD':
+                continue
+            if name == current and reset:
+                self.run_git(repo_name, ['checkout', '--quiet', '-B', name, f"origin/{name}"], repo_path)
+            elif name not in local or (reset and name != current):
+                self.run_git(repo_name, ['branch', '--force', '--track', name, f"origin/{name}"], repo_path)
+
+    def run_git(self, repo_name: str, args: list, cwd: str = None) -> str:
+        """
+        Run a git command authenticated with the access token, returning its output.
+
+        :raises PullSkipped: If the repository, branch or tag was not found.
+        :raises PullError: If git isn't installed or the command failed for any other reason.
+        """
+        if not shutil.which('git'):
+            raise PullError(f"git is needed for partial clones and sparse checkouts, cloning {repo_name}")
+
+        # The token is passed in the environment rather than the command line, where other users could see it
+        token = base64.b64encode(f"x-access-token:{self.auth_configuration['access_token']}".encode()).decode()
+        env = {**os.environ, 'GIT_TERMINAL_PROMPT': '0', 'GIT_CONFIG_COUNT': '1',
+               'GIT_CONFIG_KEY_0': 'http.extraHeader', 'GIT_CONFIG_VALUE_0': f"Authorization: Basic {token}"}
+        result = subprocess.run(['git', *args], cwd=cwd, env=env, capture_output=True, text=True)
+        if result.returncode:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"git {args[0]} failed"
+            if "not found" in error or "couldn't find remote ref" in error:
+                raise PullSkipped(f"{repo_name}: {error}")
+            raise PullError(f"An error occurred cloning {repo_name}: {error}")
+        return result.stdout.strip()
+
+    @staticmethod
+    def is_partial_clone(repo: pygit2.Repository) -> bool:
+        return 'remote.origin.promisor' in repo.config
+
+    @profiler.timed('github.sync_repo', lambda self, owner, repo_name, *args, **kwargs: repo_name)
+    def sync_repo(self, owner: str, repo_name: str, clone_url: str, branch: str, destination_folder: str,
+                  mode: str = PULL_MODE_FULL, depth: int = DEFAULT_SHALLOW_DEPTH, filter: str = None,
+                  sparse_paths: list = None) -> tuple:
+        """
+        Update a repository previously pulled into destination_folder/repo_name in place, fetching only the new
+        objects for the given branch or tag ('*' for all branches) and fast-forwarding or re-checking it out.
+        Partial clones are updated with the git command line, keeping the filter they were cloned with, and
+        sparse_paths replaces the paths checked out.
+
+        :return: The commit checked out before and after the update.
+        :raises PullSkipped: If the repository is now empty or not found, or the branch/tag no longer exists.
+        :raises PullError: If the folder is not a clean clone of clone_url or the fetch failed.
+        """
+        credentials = pygit2.UserPass("x-access-token", password=self.auth_configuration['access_token'])
+        callbacks = pygit2.RemoteCallbacks(credentials=credentials)
+        if mode == PULL_MODE_ARCHIVE:
+            return self.sync_archive(owner, repo_name, branch, destination_folder)
+
+        repo_path = os.path.join(destination_folder, repo_name)
+        depth = depth if mode == PULL_MODE_SHALLOW else 0
+
+        try:
+            repo = pygit2.Repository(repo_path)
+        except GitError:
+            raise PullError(f"{repo_path} is not a git repository")
+
+        if 'origin' not in repo.remotes.names() or not is_same_remote(repo.remotes['origin'].url, clone_url):
+            raise PullError(f"{repo_path} is not a clone of {clone_url}")
+        if self.is_partial_clone(repo) or sparse_paths:
+            return self.sync_repo_git(repo_name, repo_path, branch, mode, depth, sparse_paths)
+        if repo.status(untracked_files='no'):
+            raise PullError(f"{repo_path} has local changes")
+
+        old_commit = '' if repo.head_is_unborn else str(repo.head.target)
+        remote = repo.remotes['origin']
+        try:
+            refs = {head['name'] for head in remote.ls_remotes(callbacks=callbacks)}
+            if not refs:
+                raise PullSkipped(f"{repo_name} not found or is empty")
+
+            branch_ref = f"refs/heads/{branch}"
+            tag_ref = f"refs/tags/{branch}"
+
+            if branch == '*':
+                remote.fetch(callbacks=callbacks, depth=depth)
+                head_branch = None if repo.head_is_detached or repo.head_is_unborn else repo.head.shorthand
+                for name in repo.branches.remote:
+                    local_name = name.replace('origin/', '', 1)
+                    if not name.startswith('origin/') or local_name == 'HEAD':
+                        continue
+                    target = repo.branches.remote[name].target
+                    if local_name == head_branch:
+                        self.checkout_branch(repo, local_name, target)
+                    else:
+                        self.move_branch(repo, local_name, target)
+            elif mode != PULL_MODE_TAG and branch_ref in refs:
+                remote_ref = f"refs/remotes/origin/{branch}"
+                remote.fetch([f"+{branch_ref}:{remote_ref}"], callbacks=callbacks, depth=depth)
+                self.checkout_branch(repo, branch, repo.references[remote_ref].target)
+            elif tag_ref in refs:
+                remote.fetch([f"+{tag_ref}:{tag_ref}"], callbacks=callbacks, depth=depth)
+                tag_commit = repo.references[tag_ref].peel(pygit2.Commit)
+                repo.checkout_tree(tag_commit)
+                repo.set_head(tag_commit.id)
+            else:
+                raise PullSkipped(f"No branch or tag '{branch}' found for {repo_name}")
+        except GitError as e:
+            if "unexpected http status code: 404" in str(e):
+                raise PullSkipped(f"{repo_name} not found or is empty")
+            raise PullError(f"An error occurred updating {repo_name}: {e}")
+        except KeyError as e:
+            raise PullSkipped(e.args[0] if e.args else str(e))
+
+        return old_commit, str(repo.head.target)
+
+    def sync_repo_git(self, repo_name: str, repo_path: str, branch: str, mode: str = PULL_MODE_FULL,
+                      depth: int = DEFAULT_SHALLOW_DEPTH, sparse_paths: list = None) -> tuple:
+        """
+        Update a partial clone in place with the git command line, see sync_repo.
+        """
+        # libgit2 sees the paths left out of a sparse checkout as deleted, so ask git for the local changes
+        if self.run_git(repo_name, ['status', '--porcelain', '--untracked-files=no'], repo_path):
+            raise PullError(f"{repo_path} has local changes")
+
+        def get_head():
+            try:
+                return self.run_git(repo_name, ['rev-parse', '--verify', '--quiet', 'HEAD'], repo_path)
+            except PullError:
+                return ''
+
+        old_commit = get_head()
+        depth_args = ['--depth', str(depth)] if mode == PULL_MODE_SHALLOW else []
+        if sparse_paths:
+            self.run_git(repo_name, ['sparse-checkout', 'set', '--no-cone', '--', *sparse_paths], repo_path)
+
+        if branch == '*':
+            self.run_git(repo_name, ['fetch', '--quiet', *depth_args, 'origin'], repo_path)
+            self.track_remote_branches(repo_name, repo_path, reset=True)
+        else:
+            listed = self.run_git(repo_name, ['ls-remote', 'origin', f"refs/heads/{branch}", f"refs/tags/{branch}"],
+                                  repo_path)
+            refs = {line.split('\t')[-1] for line in listed.splitlines()}
+            if mode != PULL_MODE_TAG and f"refs/heads/{branch}" in refs:
+                self.run_git(repo_name, ['fetch', '--quiet', *depth_args, 'origin',
+                                         f"+refs/heads/{branch}:refs/remotes/origin/{branch}"], repo_path)
+                self.run_git(repo_name, ['checkout', '--quiet', '-B', branch, f"origin/{branch}"], repo_path)
+            elif f"refs/tags/{branch}" in refs:
+                self.run_git(repo_name, ['fetch', '--quiet', '--no-tags', *depth_args, 'origin',
+                                         f"+refs/tags/{branch}:refs/tags/{branch}"], repo_path)
+                self.run_git(repo_name, ['checkout', '--quiet', '--detach', f"refs/tags/{branch}"], repo_path)
+            else:
+                raise PullSkipped(f"No branch or tag '{branch}' found for {repo_name}")
+        return old_commit, get_head()
+
+    def checkout_branch(self, repo: pygit2.Repository, name: str, target: pygit2.Oid) -> None:
+        """
+        Check out target on the local branch `name`, creating it to track origin if it doesn't exist.
+        """
+        repo.checkout_tree(repo.get(target))
+        local_branch = self.move_branch(repo, name, target)
+        if local_branch.upstream is None and f"origin/{name}" in repo.branches.remote:
+            local_branch.upstream = repo.branches.remote[f"origin/{name}"]
+        repo.set_head(local_branch.name)
+
+    @staticmethod
+    def move_branch(repo: pygit2.Repository, name: str, target: pygit2.Oid) -> pygit2.Branch:
+        """
+        Fast-forward the local branch `name` to target (creating it if needed), or reset it to target if the
+        history was rewritten upstream.
+        """
+        local_branch = repo.branches.local.get(name)
+        if local_branch is None:
+            return repo.branches.local.create(name, repo.get(target))
+        if local_branch.target == target:
+            return local_branch
+
+        try:
+            rewritten = not repo.descendant_of(target, local_branch.target)
+        except (GitError, KeyError):
+            # Part of the history between them is missing from a shallow clone
+            rewritten = False
+        if rewritten:
+            logging.warning(f"{name} can't be fast-forwarded from {local_branch.target}, resetting it to {target}")
+        local_branch.set_target(target)
+        return local_branch
+
+
+def is_same_remote(url: str, other_url: str) -> bool:
+    """
+    Whether two clone URLs point at the same repository, ignoring credentials, case and a trailing .git or /.
+    """
+    def normalise(value):
+        scheme, _, rest = value.rpartition('://')
+        rest = rest.rsplit('@', 1)[-1].rstrip('/').casefold()
+        return scheme.casefold(), rest[:-4] if rest.endswith('.git') else rest
 
+    return normalise(url) == normalise(other_url)
@@ -0,0 +1,58 @@
+from .profiler import profiler
+
+import requests
+
+
+class GraphQLError(Exception):
+    """
+    Raised when the GraphQL API returns an error response.
+    """
+
+    def __init__(self, message: str, status: int = None, headers: dict = None, types: list = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+        self.types = types or []  # The type of each error in the response body, e.g. NOT_FOUND
+
+
+class GraphQLClient:
+    """
+    Minimal client for a GraphQL endpoint, reusing one HTTP session (and its connection pool) for all queries.
+    """
+
+    def __init__(self, url: str, token: str = None, timeout: int = 30):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.response_hooks = []  # Callables given the status and headers of every response
+        if token:
+            self.session.headers['Authorization'] = f"bearer {token}"
+
+    def query(self, query: str, variables: dict = None) -> dict:
+        """
+        Run a query and return its data, raising GraphQLError if the API reports any errors.
+        """
+        with profiler.span('api.graphql'):
+            response = self.session.post(self.url, json={'query': query, 'variables': variables or {}},
+                                         timeout=self.timeout)
+        if profiler.enabled:
+            profiler.count('api.requests')
+            profiler.count('api.bytes', len(response.content))
+        for hook in self.response_hooks:
+            hook(response.status_code, response.headers)
+
+        if response.status_code != 200:
+            raise GraphQLError(f"GraphQL request failed with status {response.status_code}: {response.text}",
+                               response.status_code, response.headers)
+
+        body = response.json()
+        if body.get('errors'):
+            messages = '; '.join(error.get('message', str(error)) for error in body['errors'])
+            # The API reports exhausting the GraphQL budget in the body, treat it like an HTTP 429
+            status = 429 if any(error.get('type') == 'RATE_LIMITED' for error in body['errors']) else None
+            raise GraphQLError(f"GraphQL query returned errors: {messages}", status, response.headers,
+                               [error.get('type') for error in body['errors']])
+        return body['data']
+
+    def close(self) -> None:
+        self.session.close()
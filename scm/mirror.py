@@ -0,0 +1,255 @@
+from contextlib import contextmanager
+
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import logging
+import pygit2
+
+logging.basicConfig(level=logging.INFO)
+
+# Once the mirrors take up more than this many bytes the least recently used are evicted
+DEFAULT_MAX_SIZE = 20 * 1024 * 1024 * 1024
+# Refs of each repository fetched into a mirror are kept under this prefix, so forks don't overwrite each other
+FORK_REFS = 'refs/forks'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mirrors (
+    network TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clones (
+    path TEXT PRIMARY KEY,
+    network TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS mirrors_used_at ON mirrors (used_at);
+"""
+
+
+def get_folder_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(path) for name in names)
+
+
+def get_alternates_path(repo: pygit2.Repository) -> str:
+    return os.path.join(repo.path, 'objects', 'info', 'alternates')
+
+
+class MirrorCache:
+    """
+    Bare mirrors of repository networks (an upstream and all of its forks), which clones borrow objects from as a
+    git alternate, like git clone --reference. Each repository pulled is first fetched into its network's mirror,
+    which only downloads the objects the mirror doesn't have yet, so history shared between forks - and between
+    pulls of the same repositories for different engagements - is fetched and stored once.
+
+    A clone using a mirror can't be read without it, so before a mirror is evicted the clones registered as
+    using it are dissociated: the objects they need are copied into them and the alternate is removed.
+    """
+
+    def __init__(self, folder: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.folder = folder
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._network_locks = {}
+        self._in_use = {}
+        self._evict_lock = threading.Lock()  # One eviction pass at a time
+
+        os.makedirs(folder, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(folder, 'mirrors.sqlite'), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def get_mirror_path(self, network: str) -> str:
+        """
+        Return the folder of a network's mirror, keyed on the upstream's owner/name.
+        """
+        owner, _, name = (re.sub(r'[^\w.-]', '_', part) for part in network.casefold().partition('/'))
+        return os.path.join(self.folder, owner, f"{name}.git")
+
+    @contextmanager
+    def use(self, network: str, owner: str, repo_name: str, clone_url: str, callbacks=None):
+        """
+        Fetch a repository into its network's mirror, yielding the mirror's object folder to use as an alternate.
+        The mirror isn't evicted while in use, and the cache is trimmed to max_size once it's no longer used.
+        """
+        # The count is raised under the network's lock, which remove() holds while deleting the mirror, so a mirror
+        # is never deleted between being fetched into and the clone borrowing from it
+        network_lock = self.get_network_lock(network)
+        with network_lock:
+            with self._lock:
+                self._in_use[network] = self._in_use.get(network, 0) + 1
+            try:
+                # Repositories of the same network are fetched one at a time, so each fetch builds on the last
+                objects = self.fetch(network, owner, repo_name, clone_url, callbacks)
+            except BaseException:
+                with self._lock:
+                    self._in_use[network] -= 1
+                raise
+        try:
+            yield objects
+        finally:
+            with self._lock:
+                self._in_use[network] -= 1
+            self.evict()
+
+    def get_network_lock(self, network: str) -> threading.Lock:
+        with self._lock:
+            return self._network_locks.setdefault(network, threading.Lock())
+
+    def fetch(self, network: str, owner: str, repo_name: str, clone_url: str, callbacks=None) -> str:
+        path = self.get_mirror_path(network)
+        if os.path.exists(path):
+            mirror = pygit2.Repository(path)
+        else:
+            logging.info(f"Creating mirror of {network} in {path}...")
+            mirror = pygit2.init_repository(path, bare=True)
+
+        # The mirror's refs are offered to the server as commits it already has, so only new objects are sent
+        logging.info(f"Updating mirror of {network} with {owner}/{repo_name}...")
+        prefix = f"{FORK_REFS}/{owner.casefold()}/{repo_name.casefold()}"
+        remote = mirror.remotes.create_anonymous(clone_url)
+        remote.fetch([f"+refs/heads/*:{prefix}/heads/*", f"+refs/tags/*:{prefix}/tags/*"], callbacks=callbacks)
+
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO mirrors VALUES (?, ?, ?, ?)",
+                             (network, path, get_folder_size(path), time.time()))
+            self._db.commit()
+        return os.path.join(mirror.path, 'objects')
+
+    def add_clone(self, repo_path: str, network: str, objects: str) -> pygit2.Repository:
+        """
+        Create a repository at repo_path borrowing objects from a mirror, returning it.
+        """
+        repo = pygit2.init_repository(repo_path)
+        with open(get_alternates_path(repo), 'w', encoding='utf-8') as file:
+            file.write(f"{os.path.abspath(objects)}\n")
+
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO clones VALUES (?, ?)", (os.path.abspath(repo_path), network))
+            self._db.commit()
+        # Alternates are read when the object database is opened, so open the repository again
+        return pygit2.Repository(repo_path)
+
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM mirrors").fetchone()[0]
+
+    def evict(self, max_size: int = None, max_age: float = None) -> list:
+        """
+        Remove mirrors unused for max_age seconds, then the least recently used mirrors until they take up no more
+        than max_size bytes (by default the cache's max_size). Mirrors in use are kept. Returns the networks
+        of the mirrors removed.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        with self._evict_lock:
+            with self._lock:
+                mirrors = self._db.execute("SELECT network, size, used_at FROM mirrors ORDER BY used_at").fetchall()
+                in_use = {network for network, count in self._in_use.items() if count}
+
+            total = sum(size for _, size, _ in mirrors)
+            evicted = []
+            for network, size, used_at in mirrors:
+                expired = max_age is not None and used_at < time.time() - max_age
+                if (total <= max_size and not expired) or network in in_use or not self.remove(network):
+                    continue
+                total -= size
+                evicted.append(network)
+
+        if evicted:
+            logging.info(f"Evicted {len(evicted)} mirrors from {self.folder}: {', '.join(evicted)}")
+        return evicted
+
+    def remove(self, network: str) -> bool:
+        """
+        Dissociate the clones using a network's mirror, then delete it. Mirrors in use, or being fetched into, are
+        kept. Returns whether it was deleted.
+        """
+        network_lock = self.get_network_lock(network)
+        if not network_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                if self._in_use.get(network):
+                    return False
+                clones = [path for path, in self._db.execute("SELECT path FROM clones WHERE network = ?",
+                                                             (network,))]
+            path = self.get_mirror_path(network)
+            objects = os.path.join(path, 'objects')
+            for clone in clones:
+                try:
+                    self.dissociate(clone, objects)
+                except (pygit2.GitError, OSError) as e:
+                    # Leave the mirror for the next prune rather than break the clone
+                    logging.error(f"Could not dissociate {clone} from the mirror of {network}, keeping it: {e}")
+                    return False
+
+            shutil.rmtree(path, ignore_errors=True)
+            with self._lock:
+                self._db.execute("DELETE FROM mirrors WHERE network = ?", (network,))
+                self._db.execute("DELETE FROM clones WHERE network = ?", (network,))
+                self._db.commit()
+            return True
+        finally:
+            network_lock.release()
+
+    @staticmethod
+    def dissociate(repo_path: str, objects: str) -> None:
+        """
+        Copy the objects reachable from a clone's refs into the clone and stop it borrowing from a mirror, like
+        git repack -a -d followed by removing the alternate. Clones removed since they were pulled are ignored.
+        """
+        try:
+            repo = pygit2.Repository(repo_path)
+        except pygit2.GitError:
+            return
+        alternates = get_alternates_path(repo)
+        if not os.path.exists(alternates):
+            return
+        with open(alternates, 'r', encoding='utf-8') as file:
+            borrowed = [line.strip() for line in file if line.strip()]
+        if os.path.abspath(objects) not in borrowed:
+            return
+
+        logging.info(f"Copying the objects of {repo_path} out of its mirror...")
+        builder = pygit2.PackBuilder(repo)
+        commits = [] if repo.head_is_unborn else [repo.head.target]
+        for name in repo.references:
+            target = repo.references[name].resolve().target
+            builder.add_recur(target)  # Annotated tags, and the trees of the commits refs point to
+            try:
+                commits.append(repo[target].peel(pygit2.Commit).id)
+            except (ValueError, pygit2.GitError):
+                pass  # A tag of something other than a commit
+        if commits:
+            walker = repo.walk(commits[0], pygit2.GIT_SORT_NONE)
+            for commit in commits[1:]:
+                walker.push(commit)
+            for commit in walker:
+                builder.add_recur(commit.id)
+        builder.write(os.path.join(repo.path, 'objects', 'pack'))
+
+        remaining = [path for path in borrowed if path != os.path.abspath(objects)]
+        if remaining:
+            with open(alternates, 'w', encoding='utf-8') as file:
+                file.write(''.join(f"{path}\n" for path in remaining))
+        else:
+            os.remove(alternates)
+
+    def prune(self, max_size: int = None, max_age: float = None) -> list:
+        """
+        Forget clones that no longer exist, then evict mirrors as in evict().
+        """
+        with self._lock:
+            clones = self._db.execute("SELECT path FROM clones").fetchall()
+        gone = [path for path, in clones if not os.path.exists(path)]
+        with self._lock:
+            self._db.executemany("DELETE FROM clones WHERE path = ?", [(path,) for path in gone])
+            self._db.commit()
+        return self.evict(max_size, max_age)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,212 @@
+from utils.table import format_table
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+# Rows in each table of the profile summary
+DEFAULT_SUMMARY_ROWS = 10
+
+
+class Span:
+    """
+    Times a block of code for a Profiler, recording it when the block exits.
+    """
+
+    __slots__ = ('profiler', 'name', 'repo', 'start', 'thread')
+
+    def __init__(self, profiler: 'Profiler', name: str, repo: str = None):
+        self.profiler = profiler
+        self.name = name
+        self.repo = repo
+
+    def __enter__(self):
+        self.thread = get_thread()
+        self.start = self.profiler.clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_span(self.name, self.repo, self.start, self.profiler.clock() - self.start, self.thread)
+        return False
+
+
+class NullSpan:
+    """
+    Stands in for a Span while profiling is disabled, costing next to nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def get_thread() -> tuple:
+    """
+    Identify what a span runs on: the asyncio task on an event loop, as tasks interleave on its thread, otherwise
+    the thread. Returns the identity and a name for it.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task:
+        return id(task), task.get_name()
+    thread = threading.current_thread()
+    return thread.ident, thread.name
+
+
+class Profiler:
+    """
+    Records timing spans (per phase and per repository) and counters (e.g. API requests and bytes) while enabled,
+    to find where a run spends its time. The spans can be written as a Chrome trace, viewed in chrome://tracing or
+    Perfetto, and summarised as the slowest calls and repositories.
+
+    Code is instrumented with span() blocks or the timed() decorator, which cost next to nothing while disabled.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.spans = []  # (name, repo, start, duration, thread)
+        self.counters = {}
+        self.samples = []  # (time, counter, total) for each change of a counter
+        self.started_at = self.clock()
+
+    def enable(self) -> None:
+        self.reset()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def span(self, name: str, repo: str = None):
+        """
+        Return a context manager timing its block as a span, named as <component>.<call>, optionally for a
+        repository.
+        """
+        return Span(self, name, repo) if self.enabled else NULL_SPAN
+
+    def add_span(self, name: str, repo: str, start: float, duration: float, thread: tuple) -> None:
+        with self._lock:
+            self.spans.append((name, repo, start - self.started_at, duration, thread))
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self.samples.append((self.clock() - self.started_at, name, total))
+
+    def timed(self, name: str, get_repo=None):
+        """
+        Decorate a function (or coroutine or generator function) to time each call as a span. get_repo is given
+        the call's arguments and returns the name of the repository the call is for.
+
+        Generators are timed from their first item to their last, including the time the caller spends between
+        items.
+        """
+        def decorator(function):
+            def get_span(args, kwargs):
+                return self.span(name, get_repo(*args, **kwargs) if get_repo and self.enabled else None)
+
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    with get_span(args, kwargs):
+                        return await function(*args, **kwargs)
+            elif inspect.isgeneratorfunction(function):
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with get_span(args, kwargs):
+                        return (yield from function(*args, **kwargs))
+            else:
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with get_span(args, kwargs):
+                        return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def get_trace(self) -> dict:
+        """
+        Return the spans and counters in the Chrome trace event format, times in microseconds from when
+        profiling was enabled.
+        """
+        pid = os.getpid()
+        threads = {}
+        events = []
+        with self._lock:
+            spans = list(self.spans)
+            samples = list(self.samples)
+
+        for name, repo, start, duration, (thread, thread_name) in spans:
+            if thread not in threads:
+                threads[thread] = len(threads) + 1
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': threads[thread],
+                               'args': {'name': thread_name}})
+            event = {'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': threads[thread],
+                     'ts': round(start * 1e6, 3), 'dur': round(duration * 1e6, 3)}
+            if repo:
+                event['args'] = {'repo': repo}
+            events.append(event)
+
+        for at, name, total in samples:
+            events.append({'name': name, 'ph': 'C', 'pid': pid, 'ts': round(at * 1e6, 3), 'args': {name: total}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.get_trace(), file)
+
+    def format_summary(self, limit: int = DEFAULT_SUMMARY_ROWS) -> str:
+        """
+        Format the calls taking the most time in total, the slowest repositories and the counters as tables.
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+
+        calls = {}
+        for name, _, _, duration, _ in spans:
+            count, total, longest = calls.get(name, (0, 0.0, 0.0))
+            calls[name] = (count + 1, total + duration, max(longest, duration))
+        rows = [('Call', 'Count', 'Total', 'Mean', 'Max')]
+        for name, (count, total, longest) in sorted(calls.items(), key=lambda item: (-item[1][1], item[0]))[:limit]:
+            rows.append((name, str(count), f"{total:.2f}s", f"{total / count * 1000:.1f}ms", f"{longest:.2f}s"))
+        lines = format_table(rows)
+
+        # A repository's spans nest (e.g. its tags within its details), so it is timed by its longest
+        slowest = {}
+        for name, repo, _, duration, _ in spans:
+            if repo and duration >= slowest.get(repo, ('', -1.0))[1]:
+                slowest[repo] = (name, duration)
+        if slowest:
+            rows = [('Repo', 'Call', 'Time')]
+            rows += [(repo, name, f"{duration:.2f}s") for repo, (name, duration)
+                     in sorted(slowest.items(), key=lambda item: -item[1][1])[:limit]]
+            lines += [''] + format_table(rows)
+
+        if counters:
+            rows = [('Counter', 'Total')]
+            rows += [(name, str(total)) for name, total in sorted(counters.items())]
+            lines += [''] + format_table(rows)
+        return '\n'.join(lines)
+
+
+# The profiler instrumented code records to, enabled with --profile
+profiler = Profiler()
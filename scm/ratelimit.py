@@ -0,0 +1,245 @@
+from github.GithubException import GithubException, RateLimitExceededException
+from .graphql import GraphQLError
+from .profiler import profiler
+
+import asyncio
+import contextlib
+import random
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Requests left in the budget that are never scheduled, kept for the user's other tooling
+DEFAULT_RESERVE = 50
+# Estimated requests per repository before any have completed
+DEFAULT_COST_PER_TASK = 4
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_MAX_BACKOFF = 300
+DEFAULT_LOG_INTERVAL = 30
+
+
+class RateLimitScheduler:
+    """
+    Paces requests against the API rate limit.
+
+    The scheduler is fed the headers of every response (X-RateLimit-Remaining/Reset and Retry-After), spreads
+    the remaining budget over the tasks still pending so the budget lasts until it resets, and retries tasks
+    that hit a primary or secondary rate limit with jittered backoff. Progress and budget usage are logged
+    periodically.
+    """
+
+    def __init__(self, reserve: int = DEFAULT_RESERVE, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF, log_interval: float = DEFAULT_LOG_INTERVAL,
+                 clock=time.time, sleep=time.sleep):
+        self.reserve = reserve
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.log_interval = log_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.blocked_until = 0
+        self.next_slot = 0
+
+        self.pending = 0
+        self.completed = 0
+        self.requests = 0
+        self.retries = 0
+        self.slept = 0.0  # Seconds of the run during which at least one task was throttled
+        self.sleepers = 0
+        self.sleep_started = None
+        self.started_at = clock()
+        self.last_report = self.started_at
+
+    def update(self, status: int, headers: dict) -> None:
+        """
+        Record the rate limit state from a response.
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+        with self._lock:
+            self.requests += 1
+            try:
+                if 'x-ratelimit-limit' in headers:
+                    self.limit = int(headers['x-ratelimit-limit'])
+                if 'x-ratelimit-remaining' in headers:
+                    self.remaining = int(headers['x-ratelimit-remaining'])
+                if 'x-ratelimit-reset' in headers:
+                    self.reset_at = int(float(headers['x-ratelimit-reset']))
+                if 'retry-after' in headers:
+                    self.blocked_until = max(self.blocked_until, self._clock() + float(headers['retry-after']))
+            except ValueError:
+                logging.debug(f"Ignoring malformed rate limit headers: {headers}")
+
+        self.log_progress()
+
+    def add_pending(self, count: int = 1) -> None:
+        with self._lock:
+            self.pending += count
+
+    def task_done(self) -> None:
+        with self._lock:
+            self.pending = max(self.pending - 1, 0)
+            self.completed += 1
+
+    @property
+    def cost_per_task(self) -> float:
+        """
+        Average number of requests made per completed task.
+        """
+        if not self.completed:
+            return DEFAULT_COST_PER_TASK
+        return max(self.requests / self.completed, 1)
+
+    def get_delay(self) -> float:
+        """
+        Work out how long the next task should wait so the remaining budget covers the pending tasks.
+        """
+        with self._lock:
+            now = self._clock()
+            if self.blocked_until > now:
+                return self.blocked_until - now
+            if self.remaining is None or self.reset_at is None or self.reset_at <= now:
+                return 0
+
+            budget = self.remaining - self.reserve
+            if budget <= 0:
+                return self.reset_at - now + random.uniform(1, 5)
+
+            # Enough budget for everything still to do, no need to slow down
+            if self.pending * self.cost_per_task <= budget:
+                return 0
+
+            # Otherwise spread the tasks the budget can pay for evenly until the reset
+            interval = (self.reset_at - now) / max(budget / self.cost_per_task, 1)
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + interval
+            return slot - now
+
+    def wait(self) -> None:
+        delay = self.get_delay()
+        if delay > 0:
+            logging.info(f"Rate limit: {self.remaining} requests remaining for {self.pending} pending repos, "
+                         f"waiting {delay:.1f}s...")
+            self.do_sleep(delay)
+
+    def do_sleep(self, delay: float) -> None:
+        with self.throttled(), profiler.span('ratelimit.sleep'):
+            self._sleep(delay)
+
+    @contextlib.contextmanager
+    def throttled(self):
+        """
+        Record the time a task is held back in slept. Tasks on other threads or coroutines often wait at the same
+        time, so slept is the wall clock time during which any task was waiting rather than the sum of the waits.
+        """
+        with self._lock:
+            if not self.sleepers:
+                self.sleep_started = self._clock()
+            self.sleepers += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.sleepers -= 1
+                if not self.sleepers:
+                    self.slept += self._clock() - self.sleep_started
+
+    def get_backoff(self, attempt: int, exception: Exception) -> float:
+        """
+        Work out how long to back off after a rate limited request, or None if the error is not a rate limit.
+        """
+        status = getattr(exception, 'status', None)
+        headers = {key.lower(): value for key, value in (getattr(exception, 'headers', None) or {}).items()}
+
+        if isinstance(exception, RateLimitExceededException):
+            pass
+        elif isinstance(exception, (GithubException, GraphQLError)) and status in (403, 429):
+            if 'retry-after' not in headers and headers.get('x-ratelimit-remaining') != '0':
+                return None
+        else:
+            return None
+
+        jitter = random.uniform(0.5, 1.5)
+        if 'retry-after' in headers:
+            return float(headers['retry-after']) + jitter
+        if headers.get('x-ratelimit-remaining') == '0' and 'x-ratelimit-reset' in headers:
+            return max(float(headers['x-ratelimit-reset']) - self._clock(), 0) + jitter
+        return min(self.max_backoff, 2 ** attempt) * jitter
+
+    def call(self, function, *args, **kwargs):
+        """
+        Run a task once the budget allows it, retrying with backoff if it hits a rate limit.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self.wait()
+            try:
+                return function(*args, **kwargs)
+            except (GithubException, GraphQLError) as e:
+                delay = self.get_backoff(attempt, e)
+                if delay is None or attempt == self.max_attempts:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                logging.warning(f"Rate limited (attempt {attempt}/{self.max_attempts}), "
+                                f"backing off for {delay:.1f}s...")
+                self.do_sleep(delay)
+
+    async def call_async(self, function, *args, **kwargs):
+        """
+        Await a coroutine function once the budget allows it, like call(), waiting without blocking the event loop.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self.get_delay()
+            if delay > 0:
+                logging.info(f"Rate limit: {self.remaining} requests remaining for {self.pending} pending repos, "
+                             f"waiting {delay:.1f}s...")
+                await self.do_sleep_async(delay)
+            try:
+                return await function(*args, **kwargs)
+            except (GithubException, GraphQLError) as e:
+                delay = self.get_backoff(attempt, e)
+                if delay is None or attempt == self.max_attempts:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                logging.warning(f"Rate limited (attempt {attempt}/{self.max_attempts}), "
+                                f"backing off for {delay:.1f}s...")
+                await self.do_sleep_async(delay)
+
+    async def do_sleep_async(self, delay: float) -> None:
+        with self.throttled(), profiler.span('ratelimit.sleep'):
+            await asyncio.sleep(delay)
+
+    def run(self, function, *args, **kwargs):
+        """
+        Run one pending task through call() and mark it done.
+        """
+        try:
+            return self.call(function, *args, **kwargs)
+        finally:
+            self.task_done()
+
+    def log_progress(self, force: bool = False) -> None:
+        now = self._clock()
+        with self._lock:
+            if not force and now - self.last_report < self.log_interval:
+                return
+            self.last_report = now
+        logging.info(self.summary())
+
+    def summary(self) -> str:
+        elapsed = max(self._clock() - self.started_at, 1e-6)
+        summary = (f"{self.completed} repos done, {self.pending} pending, {self.requests} requests "
+                   f"({self.requests / elapsed:.1f}/s, {self.completed / elapsed:.2f} repos/s), "
+                   f"{self.retries} retries, {self.slept:.0f}s throttled")
+        if self.remaining is not None:
+            summary += f", budget {self.remaining}/{self.limit} remaining"
+            if self.reset_at:
+                summary += f" (resets in {max(self.reset_at - self._clock(), 0):.0f}s)"
+        return summary
@@ -5,9 +5,53 @@ import sys
 
 logging.basicConfig(level=logging.INFO)
 
+# Number of repositories processed concurrently when gathering metadata
+DEFAULT_MAX_WORKERS = 8
+# Number of requests in flight at once when gathering metadata asynchronously
+DEFAULT_MAX_IN_FLIGHT = 100
+
+# How much of a repository is transferred when it is pulled
+PULL_MODE_FULL = 'full'  # Full history of all branches
+PULL_MODE_SINGLE_BRANCH = 'single-branch'  # Full history of only the requested branch or tag
+PULL_MODE_SHALLOW = 'shallow'  # Only the last commits of the requested branch or tag
+PULL_MODE_TAG = 'tag'  # Only the requested tag
+PULL_MODE_ARCHIVE = 'archive'  # The files of the requested branch or tag, without git history
+PULL_MODES = [PULL_MODE_FULL, PULL_MODE_SINGLE_BRANCH, PULL_MODE_SHALLOW, PULL_MODE_TAG, PULL_MODE_ARCHIVE]
+# Archive snapshots record the ref and commit they were downloaded from in this file
+ARCHIVE_FILE = '.codetriage-archive'
+DEFAULT_SHALLOW_DEPTH = 1
+# Partial clones leave out file contents (and with treeless, directory listings) not needed for the checkout,
+# fetching them from the remote when they are first used. Mapped to git clone --filter
+PULL_FILTER_BLOBLESS = 'blobless'
+PULL_FILTER_TREELESS = 'treeless'
+PULL_FILTERS = {PULL_FILTER_BLOBLESS: 'blob:none', PULL_FILTER_TREELESS: 'tree:0'}
+
+# Repository details that need requests of their own per repository, only gathered when asked for. Details not
+# gathered are None on the Repository
+DETAIL_BRANCHES = 'branches'  # Branch list
+DETAIL_TAGS = 'tags'  # Tag count and latest tag
+DETAIL_EMPTY = 'empty'  # Whether the repository has no commits
+DETAILS = (DETAIL_BRANCHES, DETAIL_TAGS, DETAIL_EMPTY)
+
+
+class PullError(Exception):
+    """
+    Raised when a repository could not be pulled.
+    """
+
+
+class PullSkipped(Exception):
+    """
+    Raised when a repository is not pulled, e.g. it is empty or the requested branch/tag does not exist.
+    """
+
 
 class Repository:
-    def __init__(self, name, owner, default_branch, branch_list, is_empty, is_archived, is_fork, description, forks_count, updated_at, url, clone_url, tag_count, latest_tag, tags, open_issues_count):
+    __slots__ = ('name', 'owner', 'default_branch', 'branches', 'is_empty', 'is_archived', 'is_fork', 'description',
+                 'forks_count', 'updated_at', 'url', 'clone_url', 'tag_count', 'latest_tag', 'tags',
+                 'open_issues_count', 'pushed_at', 'size')
+
+    def __init__(self, name, owner, default_branch, branch_list, is_empty, is_archived, is_fork, description, forks_count, updated_at, url, clone_url, tag_count, latest_tag, tags, open_issues_count, pushed_at='', size=None):
         self.name = name
         self.owner = owner
         self.default_branch = default_branch
@@ -22,16 +66,33 @@ class Repository:
         self.clone_url = clone_url
         self.tag_count = tag_count
         self.latest_tag = latest_tag
-        self.tags = []
+        self.tags = tags
         self.open_issues_count = open_issues_count
+        self.pushed_at = pushed_at
+        self.size = size  # Kilobytes, as reported by the SCM
+
+
+class UnchangedRepository:
+    """
+    A listed repository whose details were not fetched because it has not changed since it was last triaged.
+    """
+    __slots__ = ('name', 'owner')
+
+    def __init__(self, name, owner):
+        self.name = name
+        self.owner = owner
 
 
 class Branch:
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
 
 class Tag:
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
@@ -41,6 +102,9 @@ class SCM(ABC):
     def __init__(self):
         self._client = None
         self._auth_configuration = {}
+        self._max_workers = DEFAULT_MAX_WORKERS
+        self.details = set(DETAILS)  # Details gathered by get_repos
+        self.list_tags = False  # Also stream every tag of each repository as Repository.tags
 
     @property
     def client(self):
@@ -50,6 +114,16 @@ class SCM(ABC):
     def client(self, client) -> None:
         self._client = client
 
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    @max_workers.setter
+    def max_workers(self, max_workers: int) -> None:
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        self._max_workers = max_workers
+
     """
     Returns a dictionary of authentication options for the SCM.
     Should return a list of dictionaries with the key as the authentication 
@@ -85,7 +159,7 @@ class SCM(ABC):
         pass
 
     @abstractmethod
-    def get_repos(self, user):
+    def get_repos(self, user, unchanged=None, names=None):
         pass
 
     @abstractmethod
@@ -104,8 +178,12 @@ class SCM(ABC):
     def pull_repo(self, repo):
         pass
 
+    @abstractmethod
+    def sync_repo(self, repo):
+        pass
+
     def get_str_datetime(self, date) -> str:
-        return date.strftime("%Y-%m-%d %H:%M:%S")
+        return format_datetime(date)
 
     def validate_auth_options(self, args) -> list:
         valid_auth_options = []
@@ -193,3 +271,62 @@ class SCM(ABC):
             self.auth_configuration = self.prompt_for_credentials(args)
         self.auth_configuration = self.validate_auth_options(args)
 
+
+class AsyncSCM(ABC):
+    """
+    Asynchronous counterpart of the SCM interface, gathering metadata with many requests in flight from one
+    event loop rather than a pool of threads blocking on each request. Implementations are async context managers
+    holding a pooled HTTP client.
+    """
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be at least 1, got {max_in_flight}")
+        self.max_in_flight = max_in_flight
+        self.details = set(DETAILS)  # Details gathered by get_repos
+        self.list_tags = False  # Also stream every tag of each repository as Repository.tags
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @abstractmethod
+    async def open(self) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def get_repos(self, user, unchanged=None, names=None):
+        """
+        An async generator of Repository (or UnchangedRepository) objects, see SCM.get_repos.
+        """
+
+    @abstractmethod
+    async def get_repo_branches(self, repo):
+        pass
+
+    @abstractmethod
+    async def get_tags_info(self, repo):
+        pass
+
+    @abstractmethod
+    async def pull_repo(self, owner: str, repo_name: str, clone_url: str, branch: str, destination_folder: str,
+                        mode: str = PULL_MODE_FULL, depth: int = DEFAULT_SHALLOW_DEPTH, filter: str = None,
+                        sparse_paths: list = None) -> bool:
+        pass
+
+
+def format_datetime(date) -> str:
+    """
+    Format a datetime as it's written to the triage sheet.
+    """
+    # Empty repositories have never been pushed to
+    if date is None:
+        return ""
+    return date.strftime("%Y-%m-%d %H:%M:%S")
@@ -160,6 +160,12 @@ class TestGitHubTriageOutput:
             if row.name == "codetriage_empty":
                 assert row.empty is True, "codetriage_empty repo not marked as empty"
 
+    def test_only_codetriage_empty_is_marked_empty(self):
+        # Test to see if the repos with commits are not marked as empty
+        for row in self.triage_file.get_data():
+            if row.name in self.expected_repos and row.name != "codetriage_empty":
+                assert row.empty is False, f"Repo '{row.name}' marked as empty"
+
     def test_vim_has_been_forked(self):
         # Test to see if the vim repo has been forked a number of times
         for row in self.triage_file.get_data():
@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.fake_github import FakeGithubServer
+from scm.github import Github
+
+
+@pytest.fixture
+def server():
+    """A FakeGithubServer with no repositories, serving for the length of the test."""
+    server = FakeGithubServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def scm():
+    """A Github client with a token, for pulling from local git servers."""
+    scm = Github()
+    scm.auth_configuration = {'access_token': 'token'}
+    return scm
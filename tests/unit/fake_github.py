@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+import pygit2
+
+from datetime import datetime
+from github.GithubException import UnknownObjectException
+from scm.github import Github, ENGINE_REST, REST_PAGE_SIZE
+
+
+class FakeNamed:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeOwner:
+    def __init__(self, login):
+        self.login = login
+
+
+class FakePaginatedList(list):
+    """Stand-in for PyGithub's PaginatedList, with its total count and pages of REST_PAGE_SIZE items."""
+
+    @property
+    def totalCount(self):
+        return len(self)
+
+    def get_page(self, page):
+        return self[page * REST_PAGE_SIZE:(page + 1) * REST_PAGE_SIZE]
+
+
+class FakeRepo:
+    """A minimal stand-in for a PyGithub Repository object."""
+
+    def __init__(self, name, owner='NullMode', branches=('main',), tags=(), size=10, commits=1,
+                 archived=False, fork=False, description=None, forks_count=0, open_issues_count=0,
+                 updated_at=datetime(2024, 1, 1, 12, 0, 0), pushed_at=None, default_branch='main'):
+        self.name = name
+        self.owner = FakeOwner(owner)
+        self.full_name = f"{owner}/{name}"
+        self.default_branch = default_branch
+        self.archived = archived
+        self.fork = fork
+        self.description = description
+        self.forks_count = forks_count
+        self.open_issues_count = open_issues_count
+        self.updated_at = updated_at
+        self.pushed_at = pushed_at or updated_at
+        self.size = size
+        self.html_url = f"https://github.com/{owner}/{name}"
+        self.clone_url = f"https://github.com/{owner}/{name}.git"
+        self._branches = list(branches)
+        self._tags = list(tags)
+        self._commits = commits
+        self.calls = []
+
+    def get_branches(self):
+        self.calls.append('get_branches')
+        return FakePaginatedList(FakeNamed(name) for name in self._branches)
+
+    def get_branch(self, branch):
+        self.calls.append('get_branch')
+        if branch not in self._branches:
+            raise UnknownObjectException(404, {'message': 'Branch not found'}, {})
+        return FakeNamed(branch)
+
+    def get_tags(self):
+        self.calls.append('get_tags')
+        return FakePaginatedList(FakeNamed(name) for name in self._tags)
+
+    def get_commits(self):
+        self.calls.append('get_commits')
+        return FakePaginatedList(range(self._commits))
+
+
+class FakeUser:
+    def __init__(self, client, repos):
+        self._client = client
+        self._repos = repos
+
+    def get_repos(self):
+        self._client.listed += 1
+        return FakePaginatedList(self._repos)
+
+
+class FakeClient:
+    def __init__(self, repos):
+        self.repos = repos
+        self.listed = 0
+
+    def get_user(self, user=None):
+        return FakeUser(self, [repo for repo in self.repos if user is None or repo.owner.login.casefold() == user.casefold()])
+
+    def get_repo(self, full_name):
+        for repo in self.repos:
+            if repo.full_name.casefold() == full_name.casefold():
+                return repo
+        raise UnknownObjectException(404, {'message': 'Not Found'}, {})
+
+
+class FakeClock:
+    """A clock for RateLimitScheduler and Profiler, only moving when told to or slept on."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeSCM:
+    """
+    Creates a repository with a single commit for each pull, raising the outcome given for a repository's name
+    afterwards. Tracks the repositories pulled and the most pulls in progress at once.
+    """
+
+    def __init__(self, outcomes=None, delay=0.0):
+        self.outcomes = outcomes or {}
+        self.delay = delay
+        self.pulled = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def pull_repo(self, owner, repo_name, clone_url, branch, destination_folder, mode, depth, **options):
+        with self.lock:
+            self.pulled.append(repo_name)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+
+        repo = pygit2.init_repository(os.path.join(destination_folder, repo_name))
+        outcome = self.outcomes.get(repo_name)
+        if outcome:
+            raise outcome
+
+        signature = pygit2.Signature('Code Triage', 'codetriage@example.com')
+        tree = repo.TreeBuilder().write()
+        repo.create_commit('HEAD', signature, signature, branch, tree, [])
+        return True
+
+
+def make_scm(repos, max_workers=None):
+    """A Github client listing the FakeRepos given."""
+    scm = Github()
+    scm.client = FakeClient(repos)
+    if max_workers:
+        scm.max_workers = max_workers
+    return scm
+
+
+def make_server_scm(server, engine=ENGINE_REST):
+    """A Github client of a FakeGithubServer, using the engine given."""
+    scm = Github()
+    scm.engine = engine
+    scm.base_url = server.base_url
+    scm.auth_configuration = {'access_token': 'token'}
+    scm.authenticate()
+    return scm
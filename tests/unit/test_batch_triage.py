@@ -0,0 +1,63 @@
+import pytest
+
+from codetriage import batch_triage, get_account_file
+from tests.unit.fake_github import FakeRepo, make_scm
+from utils.config import TargetConfiguration
+from utils.output import RowConfiguration, TriageFile
+
+TARGETS = """
+[targets]
+[[github]]
+account = "papermerge"
+
+[[github]]
+account = "ciur"
+repositories = ["papermerge", "missing"]
+"""
+
+
+def make_papermerge_scm():
+    return make_scm([FakeRepo('core', owner='papermerge'), FakeRepo('docs', owner='papermerge'),
+                     FakeRepo('papermerge', owner='ciur'), FakeRepo('dotfiles', owner='ciur')])
+
+
+@pytest.fixture
+def targets(tmp_path):
+    path = tmp_path / 'targets.toml'
+    path.write_text(TARGETS)
+    return TargetConfiguration(str(path)).targets
+
+
+def load(path):
+    return sorted((row.owner, row.name) for row in TriageFile(str(path), RowConfiguration()).get_data())
+
+
+@pytest.mark.unit
+class TestBatchTriage:
+    def test_targets_file(self, targets):
+        assert [(target.scm, target.account, target.repositories) for target in targets] == \
+               [('github', 'papermerge', None), ('github', 'ciur', ['papermerge', 'missing'])]
+
+    def test_targets_file_without_account(self, tmp_path):
+        path = tmp_path / 'targets.toml'
+        path.write_text('[[github]]\nrepositories = ["a"]\n')
+        with pytest.raises(SystemExit):
+            TargetConfiguration(str(path))
+
+    def test_merged_sheet(self, targets, tmp_path):
+        scm = make_papermerge_scm()
+        batch_triage(targets, scm, str(tmp_path / 'triage.csv'))
+
+        assert load(tmp_path / 'triage.csv') == [('ciur', 'papermerge'), ('papermerge', 'core'),
+                                                 ('papermerge', 'docs')]
+        # Only the account without a repository list is listed
+        assert scm.client.listed == 1
+
+    def test_sheet_per_account(self, targets, tmp_path):
+        batch_triage(targets, make_papermerge_scm(), str(tmp_path / 'triage.csv'), split=True)
+
+        assert load(tmp_path / 'triage-papermerge.csv') == [('papermerge', 'core'), ('papermerge', 'docs')]
+        assert load(tmp_path / 'triage-ciur.csv') == [('ciur', 'papermerge')]
+
+    def test_account_file(self):
+        assert get_account_file('out/triage.xlsx', 'ciur') == 'out/triage-ciur.xlsx'
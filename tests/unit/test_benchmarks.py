@@ -0,0 +1,46 @@
+import json
+import logging
+import pytest
+
+from benchmarks.bench_triage import main
+from benchmarks.fake_github import SyntheticOrg, FakeGithubServer
+
+
+@pytest.mark.unit
+class TestBenchmarks:
+    def test_synthetic_org(self):
+        org = SyntheticOrg(repos=120, branches=2, tags=3)
+
+        assert org.get_name(7) == 'repo00007'
+        assert org.get_number('repo00119') == 119
+        assert org.get_number('repo00120') is None
+        assert org.get_branches(49) == [] and org.get_tags(49) == []
+        assert org.get_tags(1) == ['v1.3', 'v1.2', 'v1.1']
+
+    def test_rate_limit_enforced(self):
+        server = FakeGithubServer(SyntheticOrg(repos=5), rate_limit=2)
+        try:
+            assert server.admit(None) and server.admit(None)
+            assert server.get_rate_limit_headers()['X-RateLimit-Remaining'] == '0'
+            assert server.get_stats() == {'rest_requests': 2, 'graphql_requests': 0, 'rate_limited': 0}
+        finally:
+            server.server_close()
+
+    def test_run_and_compare(self, tmp_path, capsys):
+        output = tmp_path / 'results.json'
+        level = logging.getLogger().level
+        results = main(['--repos', '30', '--engines', 'rest', 'graphql', '--pull-repos', '2', '--pull-commits', '2',
+                        '-o', str(output)])
+
+        names = [benchmark['name'] for benchmark in results['benchmarks']]
+        assert names == ['triage/rest/30', 'triage/graphql/30', 'pull/2']
+        rest, graphql, pulled = results['benchmarks']
+        assert rest['requests'] == rest['rest_requests'] > 30
+        assert (graphql['graphql_requests'], graphql['rest_requests']) == (1, 0)
+        assert pulled['failed'] == 0
+        assert json.loads(output.read_text())['benchmarks'] == results['benchmarks']
+        assert logging.getLogger().level == level
+
+        main(['--repos', '30', '--pull-repos', '0', '--no-memory', '-o', str(tmp_path / 'new.json'),
+              '--compare', str(output)])
+        assert 'triage/rest/30' in capsys.readouterr().out
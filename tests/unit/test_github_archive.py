@@ -0,0 +1,119 @@
+import io
+import json
+import os
+import tarfile
+import pytest
+
+from scm.scm import PullError, PullSkipped, PULL_MODE_ARCHIVE, ARCHIVE_FILE
+from tests.unit.fake_github import make_server_scm
+from utils.journal import PullJournal
+from utils.pull import PullJob, run_pull_jobs, PULL_SUCCESS
+
+COMMIT = 'a' * 40
+NEW_COMMIT = 'b' * 40
+
+
+def make_tarball(commit, files=None, links=None, prefix=None):
+    """
+    Build a tarball laid out like GitHub's, everything in an <owner>-<repo>-<sha> folder.
+    """
+    prefix = prefix if prefix is not None else f"NullMode-app-{commit[:7]}/"
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w:gz') as archive:
+        directory = tarfile.TarInfo(prefix.rstrip('/'))
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for name, target in (links or {}).items():
+            info = tarfile.TarInfo(prefix + name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            archive.addfile(info)
+        for name, (content, mode) in (files or {}).items():
+            info = tarfile.TarInfo(prefix + name)
+            info.size = len(content)
+            info.mode = mode
+            archive.addfile(info, io.BytesIO(content))
+    return data.getvalue()
+
+
+FILES = {'src/app.py': (b'print("app")\n', 0o644), 'bin/run.sh': (b'#!/bin/sh\n', 0o755)}
+
+
+@pytest.fixture
+def server(server):
+    server.add_repo('app')
+    server.add_archive('app', 'v1.0', COMMIT, make_tarball(COMMIT, FILES, {'app.py': 'src/app.py'}))
+    return server
+
+
+@pytest.fixture
+def scm(server):
+    return make_server_scm(server)
+
+
+def pull(scm, destination, ref='v1.0'):
+    scm.pull_repo('NullMode', 'app', 'https://github.com/NullMode/app.git', ref, str(destination), PULL_MODE_ARCHIVE)
+    return os.path.join(str(destination), 'app')
+
+
+@pytest.mark.unit
+class TestGithubArchive:
+    def test_snapshot_extracted(self, scm, server, tmp_path):
+        folder = pull(scm, tmp_path)
+
+        with open(os.path.join(folder, 'src', 'app.py'), 'rb') as file:
+            assert file.read() == b'print("app")\n'
+        assert os.access(os.path.join(folder, 'bin', 'run.sh'), os.X_OK)
+        assert os.readlink(os.path.join(folder, 'app.py')) == 'src/app.py'
+        assert not os.path.exists(os.path.join(folder, '.git'))
+        with open(os.path.join(folder, ARCHIVE_FILE)) as file:
+            assert json.load(file) == {'ref': 'v1.0', 'commit': COMMIT}
+        # The ref is resolved, then the commit's tarball is downloaded
+        assert server.requests == ['/repos/NullMode/app/commits/v1.0', f"/repos/NullMode/app/tarball/{COMMIT}",
+                                   f"/_codeload/NullMode/app/{COMMIT}"]
+
+    def test_missing_ref_skipped(self, scm, tmp_path):
+        with pytest.raises(PullSkipped):
+            pull(scm, tmp_path, 'v2.0')
+        with pytest.raises(PullSkipped):
+            pull(scm, tmp_path, '*')
+        assert not os.path.exists(tmp_path / 'app')
+
+    def test_entry_outside_refused(self, scm, server, tmp_path):
+        server.add_archive('app', 'v1.0', COMMIT, make_tarball(COMMIT, {'../evil.txt': (b'evil', 0o644)}))
+        destination = tmp_path / 'repos'
+        os.makedirs(destination)
+
+        with pytest.raises(PullError):
+            pull(scm, destination)
+        assert os.listdir(destination) == []
+        assert not os.path.exists(tmp_path / 'evil.txt') and not os.path.exists(destination / 'evil.txt')
+
+    def test_link_outside_skipped(self, scm, server, tmp_path):
+        # A link out of the snapshot, then a file written through it
+        server.add_archive('app', 'v1.0', COMMIT, make_tarball(COMMIT, {'escape/evil.txt': (b'evil', 0o644)},
+                                                               {'escape': '..', 'passwd': '/etc/passwd'}))
+        folder = pull(scm, tmp_path)
+
+        assert not os.path.islink(os.path.join(folder, 'escape'))
+        assert not os.path.lexists(os.path.join(folder, 'passwd'))
+        assert os.path.isfile(os.path.join(folder, 'escape', 'evil.txt'))
+        assert not os.path.exists(tmp_path / 'evil.txt')
+
+    def test_sync_downloads_new_commit(self, scm, server, tmp_path):
+        folder = pull(scm, tmp_path)
+        assert scm.sync_repo('NullMode', 'app', '', 'v1.0', str(tmp_path), PULL_MODE_ARCHIVE) == (COMMIT, COMMIT)
+        assert len(server.requests) == 4
+
+        server.add_archive('app', 'v1.0', NEW_COMMIT, make_tarball(NEW_COMMIT, {'src/new.py': (b'new\n', 0o644)}))
+        assert scm.sync_repo('NullMode', 'app', '', 'v1.0', str(tmp_path), PULL_MODE_ARCHIVE) == (COMMIT, NEW_COMMIT)
+        assert sorted(os.listdir(folder)) == [ARCHIVE_FILE, 'src']
+        assert os.listdir(os.path.join(folder, 'src')) == ['new.py']
+
+    def test_commit_journaled(self, scm, tmp_path):
+        journal = PullJournal(str(tmp_path))
+        job = PullJob('NullMode', 'app', 'https://github.com/NullMode/app.git', 'v1.0', PULL_MODE_ARCHIVE)
+        result, = run_pull_jobs(scm, [job], str(tmp_path), journal=journal)
+
+        assert result.status == PULL_SUCCESS
+        assert journal.get('app')['commit'] == COMMIT
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import pytest
+
+from scm.github import ENGINE_ASYNC
+from scm.scm import Repository, DETAIL_EMPTY
+from benchmarks.git_http_server import GitHTTPServer, make_repo
+from tests.unit.fake_github import make_server_scm
+from utils.git_helpers import is_repo_on_branch
+
+pytest.importorskip('httpx')
+from scm.async_github import AsyncGithub  # noqa: E402
+
+
+def make_scm(server, max_in_flight=10):
+    scm = make_server_scm(server, ENGINE_ASYNC)
+    scm.max_in_flight = max_in_flight
+    return scm
+
+
+def make_root(tmp_path, names):
+    root = str(tmp_path / 'remote')
+    os.makedirs(root)
+    for name in names:
+        make_repo(root, name)
+    return root
+
+
+@pytest.mark.unit
+class TestAsyncGithub:
+    def test_repos_in_listing_order(self, server):
+        for i in range(150):
+            server.add_repo(f"repo{i:03}")
+        repos = list(make_scm(server).get_repos('NullMode'))
+
+        assert [repo.name for repo in repos] == [f"repo{i:03}" for i in range(150)]
+        # Two pages of 100 repositories
+        assert server.requests.count('/users/NullMode/repos') == 2
+
+    def test_repository_fields(self, server):
+        server.add_repo('tags', branches=['main', 'dev'], tags=['0.0.2', '0.0.1'], description='desc', forks_count=3,
+                        open_issues_count=2, pushed_at='2024-02-01T08:00:00Z')
+        server.add_repo('empty', branches=[], pushed_at=None)
+        tags, empty = make_scm(server).get_repos('NullMode')
+
+        assert isinstance(tags, Repository)
+        assert [branch.name for branch in tags.branches] == ['main', 'dev']
+        assert (tags.tag_count, tags.latest_tag, tags.tags) == (2, '0.0.2', None)
+        assert (tags.description, tags.forks_count, tags.open_issues_count) == ('desc', 3, 2)
+        assert (tags.updated_at, tags.pushed_at) == ('2024-01-01 12:00:00', '2024-02-01 08:00:00')
+        assert tags.clone_url == 'https://github.com/NullMode/tags.git'
+        assert (tags.is_empty, empty.is_empty, empty.pushed_at) == (False, True, '')
+
+    def test_tag_count_from_one_request(self, server):
+        server.add_repo('nightly', tags=[f"nightly-{i:03}" for i in range(250, 0, -1)])
+        repo, = make_scm(server).get_repos('NullMode')
+
+        assert (repo.tag_count, repo.latest_tag) == (250, 'nightly-250')
+        assert server.requests.count('/repos/NullMode/nightly/tags') == 1
+
+    def test_tag_list_streamed(self, server):
+        server.add_repo('nightly', tags=[f"nightly-{i:03}" for i in range(250, 0, -1)])
+        scm = make_scm(server)
+        scm.list_tags = True
+        for repo in scm.get_repos('NullMode'):
+            assert len([tag.name for tag in repo.tags]) == 250
+
+    def test_only_requested_details(self, server):
+        server.add_repo('app')
+        server.add_repo('empty', branches=[])
+        scm = make_scm(server)
+        scm.details = {DETAIL_EMPTY}
+        app, empty = scm.get_repos('NullMode')
+
+        assert (app.is_empty, empty.is_empty, app.branches, app.tag_count) == (False, True, None, None)
+        assert sorted(server.requests) == ['/repos/NullMode/app/branches/main', '/repos/NullMode/empty/branches/main',
+                                           '/users/NullMode/repos']
+
+    def test_named_repos(self, server):
+        server.add_repo('app')
+        server.add_repo('lib')
+        repos = list(make_scm(server).get_repos('NullMode', names=['lib', 'missing', 'app']))
+
+        assert [repo.name for repo in repos] == ['lib', 'app']
+        assert '/users/NullMode/repos' not in server.requests
+
+    def test_unknown_owner(self, server):
+        assert list(make_scm(server).get_repos('nobody')) == []
+
+    def test_in_flight_bounded(self, server):
+        server.latency = 0.02
+        for i in range(40):
+            server.add_repo(f"repo{i}")
+        list(make_scm(server, max_in_flight=5).get_repos('NullMode'))
+        assert 1 < server.peak <= 5
+
+    def test_async_interface(self, server):
+        server.add_repo('app', branches=['main', 'dev'])
+
+        async def gather():
+            async with AsyncGithub('token', server.base_url) as scm:
+                return [repo async for repo in scm.get_repos('NullMode')]
+
+        repo, = asyncio.run(gather())
+        assert [branch.name for branch in repo.branches] == ['main', 'dev']
+
+    def test_async_pull(self, server, tmp_path):
+        git_server = GitHTTPServer(make_root(tmp_path, ['app', 'lib']))
+
+        async def pull_all():
+            async with AsyncGithub('token', server.base_url, max_in_flight=2) as scm:
+                return await asyncio.gather(*[
+                    scm.pull_repo('NullMode', name, f"{git_server.url}/{name}.git", 'main', str(tmp_path / 'repos'))
+                    for name in ('app', 'lib')])
+
+        try:
+            assert asyncio.run(pull_all()) == [True, True]
+        finally:
+            git_server.close()
+        assert is_repo_on_branch(str(tmp_path / 'repos' / 'app'), 'main')
+        assert is_repo_on_branch(str(tmp_path / 'repos' / 'lib'), 'main')
@@ -0,0 +1,186 @@
+import threading
+import time
+import pytest
+
+from types import SimpleNamespace
+from github.GithubException import RateLimitExceededException
+from scm.cache import ResponseCache
+from scm.github import Github, ENGINE_REST, ENGINE_GRAPHQL, ENGINE_ASYNC
+from scm.ratelimit import RateLimitScheduler
+from scm.scm import Repository, DETAIL_EMPTY
+from tests.unit.fake_github import FakeRepo, make_scm, make_server_scm
+from benchmarks.fake_github import FakeGithubServer
+
+
+@pytest.mark.unit
+class TestGithubGetRepos:
+    def test_results_keep_listing_order(self):
+        repos = [FakeRepo(f"repo{i}") for i in range(20)]
+        result = list(make_scm(repos).get_repos('NullMode'))
+        assert [repo.name for repo in result] == [f"repo{i}" for i in range(20)]
+
+    def test_repository_fields_match_serial_run(self):
+        repos = [
+            FakeRepo('tags', branches=['main', 'dev'], tags=['0.0.2', '0.0.1'], description='desc',
+                     forks_count=3, open_issues_count=2),
+            FakeRepo('empty', branches=[], size=0, commits=0),
+        ]
+        parallel_scm, serial_scm = make_scm(repos, max_workers=4), make_scm(repos, max_workers=1)
+        parallel_scm.list_tags = serial_scm.list_tags = True
+        parallel = list(parallel_scm.get_repos('NullMode'))
+        serial = list(serial_scm.get_repos('NullMode'))
+
+        for a, b in zip(parallel, serial):
+            assert [branch.name for branch in a.branches] == [branch.name for branch in b.branches]
+            assert [tag.name for tag in a.tags] == [tag.name for tag in b.tags]
+            a.branches = b.branches = a.tags = b.tags = None
+            assert [getattr(a, slot) for slot in Repository.__slots__] == \
+                   [getattr(b, slot) for slot in Repository.__slots__]
+
+        tags = parallel[0]
+        assert tags.owner == 'NullMode'
+        assert tags.tag_count == 2
+        assert tags.latest_tag == '0.0.2'
+        assert tags.description == 'desc'
+        assert tags.updated_at == '2024-01-01 12:00:00'
+        assert tags.clone_url == 'https://github.com/NullMode/tags.git'
+        assert parallel[1].is_empty is True
+
+    def test_concurrency_is_bounded(self):
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        class SlowRepo(FakeRepo):
+            def get_branches(self):
+                nonlocal active, peak
+                with lock:
+                    active += 1
+                    peak = max(peak, active)
+                time.sleep(0.01)
+                with lock:
+                    active -= 1
+                return super().get_branches()
+
+        repos = [SlowRepo(f"repo{i}") for i in range(12)]
+        list(make_scm(repos, max_workers=3).get_repos('NullMode'))
+        assert 1 < peak <= 3
+
+    def test_repos_streamed_with_bounded_read_ahead(self):
+        repos = [FakeRepo(f"repo{i}") for i in range(50)]
+        results = make_scm(repos, max_workers=1).get_repos('NullMode')
+
+        assert next(results).name == 'repo0'
+        assert all(repo.calls == [] for repo in repos[10:])
+        assert [repo.name for repo in results] == [f"repo{i}" for i in range(1, 50)]
+
+    def test_emptiness_from_branches(self):
+        repos = [FakeRepo('app', size=0), FakeRepo('empty', branches=[], size=0, commits=0)]
+        app, empty = make_scm(repos).get_repos('NullMode')
+
+        assert (app.is_empty, empty.is_empty) == (False, True)
+        assert repos[0].calls.count('get_branches') == 1
+        assert all('get_commits' not in repo.calls for repo in repos)
+
+    def test_emptiness_from_default_branch(self):
+        scm = make_scm([])
+        repo, empty = FakeRepo('app', branches=['main', 'dev']), FakeRepo('empty', branches=[])
+
+        assert (scm.is_repo_empty(repo), scm.is_repo_empty(empty)) == (False, True)
+        assert repo.calls == empty.calls == ['get_branch']
+
+    def test_only_requested_details_gathered(self):
+        repos = [FakeRepo('app', tags=['1.0']), FakeRepo('empty', branches=[])]
+        scm = make_scm(repos)
+        scm.details = set()
+        app, empty = scm.get_repos('NullMode')
+
+        assert all(repo.calls == [] for repo in repos)
+        assert (app.branches, app.tag_count, app.latest_tag, app.tags, app.is_empty) == (None,) * 5
+        assert app.clone_url == 'https://github.com/NullMode/app.git'
+
+        scm.details = {DETAIL_EMPTY}
+        app, empty = scm.get_repos('NullMode')
+        assert (app.is_empty, empty.is_empty) == (False, True)
+        assert app.branches is None
+        assert all(repo.calls == ['get_branch'] for repo in repos)
+
+    def test_tag_count_and_latest_without_listing(self):
+        repo = FakeRepo('nightly', tags=[f"nightly-{i}" for i in range(250, 0, -1)])
+        result, = make_scm([repo]).get_repos('NullMode')
+
+        assert (result.tag_count, result.latest_tag, result.tags) == (250, 'nightly-250', None)
+        assert repo.calls.count('get_tags') == 1
+
+    def test_tag_list_streamed(self):
+        repo = FakeRepo('nightly', tags=[f"nightly-{i}" for i in range(250, 0, -1)])
+        scm = make_scm([repo])
+        scm.list_tags = True
+        result, = scm.get_repos('NullMode')
+
+        assert not isinstance(result.tags, list)
+        assert next(result.tags).name == 'nightly-250'
+        assert len(list(result.tags)) == 249
+
+    def test_rate_limited_listing_backed_off(self):
+        scm = make_scm([FakeRepo(f"repo{i:03}") for i in range(150)])
+        slept = []
+        scm.scheduler = RateLimitScheduler(sleep=slept.append)
+        listing = scm.client.get_user('NullMode').get_repos()
+        get_page = listing.get_page
+        failures = [RateLimitExceededException(403, {'message': 'API rate limit exceeded'}, {'retry-after': '3'})]
+
+        def get_page_limited(page):
+            if page == 1 and failures:
+                raise failures.pop()
+            return get_page(page)
+
+        listing.get_page = get_page_limited
+        scm.client.get_user = lambda user: SimpleNamespace(get_repos=lambda: listing)
+        repos = list(scm.get_repos('NullMode'))
+
+        assert [repo.name for repo in repos] == [f"repo{i:03}" for i in range(150)]
+        assert scm.scheduler.retries == 1 and 3 <= slept[0] <= 5
+
+    def test_invalid_worker_count(self):
+        with pytest.raises(ValueError):
+            Github().max_workers = 0
+
+
+@pytest.mark.unit
+class TestGithubClients:
+    def test_clients_keep_their_own_scheduler_and_cache(self, tmp_path):
+        servers = [FakeGithubServer().start(), FakeGithubServer().start()]
+        try:
+            scms = []
+            for server, owner in zip(servers, ('NullMode', 'Other')):
+                server.add_repo('app', owner=owner)
+                scm = Github()
+                scm.base_url = server.base_url
+                scm.auth_configuration = {'access_token': 'token'}
+                scm.cache = ResponseCache(str(tmp_path / owner / 'responses.sqlite'))
+                scm.authenticate()
+                scm.authenticate()  # Authenticating again doesn't add another hook
+                scms.append(scm)
+
+            assert [repo.name for repo in scms[0].get_repos('NullMode')] == ['app']
+            assert scms[0].scheduler.requests == len(servers[0].requests)
+            assert scms[1].scheduler.requests == 0
+            assert scms[0].cache.misses > 0 and scms[1].cache.misses == 0
+        finally:
+            for server in servers:
+                server.stop()
+            for scm in scms:
+                scm.cache.close()
+
+
+@pytest.mark.unit
+class TestEngineParity:
+    @pytest.mark.parametrize('engine', [ENGINE_REST, ENGINE_GRAPHQL, ENGINE_ASYNC])
+    def test_same_latest_tag(self, server, engine):
+        if engine == ENGINE_ASYNC:
+            pytest.importorskip('httpx')
+        # Newest first: v1.9.1 was tagged after v2.0, but v2.0 is last by name
+        server.add_repo('app', tags=['v1.9.1', 'v2.0', 'v1.0'])
+        repo, = make_server_scm(server, engine).get_repos('NullMode')
+        assert (repo.tag_count, repo.latest_tag) == (3, 'v2.0')
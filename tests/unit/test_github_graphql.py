@@ -0,0 +1,103 @@
+import pytest
+
+from scm.github import Github, ENGINE_GRAPHQL
+from scm.graphql import GraphQLClient, GraphQLError
+from tests.unit.fake_github import make_server_scm
+
+
+@pytest.fixture
+def server(server):
+    server.add_repo('codetriage_empty', branches=(), default_branch='master')
+    server.add_repo('codetriage_multiple_branches', branches=('main', 'main2', 'main3'))
+    server.add_repo('codetriage_tags', tags=('0.0.2', '0.0.1'), description='tags', forks_count=2, size=64,
+                    open_issues_count=3, updated_at='2024-03-01T10:20:30Z')
+    return server
+
+
+def make_scm(server):
+    # Empty repositories have their default branch looked up through REST, from the same server
+    return make_server_scm(server, ENGINE_GRAPHQL)
+
+
+@pytest.mark.unit
+class TestGithubGraphQL:
+    def test_repos_paginated_in_order(self, server, monkeypatch):
+        monkeypatch.setattr('scm.github.GRAPHQL_PAGE_SIZE', 2)
+        server.add_repo('codetriage_zbranches', branches=[f"branch{i:03}" for i in range(103)])
+        repos = list(make_scm(server).get_repos('NullMode'))
+        assert [repo.name for repo in repos] == ['codetriage_empty', 'codetriage_multiple_branches',
+                                                 'codetriage_tags', 'codetriage_zbranches']
+        assert len(repos[3].branches) == 103
+
+        # Two repo pages, and two extra branch pages for the branches past the first 100
+        assert len(server.queries) == 4
+        assert all(auth == 'bearer token' for auth, _ in server.queries)
+        assert server.queries[0][1]['variables']['pageSize'] == 2
+
+    def test_repository_fields(self, server):
+        empty, branches, tags = make_scm(server).get_repos('NullMode')
+
+        assert empty.is_empty is True
+        assert empty.default_branch == 'master'
+        assert empty.branches == []
+
+        assert [branch.name for branch in branches.branches] == ['main', 'main2', 'main3']
+        assert branches.description == 'None'
+
+        assert tags.owner == 'NullMode'
+        assert tags.default_branch == 'main'
+        assert tags.tag_count == 2
+        assert tags.latest_tag == '0.0.2'
+        assert tags.description == 'tags'
+        assert tags.forks_count == 2
+        assert tags.size == 64
+        assert tags.open_issues_count == 3
+        assert tags.updated_at == '2024-03-01 10:20:30'
+        assert tags.url == 'https://github.com/NullMode/codetriage_tags'
+        assert tags.clone_url == 'https://github.com/NullMode/codetriage_tags.git'
+
+    def test_only_requested_details_queried(self, server):
+        scm = make_scm(server)
+        scm.details = set()
+        repos = list(scm.get_repos('NullMode'))
+
+        # No refs requested, so no extra branch pages either
+        assert len(server.queries) == 1
+        assert all('refs' not in body['query'] for _, body in server.queries)
+        assert (repos[2].branches, repos[2].tag_count, repos[2].latest_tag) == (None, None, None)
+        assert repos[0].is_empty is True
+
+    def test_tag_list_streamed(self, server):
+        scm = make_scm(server)
+        scm.list_tags = True
+        repos = list(scm.get_repos('NullMode'))
+        assert len(server.queries) == 1
+
+        assert [tag.name for tag in repos[2].tags] == ['0.0.1', '0.0.2']
+        assert len(server.queries) == 2
+        assert server.queries[-1][1]['variables']['refPrefix'] == 'refs/tags/'
+
+    def test_named_repos(self, server):
+        repos = list(make_scm(server).get_repos('NullMode', names=['codetriage_tags', 'missing']))
+        assert [repo.name for repo in repos] == ['codetriage_tags']
+        assert all('repositoryOwner' not in body['query'] for _, body in server.queries)
+
+    def test_unknown_owner(self, server):
+        assert list(make_scm(server).get_repos('nobody')) == []
+
+    def test_http_errors_raised(self, server):
+        client = GraphQLClient(f"{server.base_url}/missing")
+        with pytest.raises(GraphQLError, match='status 404'):
+            client.query('{ repository { name } }')
+
+    def test_query_errors_raised(self, server):
+        with pytest.raises(GraphQLError, match='not supported'):
+            GraphQLClient(f"{server.base_url}/graphql").query('{ viewer { login } }')
+
+
+@pytest.mark.unit
+def test_graphql_url_for_enterprise():
+    scm = Github()
+    assert scm.graphql_url == 'https://api.github.com/graphql'
+    scm.base_url = 'https://github.example.com/api/v3'
+    assert scm.graphql_url == 'https://github.example.com/api/graphql'
@@ -0,0 +1,101 @@
+import os
+import pytest
+
+from scm.scm import PullSkipped, PULL_MODE_FULL, PULL_MODE_TAG, PULL_MODE_SHALLOW
+from scm.scm import PULL_FILTER_BLOBLESS, PULL_FILTER_TREELESS
+from benchmarks.git_http_server import GitHTTPServer, git
+from utils.git_helpers import is_repo_on_branch, is_repo_at_tag
+
+
+def commit(work, files, message):
+    for path, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(work, path)), exist_ok=True)
+        with open(os.path.join(work, path), 'w') as file:
+            file.write(content)
+    git('add', '.', cwd=work)
+    git('commit', '-q', '-m', message, cwd=work)
+
+
+@pytest.fixture
+def git_server(tmp_path):
+    root = str(tmp_path / 'remote')
+    work = os.path.join(root, 'monorepo-work')
+    git('init', '-q', '-b', 'main', work)
+    commit(work, {'src/app.py': 'app\n', 'assets/logo.bin': 'x' * 4096, 'docs/readme.md': 'docs\n'}, 'first')
+    commit(work, {'assets/logo.bin': 'y' * 4096}, 'second')
+    git('tag', '-a', 'v1.0', '-m', 'v1.0', cwd=work)
+    git('checkout', '-q', '-b', 'dev', cwd=work)
+    commit(work, {'src/dev.py': 'dev\n'}, 'dev')
+    git('checkout', '-q', 'main', cwd=work)
+
+    bare = os.path.join(root, 'monorepo.git')
+    git('clone', '-q', '--bare', work, bare)
+    git('config', 'uploadpack.allowFilter', 'true', cwd=bare)
+    server = GitHTTPServer(root)
+    server.work = work
+    yield server
+    server.close()
+
+
+def pull(scm, git_server, destination, branch='main', mode=PULL_MODE_FULL, filter=None, sparse_paths=None):
+    scm.pull_repo('NullMode', 'monorepo', f"{git_server.url}/monorepo.git", branch, str(destination), mode, 1,
+                  filter=filter, sparse_paths=sparse_paths)
+    return os.path.join(str(destination), 'monorepo')
+
+
+def checked_out(folder):
+    return sorted(os.path.relpath(os.path.join(path, name), folder) for path, folders, names in os.walk(folder)
+                  if '.git' not in path.split(os.sep) for name in names)
+
+
+def missing_objects(folder):
+    return git('rev-list', '--objects', '--all', '--missing=print', cwd=folder).count('\n?')
+
+
+@pytest.mark.unit
+class TestGithubPartialClone:
+    def test_sparse_blobless(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, sparse_paths=['src/', 'docs/'])
+
+        assert is_repo_on_branch(folder, 'main')
+        assert checked_out(folder) == ['docs/readme.md', 'src/app.py']
+        # Neither version of the asset (nor dev.py) was downloaded
+        assert missing_objects(folder) == 3
+        assert git('config', 'remote.origin.partialclonefilter', cwd=folder) == 'blob:none'
+
+    def test_blobless_full_checkout(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, filter=PULL_FILTER_BLOBLESS)
+        assert checked_out(folder) == ['assets/logo.bin', 'docs/readme.md', 'src/app.py']
+        assert missing_objects(folder) == 2
+
+    def test_treeless_tag(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, 'v1.0', PULL_MODE_TAG, PULL_FILTER_TREELESS, ['src/'])
+        assert is_repo_at_tag(folder, 'v1.0')
+        assert checked_out(folder) == ['src/app.py']
+        assert git('config', 'remote.origin.partialclonefilter', cwd=folder) == 'tree:0'
+
+    def test_all_branches(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, '*', sparse_paths=['src/'])
+        assert git('for-each-ref', '--format=%(refname:short)', 'refs/heads', cwd=folder).split() == ['dev', 'main']
+
+    def test_missing_branch_skipped(self, scm, git_server, tmp_path):
+        with pytest.raises(PullSkipped):
+            pull(scm, git_server, tmp_path, 'missing', sparse_paths=['src/'])
+        assert not os.path.exists(tmp_path / 'monorepo')
+
+    def test_sync_partial_clone(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, mode=PULL_MODE_SHALLOW, sparse_paths=['src/'])
+        commit(git_server.work, {'src/app.py': 'app 2\n', 'assets/logo.bin': 'z' * 4096}, 'third')
+        git('push', '-q', os.path.join(os.path.dirname(git_server.work), 'monorepo.git'), 'main', cwd=git_server.work)
+
+        old, new = scm.sync_repo('NullMode', 'monorepo', f"{git_server.url}/monorepo.git", 'main', str(tmp_path),
+                                 PULL_MODE_SHALLOW, 1)
+        assert old != new and new == git('rev-parse', 'main', cwd=git_server.work)
+        assert checked_out(folder) == ['src/app.py']
+        with open(os.path.join(folder, 'src', 'app.py')) as file:
+            assert file.read() == 'app 2\n'
+
+        # New sparse paths replace the ones checked out
+        scm.sync_repo('NullMode', 'monorepo', f"{git_server.url}/monorepo.git", 'main', str(tmp_path),
+                      PULL_MODE_SHALLOW, 1, sparse_paths=['docs/'])
+        assert checked_out(folder) == ['docs/readme.md']
@@ -0,0 +1,82 @@
+import os
+import pygit2
+import pytest
+
+from scm.scm import PullSkipped, PULL_MODE_FULL, PULL_MODE_SINGLE_BRANCH, PULL_MODE_SHALLOW, PULL_MODE_TAG
+from tests.conftest import folder_exits
+from benchmarks.git_http_server import GitHTTPServer, make_repo
+from utils.git_helpers import is_repo_on_branch, is_repo_at_tag, get_branch_list
+
+
+@pytest.fixture(scope='module')
+def git_server(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('remote'))
+    make_repo(root, 'branches', {'main': 3, 'main2': 2, 'main3': 1}, {'0.0.1': 'main', '0.0.2': 'main2'})
+    server = GitHTTPServer(root)
+    yield server
+    server.close()
+
+
+def pull(scm, git_server, destination, branch, mode=PULL_MODE_FULL, depth=1):
+    scm.pull_repo('NullMode', 'branches', f"{git_server.url}/branches.git", branch, str(destination), mode, depth)
+    return os.path.join(str(destination), 'branches')
+
+
+def remote_refs(folder):
+    return sorted(ref for ref in pygit2.Repository(folder).references if not ref.startswith('refs/heads/'))
+
+
+@pytest.mark.unit
+class TestGithubPullRepo:
+    def test_full_branch(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, 'main2')
+        assert is_repo_on_branch(folder, 'main2')
+        assert 'refs/remotes/origin/main3' in remote_refs(folder)
+
+    def test_full_tag_fetches_branches_and_only_requested_tag(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, '0.0.1')
+        assert is_repo_at_tag(folder, '0.0.1')
+        assert 'refs/remotes/origin/main3' in remote_refs(folder)
+
+    def test_all_branches(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, '*')
+        assert get_branch_list(folder) == 3
+
+    def test_single_branch(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, 'main2', PULL_MODE_SINGLE_BRANCH)
+        repo = pygit2.Repository(folder)
+
+        assert is_repo_on_branch(folder, 'main2')
+        assert [ref for ref in remote_refs(folder) if ref.startswith('refs/remotes/')] == ['refs/remotes/origin/main2']
+        assert repo.branches.local['main2'].upstream_name == 'refs/remotes/origin/main2'
+        assert repo.remotes['origin'].fetch_refspecs == ['+refs/heads/main2:refs/remotes/origin/main2']
+        assert len(list(repo.walk(repo.head.target))) == 5
+        assert not repo.is_shallow
+
+    def test_shallow(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, 'main', PULL_MODE_SHALLOW, depth=2)
+        repo = pygit2.Repository(folder)
+
+        assert is_repo_on_branch(folder, 'main')
+        assert repo.is_shallow
+        assert len(list(repo.walk(repo.head.target))) == 2
+
+    def test_shallow_tag(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, '0.0.2', PULL_MODE_SHALLOW)
+        assert is_repo_at_tag(folder, '0.0.2')
+        assert pygit2.Repository(folder).is_shallow
+
+    def test_tag_only(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, '0.0.2', PULL_MODE_TAG)
+        assert is_repo_at_tag(folder, '0.0.2')
+        assert remote_refs(folder) == ['refs/tags/0.0.2']
+
+    def test_tag_mode_ignores_branches(self, scm, git_server, tmp_path):
+        with pytest.raises(PullSkipped, match="No branch or tag 'main'"):
+            pull(scm, git_server, tmp_path, 'main', PULL_MODE_TAG)
+        assert not folder_exits(os.path.join(str(tmp_path), 'branches'))
+
+    def test_missing_ref_skipped(self, scm, git_server, tmp_path):
+        with pytest.raises(PullSkipped):
+            pull(scm, git_server, tmp_path, 'nope', PULL_MODE_SINGLE_BRANCH)
+        assert not folder_exits(os.path.join(str(tmp_path), 'branches'))
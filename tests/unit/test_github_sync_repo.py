@@ -0,0 +1,120 @@
+import os
+import pygit2
+import pytest
+
+from scm.github import is_same_remote
+from scm.scm import PullError, PULL_MODE_FULL, PULL_MODE_SHALLOW
+from benchmarks.git_http_server import GitHTTPServer, make_repo, git
+from utils.git_helpers import is_repo_on_branch, is_repo_at_tag
+from utils.journal import PullJournal
+from utils.pull import PullJob, run_pull_jobs, PULL_UPDATED, PULL_UP_TO_DATE, PULL_FAILED
+
+
+@pytest.fixture
+def remote(tmp_path):
+    root = str(tmp_path / 'remote')
+    os.makedirs(root)
+    make_repo(root, 'app', {'main': 2, 'dev': 1}, {'1.0': 'main'})
+    server = GitHTTPServer(root)
+    server.root = root
+    yield server
+    server.close()
+
+
+def push(remote, branch, message, tag=None):
+    work = os.path.join(remote.root, 'app-work')
+    git('checkout', '-q', branch, cwd=work)
+    with open(os.path.join(work, f"{branch}.txt"), 'a') as file:
+        file.write(f"{message}\n")
+    git('commit', '-q', '-am', message, cwd=work)
+    if tag:
+        git('tag', '-a', tag, '-m', tag, cwd=work)
+    git('push', '-q', '--force', '--tags', os.path.join(remote.root, 'app.git'), branch, cwd=work)
+    return git('rev-parse', 'HEAD', cwd=work)
+
+
+def run(scm, remote, destination, branch, mode=PULL_MODE_FULL, sync=True):
+    job = PullJob('NullMode', 'app', f"{remote.url}/app.git", branch, mode)
+    return run_pull_jobs(scm, [job], str(destination), 1, PullJournal(str(destination)), sync)[0]
+
+
+@pytest.mark.unit
+class TestGithubSyncRepo:
+    def test_fast_forward_branch(self, scm, remote, tmp_path):
+        run(scm, remote, tmp_path, 'main')
+        old = str(pygit2.Repository(str(tmp_path / 'app')).head.target)
+
+        assert run(scm, remote, tmp_path, 'main').status == PULL_UP_TO_DATE
+
+        new = push(remote, 'main', 'main 2')
+        result = run(scm, remote, tmp_path, 'main')
+        assert result.status == PULL_UPDATED
+        assert (result.old_commit, result.new_commit) == (old, new)
+        assert result.reason == f"{old[:7]} -> {new[:7]}"
+        assert is_repo_on_branch(str(tmp_path / 'app'), 'main')
+        assert 'main 2' in (tmp_path / 'app' / 'main.txt').read_text()
+        assert PullJournal(str(tmp_path)).get('app')['commit'] == new
+
+    def test_rewritten_history_checked_out(self, scm, remote, tmp_path):
+        run(scm, remote, tmp_path, 'main')
+        work = os.path.join(remote.root, 'app-work')
+        git('checkout', '-q', 'main', cwd=work)
+        git('reset', '-q', '--hard', 'HEAD~1', cwd=work)
+        new = push(remote, 'main', 'rewritten')
+
+        result = run(scm, remote, tmp_path, 'main')
+        assert result.status == PULL_UPDATED
+        assert str(pygit2.Repository(str(tmp_path / 'app')).head.target) == new
+
+    def test_switch_to_branch_and_tag(self, scm, remote, tmp_path):
+        run(scm, remote, tmp_path, 'main')
+        new = push(remote, 'dev', 'dev 1', tag='2.0')
+
+        assert run(scm, remote, tmp_path, 'dev').new_commit == new
+        assert is_repo_on_branch(str(tmp_path / 'app'), 'dev')
+
+        assert run(scm, remote, tmp_path, '2.0').status == PULL_UP_TO_DATE
+        assert is_repo_at_tag(str(tmp_path / 'app'), '2.0')
+
+    def test_shallow(self, scm, remote, tmp_path):
+        run(scm, remote, tmp_path, 'main', PULL_MODE_SHALLOW)
+        new = push(remote, 'main', 'main 2')
+
+        assert run(scm, remote, tmp_path, 'main', PULL_MODE_SHALLOW).new_commit == new
+        assert pygit2.Repository(str(tmp_path / 'app')).is_shallow
+
+    def test_local_changes_left_alone(self, scm, remote, tmp_path):
+        run(scm, remote, tmp_path, 'main')
+        push(remote, 'main', 'main 2')
+        (tmp_path / 'app' / 'main.txt').write_text('edited')
+
+        result = run(scm, remote, tmp_path, 'main')
+        assert result.status == PULL_FAILED
+        assert 'local changes' in result.reason
+        assert (tmp_path / 'app' / 'main.txt').read_text() == 'edited'
+
+    def test_other_remote_left_alone(self, scm, remote, tmp_path):
+        pygit2.init_repository(str(tmp_path / 'app'))
+        pygit2.Repository(str(tmp_path / 'app')).remotes.create('origin', 'https://github.com/Other/app.git')
+
+        result = run(scm, remote, tmp_path, 'main')
+        assert result.status == PULL_FAILED
+        assert 'is not a clone of' in result.reason
+        assert os.path.isdir(tmp_path / 'app')
+
+        # The folder still isn't touched by a later run
+        assert 'is not a clone of' in run(scm, remote, tmp_path, 'main').reason
+
+    def test_direct_sync_requires_repo(self, scm, remote, tmp_path):
+        os.makedirs(tmp_path / 'app')
+        with pytest.raises(PullError):
+            scm.sync_repo('NullMode', 'app', f"{remote.url}/app.git", 'main', str(tmp_path))
+
+
+@pytest.mark.unit
+class TestIsSameRemote:
+    def test_equivalent_urls(self):
+        assert is_same_remote('https://github.com/NullMode/App.git', 'https://x-access-token@github.com/nullmode/app/')
+
+    def test_different_urls(self):
+        assert not is_same_remote('https://github.com/NullMode/app.git', 'https://github.com/NullMode/app2.git')
@@ -0,0 +1,69 @@
+import pytest
+
+from datetime import datetime
+from codetriage import triage
+from tests.unit.fake_github import FakeRepo, make_scm
+from utils.output import Output, Row, RowConfiguration, TriageFile
+
+
+def load(path):
+    return {row.name: row for row in TriageFile(str(path), RowConfiguration()).get_data()}
+
+
+@pytest.mark.unit
+class TestIncrementalTriage:
+    @pytest.fixture
+    def previous_sheet(self, tmp_path):
+        # First triage, then mark it up like a reviewer would
+        path = tmp_path / 'triage.csv'
+        repos = [FakeRepo('unchanged', branches=['main', 'dev']), FakeRepo('pushed'), FakeRepo('removed')]
+        triage('NullMode', make_scm(repos), str(path))
+
+        rows = load(path)
+        row_config = RowConfiguration()
+        output = Output(row_config, str(path), overwrite=True)
+        for row in rows.values():
+            row.pull = 'Y'
+            row.pull_branch_tag = 'dev'
+            row.notes = f"reviewed {row.name}"
+            output.add_row(row)
+        output.write()
+        return path
+
+    def test_only_changed_repos_refreshed(self, previous_sheet):
+        later = datetime(2024, 6, 1, 9, 30, 0)
+        unchanged = FakeRepo('unchanged', branches=['main', 'dev'])
+        pushed = FakeRepo('pushed', branches=['main', 'feature'], pushed_at=later)
+        new = FakeRepo('new')
+
+        triage('NullMode', make_scm([unchanged, pushed, new]), str(previous_sheet), str(previous_sheet))
+        rows = load(previous_sheet)
+
+        assert list(rows) == ['unchanged', 'pushed', 'new']
+        assert unchanged.calls == []
+        assert 'get_branches' in pushed.calls
+
+        assert rows['unchanged'].branch_list == 'main,dev'
+        assert rows['unchanged'].notes == 'reviewed unchanged'
+
+        assert rows['pushed'].branch_list == 'main,feature'
+        assert rows['pushed'].last_pushed == '2024-06-01 09:30:00'
+        assert (rows['pushed'].pull, rows['pushed'].pull_branch_tag, rows['pushed'].notes) == \
+               ('Y', 'dev', 'reviewed pushed')
+
+        assert (rows['new'].pull, rows['new'].notes) == ('', '')
+
+    def test_sheet_without_last_pushed_refreshes(self, tmp_path):
+        path = tmp_path / 'old.csv'
+        row_config = RowConfiguration()
+        output = Output(row_config, str(path))
+        row = Row(row_config)
+        row.name = 'repo'
+        row.owner = 'NullMode'
+        row.last_updated = '2024-01-01 12:00:00'
+        output.add_row(row)
+        output.write()
+
+        repo = FakeRepo('repo')
+        triage('NullMode', make_scm([repo]), str(tmp_path / 'new.csv'), str(path))
+        assert 'get_branches' in repo.calls
@@ -0,0 +1,106 @@
+import os
+import pygit2
+import pytest
+
+from scm.mirror import MirrorCache
+from scm.scm import PULL_MODE_FULL, PULL_MODE_SINGLE_BRANCH, PULL_MODE_TAG, PULL_MODE_SHALLOW
+from benchmarks.git_http_server import GitHTTPServer, make_repo, git
+from utils.git_helpers import is_repo_on_branch, is_repo_at_tag
+
+
+@pytest.fixture(scope='module')
+def git_server(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('remote'))
+    upstream = make_repo(root, 'vim', {'main': 20, 'dev': 2}, {'v1.0': 'main'})
+    # A fork with one commit of its own on main
+    work = os.path.join(root, 'fork-work')
+    git('clone', '-q', '-b', 'main', upstream, work)
+    with open(os.path.join(work, 'fork.txt'), 'w') as file:
+        file.write('fork\n')
+    git('add', '.', cwd=work)
+    git('commit', '-q', '-m', 'fork', cwd=work)
+    git('clone', '-q', '--bare', work, os.path.join(root, 'vim-fork.git'))
+    server = GitHTTPServer(root)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def scm(scm, tmp_path):
+    scm.mirrors = MirrorCache(str(tmp_path / 'mirrors'))
+    scm.networks = {'upstream/vim': 'upstream/vim', 'client/vim': 'upstream/vim'}
+    yield scm
+    scm.mirrors.close()
+
+
+def pull(scm, git_server, destination, owner, name, branch='main', mode=PULL_MODE_FULL):
+    scm.pull_repo(owner, 'vim', f"{git_server.url}/{name}.git", branch, str(destination), mode, 1)
+    return os.path.join(str(destination), 'vim')
+
+
+def local_objects(folder):
+    objects = os.path.join(folder, '.git', 'objects')
+    return [name for path, _, names in os.walk(objects) for name in names if 'info' not in path]
+
+
+def history(folder):
+    repo = pygit2.Repository(folder)
+    return [commit.message.strip() for commit in repo.walk(repo.head.target)]
+
+
+@pytest.mark.unit
+class TestMirrorCache:
+    def test_forks_share_a_mirror(self, scm, git_server, tmp_path):
+        upstream = pull(scm, git_server, tmp_path / 'a', 'upstream', 'vim')
+        fork = pull(scm, git_server, tmp_path / 'b', 'client', 'vim-fork')
+
+        assert is_repo_on_branch(upstream, 'main') and is_repo_on_branch(fork, 'main')
+        assert history(fork)[0] == 'fork' and len(history(fork)) == 21
+        # The clones borrow every object from the one mirror of the network
+        assert local_objects(upstream) == [] and local_objects(fork) == []
+        mirror = pygit2.Repository(scm.mirrors.get_mirror_path('upstream/vim'))
+        assert {'refs/forks/upstream/vim/heads/main', 'refs/forks/client/vim/heads/main',
+                'refs/forks/client/vim/tags/v1.0'} <= set(mirror.references)
+        assert len(os.listdir(scm.mirrors.folder)) == 2  # The upstream owner's folder and the index
+
+    def test_tag_and_single_branch_pulls_not_mirrored(self, scm, git_server, tmp_path):
+        # The mirror would fetch every branch and tag rather than the one ref asked for
+        folder = pull(scm, git_server, tmp_path / 'a', 'upstream', 'vim', 'v1.0', PULL_MODE_TAG)
+        assert is_repo_at_tag(folder, 'v1.0')
+        folder = pull(scm, git_server, tmp_path / 'b', 'upstream', 'vim', 'dev', PULL_MODE_SINGLE_BRANCH)
+        assert is_repo_on_branch(folder, 'dev')
+        assert scm.mirrors.size() == 0
+
+    def test_shallow_pull_not_mirrored(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, 'upstream', 'vim', mode=PULL_MODE_SHALLOW)
+        assert len(history(folder)) == 1
+        assert scm.mirrors.size() == 0
+
+    def test_evicted_mirror_dissociates_clones(self, scm, git_server, tmp_path):
+        folder = pull(scm, git_server, tmp_path, 'upstream', 'vim')
+        assert scm.mirrors.size() > 0
+
+        scm.mirrors.max_size = 0
+        assert scm.mirrors.evict() == ['upstream/vim']
+        assert not os.path.exists(scm.mirrors.get_mirror_path('upstream/vim'))
+        assert not os.path.exists(os.path.join(folder, '.git', 'objects', 'info', 'alternates'))
+        assert len(history(folder)) == 20
+        assert pygit2.Repository(folder).revparse_single('v1.0^{tree}')
+
+    def test_mirror_in_use_not_removed(self, scm, git_server, tmp_path):
+        clone_url = f"{git_server.url}/vim.git"
+        with scm.mirrors.use('upstream/vim', 'upstream', 'vim', clone_url):
+            # Another worker's eviction pass leaves the mirror while it is borrowed from
+            assert scm.mirrors.remove('upstream/vim') is False
+            assert scm.mirrors.evict(max_size=0) == []
+        # Or while it is being fetched into
+        with scm.mirrors.get_network_lock('upstream/vim'):
+            assert scm.mirrors.remove('upstream/vim') is False
+        assert os.path.exists(scm.mirrors.get_mirror_path('upstream/vim'))
+        assert scm.mirrors.remove('upstream/vim') is True
+
+    def test_prune(self, scm, git_server, tmp_path):
+        pull(scm, git_server, tmp_path, 'upstream', 'vim')
+        assert scm.mirrors.prune(max_age=3600) == []
+        assert scm.mirrors.prune(max_age=0) == ['upstream/vim']
+        assert scm.mirrors.size() == 0
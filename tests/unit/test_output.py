@@ -0,0 +1,153 @@
+import os
+import pytest
+
+from utils.output import Output, Row, RowConfiguration, TriageFile, PARTIAL_SUFFIX
+
+
+def make_row(row_config, name):
+    row = Row(row_config)
+    row.name = name
+    row.owner = 'NullMode'
+    return row
+
+
+@pytest.mark.unit
+class TestOutput:
+    def test_rows_flushed_while_streaming(self, tmp_path):
+        path = str(tmp_path / 'triage.csv')
+        row_config = RowConfiguration()
+        output = Output(row_config, path, flush_rows=2)
+
+        for name in ('repo0', 'repo1', 'repo2'):
+            output.add_row(make_row(row_config, name))
+
+        # A crash now leaves the header and the flushed rows behind
+        with open(path + PARTIAL_SUFFIX) as file:
+            lines = file.read().splitlines()
+        assert len(lines) == 3
+        assert lines[2].startswith('repo1,NullMode')
+        assert not os.path.exists(path)
+
+        output.write()
+        assert [row.name for row in TriageFile(path, row_config).get_data()] == ['repo0', 'repo1', 'repo2']
+        assert not os.path.exists(path + PARTIAL_SUFFIX)
+        assert output.row_count == 3
+
+    def test_previous_file_kept_until_written(self, tmp_path):
+        path = str(tmp_path / 'triage.csv')
+        row_config = RowConfiguration()
+        output = Output(row_config, path)
+        output.add_row(make_row(row_config, 'old'))
+        output.write()
+
+        output = Output(row_config, path, overwrite=True)
+        output.add_row(make_row(row_config, 'new'))
+        assert [row.name for row in TriageFile(path, row_config).get_data()] == ['old']
+
+        output.write()
+        assert [row.name for row in TriageFile(path, row_config).get_data()] == ['new']
+
+    def test_disabled_columns_not_written(self, tmp_path):
+        path = str(tmp_path / 'triage.csv')
+        row_config = RowConfiguration(['description', 'Fork'])
+        row = make_row(row_config, 'repo0')
+        row.fork = True
+        row.branch_list = 'main'
+        output = Output(row_config, path)
+        output.add_row(row)
+        output.write()
+
+        with open(path) as file:
+            header = file.readline().strip().split(',')
+        assert header == ['Name', 'Owner', 'Pull (Y/N)', 'Pull Branch/Tag', 'Pull Mode', 'Sparse Paths', 'Notes',
+                          'Fork', 'Description', 'Last Updated', 'Last Pushed', 'Clone URL', 'Default Branch',
+                          'Size (KB)']
+        loaded, = TriageFile(path, RowConfiguration()).get_data()
+        assert (loaded.name, loaded.fork, loaded.branch_list) == ('repo0', True, '')
+
+    def test_empty_output_has_header(self, tmp_path):
+        path = str(tmp_path / 'triage.csv')
+        Output(RowConfiguration(), path).write()
+        with open(path) as file:
+            assert file.read().startswith('Name,Owner')
+
+
+@pytest.mark.unit
+class TestRowConfiguration:
+    def test_details_for_enabled_columns(self):
+        assert RowConfiguration().get_details() == {'branches', 'tags', 'empty'}
+        assert RowConfiguration(['latest_tag']).get_details() == {'tags'}
+        assert RowConfiguration([]).get_details() == set()
+
+    def test_columns_enabled_per_configuration(self):
+        row_config = RowConfiguration(['url'])
+        assert not row_config.branch_list.enabled
+        assert RowConfiguration().branch_list.enabled
+
+    def test_unknown_column(self):
+        with pytest.raises(ValueError, match="Unknown column 'stars'"):
+            RowConfiguration(['stars'])
+
+
+@pytest.mark.unit
+class TestRow:
+    def test_defaults_and_types(self):
+        row_config = RowConfiguration()
+        row = Row(row_config)
+        assert (row.name, row.empty, row.forks) == ('', False, 0)
+
+        row.forks = 3
+        assert row.forks == 3
+        assert Row(row_config).forks == 0
+
+        with pytest.raises(TypeError, match="Expected <class 'int'> for 'forks'"):
+            row.forks = '3'
+
+    def test_no_instance_dict(self):
+        row = Row(RowConfiguration())
+        with pytest.raises(AttributeError):
+            row.unknown = 'value'
+
+
+@pytest.mark.unit
+class TestTriageFile:
+    def write(self, tmp_path, text):
+        path = tmp_path / 'triage.csv'
+        path.write_text(text)
+        return str(path)
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / 'triage.csv')
+        row_config = RowConfiguration()
+        output = Output(row_config, path)
+        row = make_row(row_config, 'repo')
+        row.fork = True
+        row.forks = 4
+        row.description = 'a, "quoted" description'
+        output.add_row(row)
+        output.write()
+
+        loaded = TriageFile(path, row_config).get_data()[0]
+        assert (loaded.name, loaded.fork, loaded.empty, loaded.forks, loaded.description) == \
+               ('repo', True, False, 4, 'a, "quoted" description')
+
+    def test_columns_reordered_missing_and_unknown(self, tmp_path):
+        path = self.write(tmp_path, 'Forks,Extra,Name,Fork\n3,x,repo,TRUE\n,x,short\n')
+        first, second = TriageFile(path, RowConfiguration()).get_data()
+
+        assert (first.name, first.forks, first.fork, first.last_pushed) == ('repo', 3, True, '')
+        assert (second.name, second.forks, second.fork) == ('short', 0, False)
+
+    def test_bad_value_uses_default(self, tmp_path, caplog):
+        path = self.write(tmp_path, 'Name,Forks\nrepo,many\n')
+        row = TriageFile(path, RowConfiguration()).get_data()[0]
+
+        assert row.forks == 0
+        assert "Error converting value 'many'" in caplog.text
+
+    def test_lazy(self, tmp_path):
+        path = self.write(tmp_path, 'Name,Pull (Y/N)\nrepo0,Y\nrepo1,\n')
+        triage_file = TriageFile(path, RowConfiguration(), lazy=True)
+
+        assert triage_file.get_data() == []
+        assert [(row.name, row.pull) for row in triage_file.iter_data()] == [('repo0', 'Y'), ('repo1', '')]
@@ -0,0 +1,97 @@
+import json
+import pytest
+
+from utils.output import Output, Row, RowConfiguration, RowHeader, TriageFile, get_format, PARTIAL_SUFFIX
+
+
+def make_rows(row_config):
+    rows = []
+    for i in range(3):
+        row = Row(row_config)
+        row.name = f"repo{i}"
+        row.owner = 'NullMode'
+        row.pull = 'Y' if i else ''
+        row.fork = i == 1
+        row.forks = i * 10
+        row.branch_list = 'main,dev'
+        row.latest_tag = '0.0.1'
+        rows.append(row)
+    return rows
+
+
+def write(path, rows, row_config, **kwargs):
+    output = Output(row_config, str(path), **kwargs)
+    for row in rows:
+        output.add_row(row)
+    output.write()
+
+
+@pytest.mark.unit
+class TestOutputFormats:
+    @pytest.mark.parametrize('extension, module', [('csv', None), ('jsonl', None), ('xlsx', 'openpyxl'),
+                                                   ('parquet', 'pyarrow')])
+    def test_round_trip(self, tmp_path, extension, module):
+        if module:
+            pytest.importorskip(module)
+        row_config = RowConfiguration()
+        path = tmp_path / f"triage.{extension}"
+        write(path, make_rows(row_config), row_config)
+
+        loaded = TriageFile(str(path), row_config).get_data()
+        assert [row._values for row in loaded] == [row._values for row in make_rows(row_config)]
+
+        lazy = TriageFile(str(path), row_config, lazy=True)
+        assert [row.name for row in lazy.iter_data()] == ['repo0', 'repo1', 'repo2']
+
+    def test_format_from_extension(self):
+        assert get_format('triage.XLSX') == 'xlsx'
+        assert get_format('triage.txt') == 'csv'
+        assert get_format('triage.csv', 'jsonl') == 'jsonl'
+
+    def test_jsonl_streamed_by_key(self, tmp_path):
+        row_config = RowConfiguration()
+        path = tmp_path / 'triage.jsonl'
+        output = Output(row_config, str(path), flush_rows=1)
+        output.add_row(make_rows(row_config)[1])
+
+        with open(str(path) + PARTIAL_SUFFIX) as file:
+            record = json.loads(file.readline())
+        assert (record['name'], record['fork'], record['forks'], record['branch_list']) == \
+               ('repo1', True, 10, 'main,dev')
+        output.write()
+
+    def test_jsonl_values_coerced(self, tmp_path):
+        path = tmp_path / 'triage.jsonl'
+        path.write_text('{"name": "repo", "forks": "3", "fork": "TRUE", "latest_tag": 1.0, "unknown": 1}\n\n')
+        row = TriageFile(str(path), RowConfiguration()).get_data()[0]
+        assert (row.name, row.forks, row.fork, row.latest_tag, row.notes) == ('repo', 3, True, '1.0', '')
+
+    def test_xlsx_sheet_features(self, tmp_path):
+        openpyxl = pytest.importorskip('openpyxl')
+        row_config = RowConfiguration()
+        row_config.clone_url = RowHeader(label='Clone URL', hidden=True)
+        path = tmp_path / 'triage.xlsx'
+        write(path, make_rows(row_config), row_config)
+
+        sheet = openpyxl.load_workbook(str(path)).active
+        assert sheet.freeze_panes == 'A2'
+        assert sheet.column_dimensions['Q'].hidden
+        assert [cell.value for cell in sheet[1]][16] == 'Clone URL'
+        validations = {str(validation.sqref): validation.formula1 for validation in sheet.data_validations.dataValidation}
+        assert validations['C2:C1048576'] == '"Y,N"'
+        assert validations['E2:E1048576'] == '"full,single-branch,shallow,tag,archive"'
+        assert sheet['J3'].value is True
+        assert sheet['L3'].value == 10
+
+    def test_parquet_schema(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        import pyarrow.parquet
+
+        row_config = RowConfiguration()
+        path = tmp_path / 'triage.parquet'
+        write(path, make_rows(row_config), row_config)
+
+        schema = pyarrow.parquet.read_schema(str(path))
+        assert schema.names == list(row_config.keys)
+        assert str(schema.field('forks').type) == 'int64'
+        assert str(schema.field('fork').type) == 'bool'
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import pytest
+
+from codetriage import triage
+from scm.profiler import Profiler, profiler, NULL_SPAN
+from tests.unit.fake_github import FakeClock, make_server_scm
+from utils.output import RowConfiguration, TriageFile
+
+
+@pytest.fixture
+def enabled_profiler():
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+    profiler.reset()
+
+
+@pytest.mark.unit
+class TestProfiler:
+    def test_disabled_records_nothing(self):
+        recorder = Profiler()
+        assert recorder.span('github.get_repos') is NULL_SPAN
+        recorder.count('api.requests')
+        assert recorder.spans == [] and recorder.counters == {}
+
+    def test_trace_and_summary(self, tmp_path):
+        clock = FakeClock()
+        recorder = Profiler(clock)
+        recorder.enable()
+        with recorder.span('github.get_repos'):
+            for repo, duration in (('app', 0.5), ('monorepo', 2.0)):
+                with recorder.span('github.get_tags_info', repo):
+                    clock.now += duration
+                recorder.count('api.requests')
+        recorder.write_trace(str(tmp_path / 'trace.json'))
+
+        with open(tmp_path / 'trace.json') as file:
+            events = json.load(file)['traceEvents']
+        assert [event['ph'] for event in events] == ['M', 'X', 'X', 'X', 'C', 'C']
+        tags, = [event for event in events if event.get('args') == {'repo': 'monorepo'}]
+        assert (tags['name'], tags['cat'], tags['ts'], tags['dur']) == ('github.get_tags_info', 'github', 5e5, 2e6)
+        assert events[-1]['args'] == {'api.requests': 2}
+
+        lines = recorder.format_summary().splitlines()
+        assert lines[2].split() == ['github.get_repos', '1', '2.50s', '2500.0ms', '2.50s']
+        assert lines[3].split() == ['github.get_tags_info', '2', '2.50s', '1250.0ms', '2.00s']
+        assert lines[7].split() == ['monorepo', 'github.get_tags_info', '2.00s']
+        assert lines[-1].split() == ['api.requests', '2']
+
+    def test_timed_generators_and_coroutines(self, enabled_profiler):
+        @profiler.timed('test.items', lambda count: f"repo{count}")
+        def items(count):
+            yield from range(count)
+
+        @profiler.timed('test.wait')
+        async def wait():
+            await asyncio.sleep(0)
+            return 'done'
+
+        assert list(items(3)) == [0, 1, 2]
+        assert asyncio.run(wait()) == 'done'
+        assert [(name, repo) for name, repo, *_ in profiler.spans] == [('test.items', 'repo3'), ('test.wait', None)]
+
+    def test_triage_instrumented(self, enabled_profiler, server, tmp_path):
+        server.add_repo('app', tags=['v1.0'])
+        server.add_repo('docs')
+        triage('NullMode', make_server_scm(server), str(tmp_path / 'triage.csv'), overwrite=True)
+        TriageFile(str(tmp_path / 'triage.csv'), RowConfiguration())
+
+        calls = {(name, repo) for name, repo, *_ in profiler.spans}
+        assert {('codetriage.triage', None), ('github.get_repos', None), ('github.get_tags_info', 'app'),
+                ('github.get_branches', 'docs'), ('github.is_repo_empty', 'docs'), ('output.write', None),
+                ('triage_file.read_csv', None)} <= calls
+        assert profiler.counters['api.requests'] == len(server.requests)
+        assert profiler.counters['api.bytes'] > 0 and profiler.counters['output.rows'] == 2
@@ -0,0 +1,42 @@
+import pytest
+
+from scm.scm import PullError, PullSkipped
+from tests.unit.fake_github import FakeSCM
+from utils.pull import PullJob, run_pull_jobs, format_summary, PULL_SUCCESS, PULL_SKIPPED, PULL_FAILED
+
+
+def make_jobs(names):
+    return [PullJob('NullMode', name, f"https://github.com/NullMode/{name}.git", 'main') for name in names]
+
+
+@pytest.mark.unit
+class TestPullJobs:
+    def test_results_captured_per_repo(self, tmp_path):
+        scm = FakeSCM({
+            'empty': PullSkipped('empty not found or is empty'),
+            'broken': PullError('An error occurred cloning broken: timed out'),
+            'crash': SystemError('boom'),
+        })
+        results = run_pull_jobs(scm, make_jobs(['ok', 'empty', 'broken', 'crash', 'ok2']), str(tmp_path), 3)
+
+        assert [(result.job.name, result.status) for result in results] == [
+            ('ok', PULL_SUCCESS), ('empty', PULL_SKIPPED), ('broken', PULL_FAILED),
+            ('crash', PULL_FAILED), ('ok2', PULL_SUCCESS),
+        ]
+        assert results[1].reason == 'empty not found or is empty'
+        assert results[3].reason == 'SystemError: boom'
+
+    def test_jobs_limit_concurrency(self, tmp_path):
+        scm = FakeSCM({}, delay=0.02)
+        run_pull_jobs(scm, make_jobs([f"repo{i}" for i in range(8)]), str(tmp_path), 2)
+        assert scm.peak == 2
+
+    def test_summary_table(self, tmp_path):
+        scm = FakeSCM({'empty': PullSkipped('empty not found or is empty')})
+        summary = format_summary(run_pull_jobs(scm, make_jobs(['ok', 'empty']), str(tmp_path)))
+        lines = summary.splitlines()
+
+        assert lines[0].split() == ['Repo', 'Branch/Tag', 'Mode', 'Status', 'Time', 'Reason']
+        assert lines[2].startswith('NullMode/ok ')
+        assert 'skipped' in lines[3] and lines[3].endswith('empty not found or is empty')
+        assert lines[-1] == '1 success, 0 existing, 1 skipped, 0 failed'
@@ -0,0 +1,75 @@
+import json
+import os
+import pygit2
+import pytest
+
+from utils.journal import PullJournal, JOURNAL_FILE, STATE_DONE, STATE_FAILED, STATE_IN_PROGRESS, STATE_PENDING
+from utils.pull import PullJob, run_pull_jobs, PULL_SUCCESS, PULL_EXISTING, PULL_FAILED
+from scm.scm import PullError
+from tests.unit.fake_github import FakeSCM
+
+# A clone failing part way through, after the repository was created
+BROKEN = PullError("An error occurred cloning broken: connection reset")
+
+
+def make_jobs(names, branch='main'):
+    return [PullJob('NullMode', name, f"https://github.com/NullMode/{name}.git", branch) for name in names]
+
+
+def run(scm, destination, names, branch='main'):
+    return run_pull_jobs(scm, make_jobs(names, branch), str(destination), 2, PullJournal(str(destination)))
+
+
+@pytest.mark.unit
+class TestPullJournal:
+    def test_states_and_commits_recorded(self, tmp_path):
+        results = run(FakeSCM({'broken': BROKEN}), tmp_path, ['a', 'broken'])
+        assert [result.status for result in results] == [PULL_SUCCESS, PULL_FAILED]
+
+        with open(os.path.join(str(tmp_path), JOURNAL_FILE)) as file:
+            entries = json.load(file)['repos']
+        assert entries['a']['state'] == STATE_DONE
+        assert entries['a']['commit'] == str(pygit2.Repository(str(tmp_path / 'a')).head.target)
+        assert entries['broken']['state'] == STATE_FAILED
+        assert 'connection reset' in entries['broken']['reason']
+
+    def test_rerun_skips_done_and_retries_failed(self, tmp_path):
+        run(FakeSCM({'broken': BROKEN}), tmp_path, ['a', 'broken'])
+
+        scm = FakeSCM()
+        results = run(scm, tmp_path, ['a', 'broken'])
+        assert scm.pulled == ['broken']
+        assert [result.status for result in results] == [PULL_EXISTING, PULL_SUCCESS]
+        assert PullJournal(str(tmp_path)).get('broken')['state'] == STATE_DONE
+
+    def test_interrupted_clone_cleaned_up(self, tmp_path):
+        journal = PullJournal(str(tmp_path))
+        journal.set_state('a', STATE_IN_PROGRESS, branch='main', mode='full')
+        os.makedirs(tmp_path / 'a')
+        (tmp_path / 'a' / 'partial.pack').write_text('half written')
+
+        results = run(FakeSCM(), tmp_path, ['a'])
+        assert results[0].status == PULL_SUCCESS
+        assert not (tmp_path / 'a' / 'partial.pack').exists()
+
+    def test_changed_branch_pulled_again(self, tmp_path):
+        run(FakeSCM(), tmp_path, ['a'])
+        scm = FakeSCM()
+        run(scm, tmp_path, ['a'], branch='dev')
+        assert scm.pulled == ['a']
+
+    def test_unknown_folder_left_alone(self, tmp_path):
+        os.makedirs(tmp_path / 'a')
+        (tmp_path / 'a' / 'work.txt').write_text('not ours')
+
+        scm = FakeSCM()
+        results = run(scm, tmp_path, ['a'])
+        assert results[0].status == PULL_FAILED
+        assert 'not pulled by code triage' in results[0].reason
+        assert scm.pulled == []
+        assert (tmp_path / 'a' / 'work.txt').exists()
+
+    def test_pending_recorded(self, tmp_path):
+        journal = PullJournal(str(tmp_path))
+        journal.add_pending(make_jobs(['a']))
+        assert PullJournal(str(tmp_path)).get('a')['state'] == STATE_PENDING
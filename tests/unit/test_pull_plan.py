@@ -0,0 +1,90 @@
+import os
+import pytest
+
+import utils.plan
+from codetriage import pull
+from scm.scm import PULL_MODE_FULL, PULL_MODE_ARCHIVE
+from utils.output import Output, RowConfiguration, Row
+from utils.plan import PullPlan, get_makespan, ON_NO_SPACE_TRIM
+from utils.pull import PullJob, PULL_SUCCESS, PULL_SKIPPED
+
+MB = 1024 ** 2
+
+
+class RecordingSCM:
+    def __init__(self):
+        self.pulled = []
+
+    def pull_repo(self, owner, repo_name, clone_url, branch, destination_folder, mode, depth, **options):
+        self.pulled.append(repo_name)
+
+
+def make_job(name, size, mode=PULL_MODE_FULL):
+    return PullJob('NullMode', name, f"https://github.com/NullMode/{name}.git", 'main', mode, size=size)
+
+
+def write_sheet(path, sizes):
+    row_config = RowConfiguration()
+    output = Output(row_config, str(path))
+    for name, size in sizes.items():
+        row = Row(row_config)
+        row.name, row.owner, row.pull, row.size = name, 'NullMode', 'y', size
+        row.clone_url = f"https://github.com/NullMode/{name}.git"
+        row.default_branch = 'main'
+        output.add_row(row)
+    output.write()
+
+
+@pytest.fixture
+def free_space(monkeypatch):
+    # 100MB free in every destination
+    monkeypatch.setattr(utils.plan, 'get_free_space', lambda folder: 100 * MB)
+
+
+@pytest.mark.unit
+class TestPullPlan:
+    def test_largest_first(self, free_space, tmp_path):
+        os.makedirs(tmp_path / 'pulled')
+        jobs = [make_job('small', 1024), make_job('unknown', 0), make_job('large', 20 * 1024),
+                make_job('snapshot', 30 * 1024, PULL_MODE_ARCHIVE), make_job('pulled', 40 * 1024)]
+        plan = PullPlan(jobs, str(tmp_path), 2, min_free=0)
+
+        assert [job.name for job in plan.jobs] == ['large', 'snapshot', 'small', 'unknown', 'pulled']
+        # A clone takes up its history and a checkout, an archive just the files
+        assert plan.estimates['large'] == 40 * MB and plan.estimates['snapshot'] == 30 * MB
+        assert plan.total == 72 * MB and plan.fits()
+        assert [job.name for job in plan.unknown] == ['unknown']
+        assert 'on disk' in plan.format() and '1 repos of unknown size' in plan.format()
+
+    def test_makespan(self):
+        # Largest first balances the workers, smallest first leaves the largest for the end
+        assert get_makespan([7, 5, 4, 3, 1], 2) == 10
+        assert get_makespan([1, 3, 4, 5, 7], 2) == 12
+        assert get_makespan([], 4) == 0
+
+    def test_trim_keeps_the_smallest(self, free_space, tmp_path):
+        jobs = [make_job(f"repo{size}", size * 1024) for size in (10, 40, 5, 30)]
+        plan = PullPlan(jobs, str(tmp_path), 4, min_free=0, on_no_space=ON_NO_SPACE_TRIM)
+
+        assert [job.name for job in plan.jobs] == ['repo30', 'repo10', 'repo5']
+        assert [job.name for job in plan.skipped] == ['repo40']
+        assert plan.total == 90 * MB and plan.fits()
+
+    def test_pull_refused(self, free_space, tmp_path):
+        write_sheet(tmp_path / 'triage.csv', {'app': 10 * 1024, 'monorepo': 80 * 1024})
+        scm = RecordingSCM()
+
+        with pytest.raises(SystemExit):
+            pull(str(tmp_path / 'triage.csv'), scm, str(tmp_path / 'repos'))
+        assert scm.pulled == []
+
+    def test_pull_trimmed(self, free_space, tmp_path):
+        write_sheet(tmp_path / 'triage.csv', {'app': 10 * 1024, 'monorepo': 80 * 1024, 'lib': 20 * 1024})
+        scm = RecordingSCM()
+        results = pull(str(tmp_path / 'triage.csv'), scm, str(tmp_path / 'repos'), 1,
+                       min_free=10 * MB, on_no_space=ON_NO_SPACE_TRIM)
+
+        assert scm.pulled == ['lib', 'app']
+        assert [(result.job.name, result.status) for result in results] == [
+            ('app', PULL_SUCCESS), ('monorepo', PULL_SKIPPED), ('lib', PULL_SUCCESS)]
+        assert results[1].reason == 'Not enough disk space, 160.0MB estimated'
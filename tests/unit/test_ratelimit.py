@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+
+from github.GithubException import GithubException, RateLimitExceededException
+from scm.graphql import GraphQLError
+from scm.ratelimit import RateLimitScheduler
+from tests.unit.fake_github import FakeClock
+
+
+def make_scheduler(clock, **kwargs):
+    return RateLimitScheduler(clock=clock, sleep=clock.sleep, reserve=0, **kwargs)
+
+
+@pytest.mark.unit
+class TestRateLimitScheduler:
+    def test_headers_recorded(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.update(200, {'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4999',
+                               'X-RateLimit-Reset': '2000'})
+        assert (scheduler.limit, scheduler.remaining, scheduler.reset_at) == (5000, 4999, 2000)
+        assert scheduler.requests == 1
+
+    def test_no_delay_when_budget_covers_pending(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.add_pending(10)
+        scheduler.update(200, {'X-RateLimit-Remaining': '1000', 'X-RateLimit-Reset': '2000'})
+        assert scheduler.get_delay() == 0
+
+    def test_budget_spread_until_reset(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.add_pending(100)
+        # 40 requests left for 100 repos at 4 requests each, so 10 repos over the 1000s until reset
+        scheduler.update(200, {'X-RateLimit-Remaining': '40', 'X-RateLimit-Reset': '2000'})
+        delays = [scheduler.get_delay() for _ in range(3)]
+        assert delays == pytest.approx([0, 100, 200])
+
+    def test_exhausted_budget_waits_for_reset(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.update(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1100'})
+        assert 101 <= scheduler.get_delay() <= 105
+
+    def test_retry_after_blocks(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.update(403, {'Retry-After': '60'})
+        assert scheduler.get_delay() == pytest.approx(60)
+
+    def test_rate_limited_calls_retried(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        attempts = []
+
+        def task():
+            attempts.append(clock.now)
+            if len(attempts) < 3:
+                raise RateLimitExceededException(403, {'message': 'secondary rate limit'}, {'retry-after': '30'})
+            return 'done'
+
+        scheduler.add_pending()
+        assert scheduler.run(task) == 'done'
+        assert len(attempts) == 3
+        assert scheduler.retries == 2
+        assert all(30.5 <= delay <= 31.5 for delay in clock.sleeps)
+        assert (scheduler.pending, scheduler.completed) == (0, 1)
+
+    def test_graphql_rate_limit_retried(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        attempts = []
+
+        def task():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise GraphQLError('RATE_LIMITED', 429, {'x-ratelimit-remaining': '0', 'x-ratelimit-reset': '1010'})
+            return 'done'
+
+        assert scheduler.call(task) == 'done'
+        assert 10.5 <= clock.sleeps[0] <= 11.5
+
+    def test_other_errors_not_retried(self):
+        scheduler = make_scheduler(FakeClock())
+
+        def task():
+            raise GithubException(404, {'message': 'Not Found'}, {})
+
+        with pytest.raises(GithubException):
+            scheduler.call(task)
+        assert scheduler.retries == 0
+
+    def test_gives_up_after_max_attempts(self):
+        scheduler = make_scheduler(FakeClock(), max_attempts=2)
+
+        def task():
+            raise RateLimitExceededException(403, {'message': 'API rate limit exceeded'}, {})
+
+        with pytest.raises(RateLimitExceededException):
+            scheduler.call(task)
+        assert scheduler.retries == 1
+
+    def test_summary_reports_budget(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.update(200, {'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4000',
+                               'X-RateLimit-Reset': '1600'})
+        clock.now += 10
+        summary = scheduler.summary()
+        assert '1 requests (0.1/s' in summary
+        assert 'budget 4000/5000 remaining (resets in 590s)' in summary
+
+    def test_overlapping_waits_counted_once(self):
+        scheduler = RateLimitScheduler()
+
+        async def wait_together():
+            await asyncio.gather(*[scheduler.do_sleep_async(0.2) for _ in range(10)])
+
+        # Ten tasks waiting 0.2s at once hold the run back for 0.2s, not 2s
+        asyncio.run(wait_together())
+        assert 0.2 <= scheduler.slept < 0.5
+        assert scheduler.sleepers == 0
@@ -0,0 +1,122 @@
+import pytest
+import sqlite3
+
+from codetriage import triage, query
+from scm.github import Github
+from scm.scm import Repository, Branch, Tag
+from tests.unit.fake_github import FakeClient, FakeRepo
+from utils.index import RepositoryIndex, SCHEMA
+from utils.output import RowConfiguration, TriageFile
+
+
+def make_repo(name, owner='NullMode', default_branch='main', branches=('main',), tags=(), archived=False, fork=False):
+    return Repository(name, owner, default_branch, [Branch(branch) for branch in branches], False, archived, fork,
+                      'desc', 0, '2024-01-01 12:00:00', f"https://github.com/{owner}/{name}",
+                      f"https://github.com/{owner}/{name}.git", len(tags), tags[0] if tags else '',
+                      [Tag(tag) for tag in tags], 0, '2024-01-01 12:00:00')
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = RepositoryIndex(str(tmp_path / 'index.sqlite'))
+    yield index
+    index.close()
+
+
+@pytest.mark.unit
+class TestRepositoryIndex:
+    def test_round_trip(self, index):
+        index.upsert(make_repo('app', branches=('main', 'dev', 'a-feature'), tags=('0.0.2', '0.0.1')))
+        repo, = index.query()
+
+        assert (repo.name, repo.owner, repo.is_archived, repo.tag_count) == ('app', 'NullMode', False, 2)
+        assert [branch.name for branch in repo.branches] == ['main', 'dev', 'a-feature']
+        assert [tag.name for tag in repo.tags] == ['0.0.2', '0.0.1']
+
+    def test_columns_added_to_older_index(self, tmp_path):
+        path = str(tmp_path / 'index.sqlite')
+        db = sqlite3.connect(path)
+        db.executescript(SCHEMA.replace("    size INTEGER NOT NULL DEFAULT 0,\n", ''))
+        db.close()
+
+        index = RepositoryIndex(path)
+        repo = make_repo('app')
+        repo.size = 2048
+        index.upsert(repo)
+        assert next(index.query()).size == 2048
+        index.close()
+
+    def test_details_not_gathered_are_kept(self, index):
+        index.upsert(make_repo('app', branches=('main', 'dev'), tags=('1.0',)))
+        repo = make_repo('app', default_branch='dev')
+        repo.branches = repo.is_empty = repo.tag_count = repo.latest_tag = repo.tags = None
+        index.upsert(repo)
+
+        repo, = index.query()
+        assert (repo.default_branch, repo.is_empty, repo.tag_count, repo.latest_tag) == ('dev', False, 1, '1.0')
+        assert [branch.name for branch in repo.branches] == ['main', 'dev']
+        assert [tag.name for tag in repo.tags] == ['1.0']
+        assert [field for field, *_ in index.get_changes('NullMode', 'app')] == ['default_branch']
+
+    def test_filters(self, index):
+        index.upsert(make_repo('app', branches=('main', 'release')))
+        index.upsert(make_repo('old-fork', archived=True, fork=True))
+        index.upsert(make_repo('fork', fork=True, tags=('1.0',)))
+        index.upsert(make_repo('other', owner='Client'))
+
+        def names(**filters):
+            return [repo.name for repo in index.query(**filters)]
+
+        assert names() == ['other', 'app', 'fork', 'old-fork']
+        assert names(owner='nullmode') == ['app', 'fork', 'old-fork']
+        assert names(archived=True, fork=True) == ['old-fork']
+        assert names(branch='release') == ['app']
+        assert names(tag='1.0') == ['fork']
+        assert names(where="name LIKE '%fork' AND NOT is_archived") == ['fork']
+
+    def test_changes_recorded(self, index):
+        index.upsert(make_repo('app'))
+        index.upsert(make_repo('app', default_branch='trunk', archived=True))
+        index.upsert(make_repo('unchanged'))
+        index.upsert(make_repo('unchanged'))
+
+        assert [repo.name for repo in index.query(changed='default_branch')] == ['app']
+        assert [change[:3] for change in index.get_changes('NullMode', 'app')] == \
+               [('default_branch', 'main', 'trunk'), ('is_archived', 'False', 'True')]
+        with pytest.raises(ValueError):
+            list(index.query(changed='forks_count'))
+
+    def test_tags_kept_when_only_counted(self, index):
+        index.upsert(make_repo('app', tags=('0.0.2', '0.0.1')))
+        repo = make_repo('app')
+        repo.tag_count = 2
+        repo.tags = None
+        index.upsert(repo)
+        assert [tag.name for tag in next(index.query()).tags] == ['0.0.2', '0.0.1']
+
+    def test_failed_tag_listing_keeps_known_tags(self, index):
+        index.upsert(make_repo('app', tags=('0.0.2', '0.0.1')))
+
+        def iter_tags():
+            yield Tag('0.0.3')
+            raise ConnectionError('reset')
+
+        repo = make_repo('app', default_branch='trunk')
+        repo.tags = iter_tags()
+        with pytest.raises(ConnectionError):
+            index.upsert(repo)
+        index.commit()
+
+        repo, = index.query()
+        assert repo.default_branch == 'main'
+        assert [tag.name for tag in repo.tags] == ['0.0.2', '0.0.1']
+
+    def test_triage_and_export(self, index, tmp_path):
+        scm = Github()
+        scm.client = FakeClient([FakeRepo('app', branches=['main', 'dev']), FakeRepo('lib')])
+        triage('NullMode', scm, str(tmp_path / 'triage.csv'), index=index)
+
+        export = str(tmp_path / 'export.csv')
+        query(index, export, branch='dev')
+        rows = TriageFile(export, RowConfiguration()).get_data()
+        assert [(row.name, row.branch_list, row.pull) for row in rows] == [('app', 'main,dev', '')]
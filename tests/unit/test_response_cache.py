@@ -0,0 +1,134 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from scm.cache import ResponseCache
+from scm.connection import get_connection_classes
+
+
+class FakeRestHandler(BaseHTTPRequestHandler):
+    """Serves a JSON body with an ETag and answers matching If-None-Match requests with a 304."""
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('X-RateLimit-Remaining', '4999')
+            self.end_headers()
+            return
+
+        payload = json.dumps({'path': self.path, 'etag': self.etag}).encode()
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('X-RateLimit-Remaining', '4000')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def rest_server():
+    FakeRestHandler.requests = []
+    FakeRestHandler.etag = '"v1"'
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRestHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache' / 'responses.sqlite'))
+    yield cache
+    cache.close()
+
+
+def get(port, path, cache, token='token a'):
+    http_class, _ = get_connection_classes(cache=cache)
+    connection = http_class('127.0.0.1', port)
+    connection.request('GET', path, None, {'Authorization': token})
+    response = connection.getresponse()
+    return response.status, dict(response.getheaders()), json.loads(response.read())
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    def test_revalidated_from_cache(self, rest_server, cache):
+        assert get(rest_server, '/users/NullMode/repos', cache)[0] == 200
+        status, headers, body = get(rest_server, '/users/NullMode/repos', cache)
+
+        assert status == 200
+        assert body == {'path': '/users/NullMode/repos', 'etag': '"v1"'}
+        assert headers['X-RateLimit-Remaining'] == '4999'  # Fresh headers from the 304
+        assert FakeRestHandler.requests[1]['If-None-Match'] == '"v1"'
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_changed_response_replaces_entry(self, rest_server, cache):
+        get(rest_server, '/repos/NullMode/vim/tags', cache)
+        FakeRestHandler.etag = '"v2"'
+        assert get(rest_server, '/repos/NullMode/vim/tags', cache)[2]['etag'] == '"v2"'
+        assert get(rest_server, '/repos/NullMode/vim/tags', cache)[2]['etag'] == '"v2"'
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_entries_keyed_by_token(self, rest_server, cache):
+        get(rest_server, '/user/repos', cache, token='token a')
+        get(rest_server, '/user/repos', cache, token='token b')
+        assert 'If-None-Match' not in FakeRestHandler.requests[1]
+
+    def test_no_conditional_requests_without_cache(self, rest_server):
+        get(rest_server, '/users/NullMode/repos', None)
+        get(rest_server, '/users/NullMode/repos', None)
+        assert all('If-None-Match' not in headers for headers in FakeRestHandler.requests)
+
+    def test_async_engine_revalidated_from_cache(self, rest_server, cache):
+        pytest.importorskip('httpx')
+        from scm.async_github import AsyncGithub
+
+        async def fetch_twice():
+            async with AsyncGithub('token', f"http://127.0.0.1:{rest_server}") as scm:
+                scm.cache = cache
+                return [await scm.get('/users/NullMode/repos', {'per_page': 100}) for _ in range(2)]
+
+        first, second = asyncio.run(fetch_twice())
+        assert second.status_code == 200 and second.json() == first.json()
+        assert second.headers['X-RateLimit-Remaining'] == '4999'
+        assert FakeRestHandler.requests[1]['If-None-Match'] == '"v1"'
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.unit
+class TestResponseCacheEviction:
+    def test_responses_without_validators_not_stored(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'responses.sqlite'))
+        cache.put('key', '/url', {'Content-Type': 'application/json'}, '{}')
+        assert cache.get('key') is None
+
+    def test_expired_entries_evicted(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'responses.sqlite'), max_age=0.05)
+        cache.put('key', '/url', {'ETag': '"a"'}, '{}')
+        time.sleep(0.1)
+        cache.evict()
+        assert cache.get('key') is None
+
+    def test_least_recently_used_evicted_over_size(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'responses.sqlite'), max_size=25)
+        for key in ['a', 'b', 'c']:
+            cache.put(key, f"/{key}", {'ETag': f'"{key}"'}, 'x' * 10)
+            time.sleep(0.01)
+        cache.touch('a')
+        cache.evict()
+
+        assert cache.size() == 20
+        assert cache.get('a') is not None
+        assert cache.get('b') is None
+        assert cache.get('c') is not None
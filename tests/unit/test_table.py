@@ -0,0 +1,14 @@
+import pytest
+
+from utils.table import format_table
+
+
+@pytest.mark.unit
+class TestFormatTable:
+    def test_columns_aligned(self):
+        lines = format_table([('Repo', 'Status', 'Reason'), ('NullMode/app', 'success', ''),
+                              ('NullMode/vim', 'failed', 'Not found')])
+        assert lines == ['Repo          Status   Reason',
+                         '------------  -------  ---------',
+                         'NullMode/app  success',
+                         'NullMode/vim  failed   Not found']
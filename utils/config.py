@@ -1,4 +1,5 @@
 import logging
+import sys
 import toml
 
 logging.basicConfig(level=logging.INFO)
@@ -21,3 +22,66 @@ class CodeTriageConfiguration:
             self.output_file = config_file['output_file']
         except KeyError:
             self.output_file = None
+
+
+class TriageTarget:
+    """
+    A user or organisation to triage, optionally limited to some of its repositories.
+    """
+
+    def __init__(self, scm: str, account: str, repositories: list = None):
+        self.scm = scm
+        self.account = account
+        self.repositories = repositories
+
+
+class TargetConfiguration:
+    """
+    Reads a targets file (see templates/traige_config.toml), a [[github]] table per account to triage with its
+    `account` and optionally the `repositories` to triage instead of all of them, and optionally the `columns`
+    to write for all of them.
+    """
+
+    def __init__(self, targets_file: str, scms: tuple = ('github',)):
+        self.targets_file = targets_file
+        self.scms = scms
+        self.columns = None
+        self.targets = self.read_targets()
+
+    def read_targets(self) -> list:
+        try:
+            with open(self.targets_file, 'r') as file:
+                config_file = toml.load(file)
+        except (OSError, toml.TomlDecodeError) as e:
+            logging.error(f"Unable to read targets file {self.targets_file}: {e}")
+            sys.exit(1)
+
+        columns = config_file.get('columns')
+        if columns is not None and (not isinstance(columns, list) or
+                                    not all(isinstance(column, str) for column in columns)):
+            logging.error(f"columns must be a list of column keys or labels in {self.targets_file}")
+            sys.exit(1)
+        self.columns = columns
+
+        # Targets can also be nested in the [targets] table, i.e. [[targets.github]]
+        tables = dict(config_file)
+        tables.update(config_file.get('targets', {}))
+
+        targets = []
+        for scm in self.scms:
+            for entry in tables.get(scm, []):
+                account = entry.get('account')
+                repositories = entry.get('repositories')
+                if not isinstance(account, str) or not account:
+                    logging.error(f"Every [[{scm}]] target needs an account in {self.targets_file}")
+                    sys.exit(1)
+                if repositories is not None and (not isinstance(repositories, list) or
+                                                 not all(isinstance(name, str) for name in repositories)):
+                    logging.error(f"repositories for {account} must be a list of names in {self.targets_file}")
+                    sys.exit(1)
+                targets.append(TriageTarget(scm, account, repositories))
+
+        if not targets:
+            logging.error(f"No targets found in {self.targets_file}")
+            sys.exit(1)
+        return targets
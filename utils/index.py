@@ -0,0 +1,252 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+from scm.scm import Repository, Branch, Tag
+
+logging.basicConfig(level=logging.INFO)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repositories (
+    owner TEXT NOT NULL COLLATE NOCASE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    default_branch TEXT NOT NULL,
+    is_empty INTEGER NOT NULL,
+    is_archived INTEGER NOT NULL,
+    is_fork INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    forks_count INTEGER NOT NULL,
+    open_issues_count INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    pushed_at TEXT NOT NULL,
+    url TEXT NOT NULL,
+    clone_url TEXT NOT NULL,
+    tag_count INTEGER NOT NULL,
+    latest_tag TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    first_seen TEXT NOT NULL,
+    last_triaged TEXT NOT NULL,
+    PRIMARY KEY (owner, name)
+);
+CREATE INDEX IF NOT EXISTS repositories_flags ON repositories (is_archived, is_fork, is_empty);
+CREATE INDEX IF NOT EXISTS repositories_updated_at ON repositories (updated_at);
+CREATE TABLE IF NOT EXISTS branches (
+    owner TEXT NOT NULL COLLATE NOCASE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    branch TEXT NOT NULL,
+    PRIMARY KEY (owner, name, branch)
+);
+CREATE INDEX IF NOT EXISTS branches_branch ON branches (branch);
+CREATE TABLE IF NOT EXISTS tags (
+    owner TEXT NOT NULL COLLATE NOCASE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (owner, name, tag)
+);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+CREATE TABLE IF NOT EXISTS changes (
+    owner TEXT NOT NULL COLLATE NOCASE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    field TEXT NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    changed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_repository ON changes (owner, name, field);
+CREATE INDEX IF NOT EXISTS changes_field ON changes (field, changed_at);
+"""
+
+# Repository attributes stored in the repositories table, in column order
+COLUMNS = ('owner', 'name', 'default_branch', 'is_empty', 'is_archived', 'is_fork', 'description', 'forks_count',
+           'open_issues_count', 'updated_at', 'pushed_at', 'url', 'clone_url', 'tag_count', 'latest_tag', 'size')
+
+# Columns added to the repositories table since it was created, with their definitions, added to older indexes
+# when they are opened
+ADDED_COLUMNS = {'size': 'INTEGER NOT NULL DEFAULT 0'}
+
+# Attributes whose changes between triages are recorded in the changes table (timestamps and counts change
+# too often to be of interest)
+TRACKED_FIELDS = ('default_branch', 'is_empty', 'is_archived', 'is_fork', 'description', 'url', 'clone_url',
+                  'latest_tag')
+
+# Values stored for details not gathered (None on the Repository) for repositories not already in the index,
+# otherwise the value already stored is kept
+UNGATHERED_DEFAULTS = {'is_empty': False, 'tag_count': 0, 'latest_tag': '', 'size': 0}
+
+# Upserts are committed in batches of this many repositories
+COMMIT_INTERVAL = 50
+
+
+class RepositoryIndex:
+    """
+    Local SQLite store of every repository triaged, across users/organisations and engagements, with their
+    branches, tags and a history of changes to key attributes, so they can be queried and exported to a triage
+    sheet without going back to the SCM.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pending = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        existing = {column for _, column, *_ in self._db.execute("PRAGMA table_info(repositories)")}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE repositories ADD COLUMN {column} {definition}")
+        self._db.commit()
+
+    def upsert(self, repo: Repository) -> None:
+        """
+        Insert or update a repository with its branches and tags, recording changes to the tracked attributes.
+        """
+        # The tag list can be streamed from the SCM, so it is read before taking the lock rather than holding up
+        # other upserts behind its requests, and an error reading it leaves the index as it was
+        tags = list(repo.tags) if repo.tags is not None else None
+        with self._lock:
+            # The repository is stored as a whole or not at all, within the batch of upserts being committed
+            if not self._db.in_transaction:
+                self._db.execute("BEGIN")
+            self._db.execute("SAVEPOINT upsert")
+            try:
+                self.store(repo, tags)
+            except BaseException:
+                self._db.execute("ROLLBACK TO upsert")
+                raise
+            finally:
+                self._db.execute("RELEASE upsert")
+            self.add_pending()
+
+    def store(self, repo: Repository, tags: list = None) -> None:
+        # Callers hold the lock
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        values = [getattr(repo, column) for column in COLUMNS]
+
+        cursor = self._db.execute(f"SELECT {', '.join(COLUMNS)}, first_seen FROM repositories "
+                                  "WHERE owner = ? AND name = ?", (repo.owner, repo.name))
+        previous = cursor.fetchone()
+        first_seen = now
+        if previous:
+            first_seen = previous[-1]
+            previous = dict(zip(COLUMNS, previous))
+            changes = []
+            for field in TRACKED_FIELDS:
+                new = getattr(repo, field)
+                if new is None:
+                    continue  # Not gathered by this triage
+                old = bool(previous[field]) if isinstance(new, bool) else previous[field]
+                if old != new:
+                    changes.append((repo.owner, repo.name, field, str(old), str(new), now))
+            self._db.executemany("INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?)", changes)
+
+        values = [(previous[column] if previous else UNGATHERED_DEFAULTS[column]) if value is None else value
+                  for column, value in zip(COLUMNS, values)]
+
+        # Columns are named as those added to older indexes come after first_seen and last_triaged
+        self._db.execute(f"INSERT OR REPLACE INTO repositories ({', '.join(COLUMNS)}, first_seen, last_triaged) "
+                         f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})", values + [first_seen, now])
+
+        if repo.branches is not None:
+            self._db.execute("DELETE FROM branches WHERE owner = ? AND name = ?", (repo.owner, repo.name))
+            self._db.executemany("INSERT OR IGNORE INTO branches VALUES (?, ?, ?)",
+                                 [(repo.owner, repo.name, branch.name) for branch in repo.branches])
+
+        # Tags are only listed when asked for, otherwise the known tags are kept
+        if tags is not None:
+            self._db.execute("DELETE FROM tags WHERE owner = ? AND name = ?", (repo.owner, repo.name))
+            self._db.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?, ?)",
+                                 [(repo.owner, repo.name, tag.name) for tag in tags])
+
+    def touch(self, owner: str, name: str) -> None:
+        """
+        Mark a repository as triaged again without changes.
+        """
+        with self._lock:
+            self._db.execute("UPDATE repositories SET last_triaged = ? WHERE owner = ? AND name = ?",
+                             (time.strftime("%Y-%m-%d %H:%M:%S"), owner, name))
+            self.add_pending()
+
+    def add_pending(self) -> None:
+        # Callers hold the lock
+        self.pending += 1
+        if self.pending >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self) -> None:
+        # Callers hold the lock
+        self._db.commit()
+        self.pending = 0
+
+    def query(self, owner: str = None, archived: bool = None, fork: bool = None, empty: bool = None,
+              branch: str = None, tag: str = None, changed: str = None, where: str = None):
+        """
+        Yield the repositories matching all the filters given, ordered by owner and name.
+
+        :param branch: Only repositories with this branch.
+        :param tag: Only repositories with this tag.
+        :param changed: Only repositories where this tracked attribute has changed between triages.
+        :param where: An SQL condition on the repositories table, e.g. "forks_count > 10 AND NOT is_fork".
+        :raises ValueError: If changed is not a tracked attribute.
+        """
+        conditions = []
+        params = []
+        for column, value in (('owner', owner), ('is_archived', archived), ('is_fork', fork), ('is_empty', empty)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if branch:
+            conditions.append("EXISTS (SELECT 1 FROM branches b WHERE b.owner = repositories.owner AND "
+                              "b.name = repositories.name AND b.branch = ?)")
+            params.append(branch)
+        if tag:
+            conditions.append("EXISTS (SELECT 1 FROM tags t WHERE t.owner = repositories.owner AND "
+                              "t.name = repositories.name AND t.tag = ?)")
+            params.append(tag)
+        if changed:
+            if changed not in TRACKED_FIELDS:
+                raise ValueError(f"Changes are only recorded for: {', '.join(TRACKED_FIELDS)}")
+            conditions.append("EXISTS (SELECT 1 FROM changes c WHERE c.owner = repositories.owner AND "
+                              "c.name = repositories.name AND c.field = ?)")
+            params.append(changed)
+        if where:
+            conditions.append(f"({where})")
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM repositories"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        sql += " ORDER BY owner, name"
+
+        with self._lock:
+            records = self._db.execute(sql, params).fetchall()
+        for record in records:
+            yield self.get_repository(dict(zip(COLUMNS, record)))
+
+    def get_repository(self, record: dict) -> Repository:
+        key = (record['owner'], record['name'])
+        with self._lock:
+            branches = [Branch(name) for name, in self._db.execute(
+                "SELECT branch FROM branches WHERE owner = ? AND name = ? ORDER BY rowid", key)]
+            tags = [Tag(name) for name, in self._db.execute(
+                "SELECT tag FROM tags WHERE owner = ? AND name = ? ORDER BY rowid", key)]
+        return Repository(record['name'], record['owner'], record['default_branch'], branches,
+                          bool(record['is_empty']), bool(record['is_archived']), bool(record['is_fork']),
+                          record['description'], record['forks_count'], record['updated_at'], record['url'],
+                          record['clone_url'], record['tag_count'], record['latest_tag'], tags,
+                          record['open_issues_count'], record['pushed_at'], record['size'])
+
+    def get_changes(self, owner: str, name: str) -> list:
+        """
+        Return the recorded changes to a repository as (field, old value, new value, changed at) tuples.
+        """
+        with self._lock:
+            return self._db.execute("SELECT field, old_value, new_value, changed_at FROM changes "
+                                    "WHERE owner = ? AND name = ? ORDER BY rowid", (owner, name)).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self.commit()
+            self._db.close()
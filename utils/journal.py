@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+JOURNAL_FILE = '.codetriage-journal.json'
+
+STATE_PENDING = 'pending'
+STATE_IN_PROGRESS = 'in-progress'
+STATE_DONE = 'done'
+STATE_SKIPPED = 'skipped'
+STATE_FAILED = 'failed'
+
+
+class PullJournal:
+    """
+    Records the state of each repository pulled into a destination folder, so an interrupted pull can be
+    resumed: completed repositories are skipped and half-written clones are cleaned up and retried.
+
+    The journal is a JSON file in the destination folder, rewritten atomically on every state change.
+    """
+
+    def __init__(self, destination_folder: str):
+        self.destination_folder = destination_folder
+        self.path = os.path.join(destination_folder, JOURNAL_FILE)
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    self.entries = json.load(file)['repos']
+            except (ValueError, KeyError) as e:
+                logging.warning(f"Ignoring unreadable pull journal {self.path}: {e}")
+
+    def get(self, name: str) -> dict:
+        with self._lock:
+            return dict(self.entries.get(name, {}))
+
+    def set_state(self, name: str, state: str, **fields) -> None:
+        """
+        Update a repository's state (and any other fields such as branch, mode, commit or reason) and save.
+        """
+        with self._lock:
+            entry = self.entries.setdefault(name, {})
+            entry.update(fields, state=state, updated_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+            self.save()
+
+    def add_pending(self, jobs: list) -> None:
+        """
+        Record the jobs of this run as pending, keeping the state of any the journal already knows.
+        """
+        with self._lock:
+            for job in jobs:
+                if job.name not in self.entries:
+                    self.entries[job.name] = {'state': STATE_PENDING, 'branch': job.branch, 'mode': job.mode}
+            self.save()
+
+    def is_done(self, job) -> bool:
+        """
+        Whether the repository was already pulled with the same branch/tag and mode, and is still on disk.
+        """
+        entry = self.get(job.name)
+        return (entry.get('state') == STATE_DONE and entry.get('branch') == job.branch and
+                entry.get('mode') == job.mode and os.path.isdir(os.path.join(self.destination_folder, job.name)))
+
+    def is_known(self, name: str) -> bool:
+        """
+        Whether the journal has a record of starting this repository, i.e. its folder was written by code triage.
+        """
+        return self.get(name).get('state', STATE_PENDING) != STATE_PENDING
+
+    def save(self) -> None:
+        # Callers hold the lock
+        os.makedirs(self.destination_folder, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'repos': self.entries}, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
@@ -1,29 +1,72 @@
 import os
+import copy
 import csv
+import gc
+import importlib
+import json
 import logging
 import sys
+import time
+
+from scm.scm import PULL_MODES, DETAIL_BRANCHES, DETAIL_TAGS, DETAIL_EMPTY
+from scm.profiler import profiler
 
 logging.basicConfig(level=logging.INFO)
 
+# Output rows are streamed to the output file name with this suffix until the output is complete
+PARTIAL_SUFFIX = '.partial'
+# Rows written are flushed to disk every this many rows or seconds, whichever comes first
+FLUSH_ROWS = 20
+FLUSH_INTERVAL = 5.0
+
+# Triage file formats, optional dependencies are needed for XLSX (openpyxl) and Parquet (pyarrow)
+FORMAT_CSV = 'csv'
+FORMAT_XLSX = 'xlsx'
+FORMAT_JSONL = 'jsonl'
+FORMAT_PARQUET = 'parquet'
+FORMATS = [FORMAT_CSV, FORMAT_XLSX, FORMAT_JSONL, FORMAT_PARQUET]
+FORMAT_EXTENSIONS = {
+    '.csv': FORMAT_CSV,
+    '.xlsx': FORMAT_XLSX,
+    '.jsonl': FORMAT_JSONL,
+    '.parquet': FORMAT_PARQUET,
+}
+
+# Last row XLSX dropdowns are applied to (the Excel maximum)
+XLSX_MAX_ROW = 1048576
+# Rows per Parquet row group
+PARQUET_ROW_GROUP = 10000
+
+# Columns filled in by the reviewer rather than gathered from the SCM
+REVIEWER_COLUMNS = ('pull', 'pull_branch_tag', 'pull_mode', 'sparse_paths', 'notes')
+# Columns that can't be disabled, needed to pull (and plan pulling) the repositories in a sheet and to refresh it
+# incrementally
+REQUIRED_COLUMNS = ('name', 'owner') + REVIEWER_COLUMNS + ('last_updated', 'last_pushed', 'clone_url',
+                                                           'default_branch', 'size')
+
 
 class RowHeader:
     """
     A class that represents the structure of a row, including its label, default value, and visibility.
+    Columns that aren't enabled are left out of the sheets written, and the SCM detail (see scm.DETAILS) a
+    column is filled from is only gathered when a column needing it is enabled.
     """
 
-    def __init__(self, label: str, type: any = str, default_value: any = '', hidden: bool = False, enabled: bool = True):
+    def __init__(self, label: str, type: any = str, default_value: any = '', hidden: bool = False, enabled: bool = True,
+                 detail: str = None):
         self.label = label
         self.type = type
         self.default_value = default_value
         self.hidden = hidden
         self.enabled = enabled
+        self.detail = detail
 
 
 class RowConfiguration:
     """
     This class defines the structure for the output, including row labels, default values, and whether
     the row should be hidden.
-    Note: This should match the Row class structure.
+    Row properties are generated from this structure.
     """
 
     # Row configurations (structure only, no actual data)
@@ -31,276 +74,387 @@ class RowConfiguration:
     owner = RowHeader(label='Owner', type=str)
     pull = RowHeader(label='Pull (Y/N)', type=str)
     pull_branch_tag = RowHeader(label='Pull Branch/Tag', type=str)
+    pull_mode = RowHeader(label='Pull Mode', type=str)
+    sparse_paths = RowHeader(label='Sparse Paths', type=str)
     notes = RowHeader(label='Notes', type=str)
-    empty = RowHeader(label='Empty', type=bool, default_value=False)
+    empty = RowHeader(label='Empty', type=bool, default_value=False, detail=DETAIL_EMPTY)
     archived = RowHeader(label='Archived', type=bool, default_value=False)
     fork = RowHeader(label='Fork', type=bool, default_value=False)
     description = RowHeader(label='Description', type=str)
     forks = RowHeader(label='Forks', type=int, default_value=0)
     open_issues = RowHeader(label='Open Issues', type=int, default_value=0)
     last_updated = RowHeader(label='Last Updated')
+    last_pushed = RowHeader(label='Last Pushed')
     url = RowHeader(label='URL')
     clone_url = RowHeader(label='Clone URL')
     default_branch = RowHeader(label='Default Branch')
-    branch_list = RowHeader(label='Branch List')
-    tags = RowHeader(label='Release Tags', type=int, default_value=0)
-    latest_tag = RowHeader(label='Latest Tag', type=str)
+    branch_list = RowHeader(label='Branch List', detail=DETAIL_BRANCHES)
+    tags = RowHeader(label='Release Tags', type=int, default_value=0, detail=DETAIL_TAGS)
+    latest_tag = RowHeader(label='Latest Tag', type=str, detail=DETAIL_TAGS)
+    size = RowHeader(label='Size (KB)', type=int, default_value=0)
+
+    def __init__(self, columns: list = None):
+        # Each configuration has its own copy of the headers, so columns can be enabled per configuration
+        for key in self.get_keys():
+            setattr(self, key, copy.copy(getattr(type(self), key)))
+
+        # Column keys in order with their defaults and types, computed once rather than for every Row
+        self.keys = self.get_keys()
+        self.defaults = tuple(getattr(self, key).default_value for key in self.keys)
+        self.types = tuple(getattr(self, key).type for key in self.keys)
+
+        if columns is not None:
+            self.set_columns(columns)
+        self.update_enabled()
+
+    def set_columns(self, columns: list) -> None:
+        """
+        Enable only the given columns (by key or label) and the REQUIRED_COLUMNS.
+
+        :raises ValueError: If a column is not known.
+        """
+        labels = {getattr(self, key).label.casefold(): key for key in self.keys}
+        selected = set(REQUIRED_COLUMNS)
+        for column in columns:
+            key = column if column in self.keys else labels.get(column.casefold())
+            if key is None:
+                raise ValueError(f"Unknown column '{column}', the columns are: {', '.join(self.keys)}")
+            selected.add(key)
+
+        for key in self.keys:
+            getattr(self, key).enabled = key in selected
+        self.update_enabled()
+
+    def update_enabled(self) -> None:
+        """
+        Work out the enabled columns again after changing the headers' enabled flags.
+        """
+        self.enabled_indexes = tuple(index for index, key in enumerate(self.keys) if getattr(self, key).enabled)
+        self.enabled_keys = tuple(self.keys[index] for index in self.enabled_indexes)
+
+    def get_details(self) -> set:
+        """
+        Return the SCM details needed to fill the enabled columns.
+        """
+        return {getattr(self, key).detail for key in self.enabled_keys if getattr(self, key).detail}
+
+    @classmethod
+    def get_keys(cls) -> tuple:
+        """
+        Return the keys of the columns in the order they appear in the sheet.
+        """
+        return tuple(key for key, value in vars(cls).items() if isinstance(value, RowHeader))
+
+
+class RowColumn:
+    """
+    Property-based access to one column of a Row, validating values against the type from the RowConfiguration.
+    """
+
+    __slots__ = ('key', 'index')
+
+    def __init__(self, key: str, index: int):
+        self.key = key
+        self.index = index
+
+    def __get__(self, row, owner=None):
+        if row is None:
+            return self
+        return row._values[self.index]
+
+    def __set__(self, row, value):
+        expected_type = row._config.types[self.index]
+        if not isinstance(value, expected_type):
+            raise TypeError(f"Expected {expected_type} for '{self.key}', but got {type(value)}")
+        row._values[self.index] = value
 
 
 class Row:
     """
     This class represents a single row of data, using the RowConfiguration to provide property-based
-    access to the row values.
-    Note: This should match the RowConfiguration structure.
+    access to the row values. Values are stored in a list in column order, with a RowColumn property for
+    each column of the RowConfiguration.
     """
 
+    __slots__ = ('_config', '_values')
+
     def __init__(self, row_config: RowConfiguration):
-        # Initialize a dictionary to store actual row values, starting with the defaults from RowConfiguration
-        self._data = {key: getattr(row_config, key).default_value for key in dir(row_config)
-                      if isinstance(getattr(row_config, key), RowHeader)}
+        # Start from the defaults, which the RowConfiguration computes once for all its rows
+        self._values = list(row_config.defaults)
         self._config = row_config  # Store the row configuration to access types
 
-    def _check_type(self, key: str, value: any):
+    @classmethod
+    def from_values(cls, row_config: RowConfiguration, values: list) -> 'Row':
         """
-        Validate that the value being set matches the expected type defined in the RowConfiguration.
+        Create a row from a list of values in column order that are already of the configured types.
         """
-        expected_type = getattr(self._config, key).type
-        if not isinstance(value, expected_type):
-            raise TypeError(f"Expected {expected_type} for '{key}', but got {type(value)}")
-
-    @property
-    def name(self):
-        return self._data['name']
-
-    @name.setter
-    def name(self, value):
-        self._check_type('name', value)
-        self._data['name'] = value
-
-    @property
-    def owner(self):
-        return self._data['owner']
-
-    @owner.setter
-    def owner(self, value):
-        self._check_type('owner', value)
-        self._data['owner'] = value
-
-    @property
-    def pull(self):
-        return self._data['pull']
-
-    @pull.setter
-    def pull(self, value):
-        self._check_type('pull', value)
-        self._data['pull'] = value
-
-    @property
-    def pull_branch_tag(self):
-        return self._data['pull_branch_tag']
-
-    @pull_branch_tag.setter
-    def pull_branch_tag(self, value):
-        self._check_type('pull_branch_tag', value)
-        self._data['pull_branch_tag'] = value
-
-    @property
-    def notes(self):
-        return self._data['notes']
-
-    @notes.setter
-    def notes(self, value):
-        self._check_type('notes', value)
-        self._data['notes'] = value
-
-    @property
-    def empty(self):
-        return self._data['empty']
-
-    @empty.setter
-    def empty(self, value):
-        self._check_type('empty', value)
-        self._data['empty'] = value
-
-    @property
-    def archived(self):
-        return self._data['archived']
-
-    @archived.setter
-    def archived(self, value):
-        self._check_type('archived', value)
-        self._data['archived'] = value
-
-    @property
-    def fork(self):
-        return self._data['fork']
-
-    @fork.setter
-    def fork(self, value):
-        self._check_type('fork', value)
-        self._data['fork'] = value
-
-    @property
-    def description(self):
-        return self._data['description']
-
-    @description.setter
-    def description(self, value):
-        self._check_type('description', value)
-        self._data['description'] = value
-
-    @property
-    def forks(self):
-        return self._data['forks']
-
-    @forks.setter
-    def forks(self, value):
-        self._check_type('forks', value)
-        self._data['forks'] = value
-
-    @property
-    def open_issues(self):
-        return self._data['open_issues']
-
-    @open_issues.setter
-    def open_issues(self, value):
-        self._check_type('open_issues', value)
-        self._data['open_issues'] = value
-
-    @property
-    def last_updated(self):
-        return self._data['last_updated']
-
-    @last_updated.setter
-    def last_updated(self, value):
-        self._check_type('last_updated', value)
-        self._data['last_updated'] = value
-
-    @property
-    def url(self):
-        return self._data['url']
-
-    @url.setter
-    def url(self, value):
-        self._check_type('url', value)
-        self._data['url'] = value
-
-    @property
-    def clone_url(self):
-        return self._data['clone_url']
-
-    @clone_url.setter
-    def clone_url(self, value):
-        self._check_type('clone_url', value)
-        self._data['clone_url'] = value
-
-    @property
-    def default_branch(self):
-        return self._data['default_branch']
-
-    @default_branch.setter
-    def default_branch(self, value):
-        self._check_type('default_branch', value)
-        self._data['default_branch'] = value
-
-    @property
-    def branch_list(self):
-        return self._data['branch_list']
-
-    @branch_list.setter
-    def branch_list(self, value):
-        self._check_type('branch_list', value)
-        self._data['branch_list'] = value
-
-    @property
-    def tags(self):
-        return self._data['tags']
-
-    @tags.setter
-    def tags(self, value):
-        self._check_type('tags', value)
-        self._data['tags'] = value
-
-    @property
-    def latest_tag(self):
-        return self._data['latest_tag']
-
-    @latest_tag.setter
-    def latest_tag(self, value):
-        self._check_type('latest_tag', value)
-        self._data['latest_tag'] = value
+        row = cls.__new__(cls)
+        row._values = values
+        row._config = row_config
+        return row
+
+
+def _add_columns(row_class: type) -> None:
+    """
+    Add a RowColumn property to the row class for each column of the RowConfiguration, in column order.
+    """
+    for index, key in enumerate(RowConfiguration.get_keys()):
+        setattr(row_class, key, RowColumn(key, index))
+
+
+_add_columns(Row)
+
+
+class CsvWriter:
+    """
+    Writes rows to a CSV file. Hidden columns aren't supported in CSV files so every enabled column is written.
+    """
+
+    def __init__(self, path: str, row_config: RowConfiguration):
+        self.file = open(path, mode='w', newline='')
+        self.writer = csv.writer(self.file, dialect='excel')
+        self.writer.writerow([getattr(row_config, key).label for key in row_config.enabled_keys])
+
+    def write_row(self, values: list):
+        self.writer.writerow(values)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesWriter:
+    """
+    Writes each row as a JSON object keyed by column key, one per line.
+    """
+
+    def __init__(self, path: str, row_config: RowConfiguration):
+        self.file = open(path, mode='w', encoding='utf-8')
+        self.keys = row_config.enabled_keys
+
+    def write_row(self, values: list):
+        self.file.write(json.dumps(dict(zip(self.keys, values))))
+        self.file.write('\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxWriter:
+    """
+    Writes rows to an Excel workbook with a frozen header row, hidden columns hidden and dropdowns for the Pull
+    and Pull Mode columns. Rows are streamed to a temporary file by openpyxl and the workbook is only complete
+    once closed.
+    """
+
+    def __init__(self, path: str, row_config: RowConfiguration):
+        openpyxl = import_optional('openpyxl', 'XLSX', 'xlsx')
+        from openpyxl.utils import get_column_letter
+        from openpyxl.worksheet.datavalidation import DataValidation
+
+        self.path = path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Triage')
+        self.sheet.freeze_panes = 'A2'
+
+        dropdowns = {'pull': ['Y', 'N'], 'pull_mode': PULL_MODES}
+        for index, key in enumerate(row_config.enabled_keys, start=1):
+            column = get_column_letter(index)
+            if getattr(row_config, key).hidden:
+                self.sheet.column_dimensions[column].hidden = True
+            if key in dropdowns:
+                validation = DataValidation(type='list', formula1=f'"{",".join(dropdowns[key])}"', allow_blank=True)
+                validation.add(f"{column}2:{column}{XLSX_MAX_ROW}")
+                self.sheet.data_validations.append(validation)
+
+        self.sheet.append([getattr(row_config, key).label for key in row_config.enabled_keys])
+
+    def write_row(self, values: list):
+        self.sheet.append(values)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class ParquetWriter:
+    """
+    Writes rows to a Parquet file, buffering them into a row group per flush.
+    """
+
+    def __init__(self, path: str, row_config: RowConfiguration):
+        self.pyarrow = import_optional('pyarrow', 'Parquet', 'parquet')
+        import pyarrow.parquet
+
+        types = {str: self.pyarrow.string(), bool: self.pyarrow.bool_(), int: self.pyarrow.int64()}
+        self.schema = self.pyarrow.schema([(row_config.keys[index], types[row_config.types[index]])
+                                           for index in row_config.enabled_indexes])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.buffer = []
+
+    def write_row(self, values: list):
+        self.buffer.append(values)
+
+    def flush(self):
+        if len(self.buffer) >= PARQUET_ROW_GROUP:
+            self.write_buffer()
+
+    def write_buffer(self):
+        if self.buffer:
+            columns = [list(column) for column in zip(*self.buffer)]
+            self.writer.write_batch(self.pyarrow.record_batch(columns, schema=self.schema))
+            self.buffer = []
+
+    def close(self):
+        self.write_buffer()
+        self.writer.close()
+
+
+def import_optional(module: str, format_name: str, extra: str):
+    """
+    Import an optional dependency used for a file format, exiting with how to install it if it's missing.
+    """
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        logging.error(f"{format_name} files require {module}, install it with: poetry install --extras {extra}")
+        sys.exit(1)
+
+
+def get_format(file_path: str, format: str = None) -> str:
+    """
+    Return the format given, or the format matching the file extension (CSV if it isn't known).
+    """
+    if format:
+        return format
+    return FORMAT_EXTENSIONS.get(os.path.splitext(file_path)[1].casefold(), FORMAT_CSV)
 
 
 class Output:
     """
-    The Output class contains a list of rows (data) and holds a reference to the RowConfiguration to
-    know how to deal with each column. It includes methods for writing out to CSV.
+    The Output class writes rows to the output file as they are added, holding a reference to the
+    RowConfiguration to know how to deal with each column. Rows are streamed to a .partial file next to
+    the output file, flushed periodically so a partial sheet survives a crash (for CSV and JSON Lines,
+    XLSX and Parquet files are only readable once complete), and it replaces the output file once
+    write() is called.
     """
 
-    def __init__(self, row_config: RowConfiguration, output_file: str, format: str = 'csv'):
+    def __init__(self, row_config: RowConfiguration, output_file: str, format: str = None, overwrite: bool = False,
+                 flush_rows: int = FLUSH_ROWS, flush_interval: float = FLUSH_INTERVAL):
         self.row_config = row_config  # Store the row configuration
         self.output_file = output_file
-        self.output_file_handle = None
-        self.format = format
-        self.rows = []  # List to store rows of data
+        self.partial_file = f"{output_file}{PARTIAL_SUFFIX}"
+        self.format = get_format(output_file, format)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.row_count = 0
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+        # Positions of the values written from each row, None when every column is enabled
+        self.indexes = None
+        if len(row_config.enabled_indexes) < len(row_config.keys):
+            self.indexes = row_config.enabled_indexes
+
+        if self.format not in WRITERS:
+            logging.error(f"Unsupported output format: {self.format}")
+            sys.exit(1)
 
         # Pre-checks on the output file, does it already exist or is it open?
-        if os.path.exists(output_file):
+        if os.path.exists(output_file) and not overwrite:
             overwrite = input(f"File {output_file} already exists. Overwrite? (Y/N): ")
             if overwrite.casefold() not in {'y', 'yes'}:
                 logging.info("Exiting...")
                 sys.exit(1)
 
         try:
-            self.output_file_handle = open(output_file, mode='w', newline='')
+            if os.path.exists(output_file):
+                open(output_file, mode='a').close()
+            self.writer = WRITERS[self.format](self.partial_file, row_config)
         except PermissionError:
             logging.error(f"Permission denied to write to file: {output_file} - is it open?")
             sys.exit(1)
 
     def add_row(self, row: Row):
         """
-        Add a new Row to the list of rows.
+        Write a new Row to the output file, flushing every flush_rows rows or flush_interval seconds.
         """
-        self.rows.append(row)
-
+        if self.indexes is None:
+            self.writer.write_row(row._values)  # Already in column order
+        else:
+            values = row._values
+            self.writer.write_row([values[index] for index in self.indexes])
+        self.row_count += 1
+        self.unflushed += 1
+        profiler.count('output.rows')
+        if self.unflushed >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    @profiler.timed('output.flush')
+    def flush(self):
+        self.writer.flush()
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+
+    @profiler.timed('output.write')
     def write(self):
         """
-        Write the current rows to the output file, based on the format.
+        Finish writing the output file, replacing any previous one with the rows written.
         """
-        if self.format == 'csv':
-            self.write_csv()
-        else:
-            logging.error(f"Unsupported output format: {self.format}")
+        self.writer.close()
+        try:
+            os.replace(self.partial_file, self.output_file)
+        except PermissionError:
+            logging.error(f"Permission denied to write to file: {self.output_file} - is it open? "
+                          f"The rows written are in {self.partial_file}")
+            sys.exit(1)
 
-    def write_csv(self):
-        """
-        Write the current rows to a CSV file, including only visible (non-hidden) columns.
-        """
-        # Get visible headers and their corresponding keys from the row configuration
-        # Note: hidden not supported in csv files
-        headers = [key for key, value in vars(self.row_config.__class__).items() if isinstance(value, RowHeader)]
-        header_labels = [getattr(self.row_config, key).label for key in headers]
 
-        writer = csv.writer(self.output_file_handle, dialect='excel')
-        writer.writerow(header_labels)
+def convert_bool(value: str) -> bool:
+    return value.upper() == 'TRUE'
+
 
-        # Write each row of data
-        for row in self.rows:
-            row_data = [getattr(row, key) for key in headers]
-            writer.writerow(row_data)
+def convert_int(value: str) -> int:
+    return int(value) if value else 0
 
-        self.output_file_handle.flush()
-        self.output_file_handle.close()
+
+# Converters from CSV values to each column type, CSV values are already strings so need no conversion
+TYPE_CONVERSIONS = {
+    bool: convert_bool,
+    int: convert_int,
+}
+
+
+def coerce(value: any, expected_type: type, default: any) -> any:
+    """
+    Convert a value read from a typed file format (JSON Lines, XLSX, Parquet) to the column type, e.g. when a
+    spreadsheet application stored a number in a text column.
+    """
+    if value is None:
+        return default
+    if type(value) is expected_type:
+        return value
+    if expected_type is str:
+        return str(value)
+    return TYPE_CONVERSIONS[expected_type](str(value))
 
 
 class TriageFile:
     """
-    This class is responsible for loading and parsing the triage file, which contains a list of repositories
+    This class is responsible for loading and parsing the triage file, which contains a list of repositories.
+
+    With lazy, the file is not loaded up front, iter_data() reads the rows from the file as they are used.
     """
 
-    def __init__(self, file_path: str, row_config: RowConfiguration, format: str = 'csv'):
+    def __init__(self, file_path: str, row_config: RowConfiguration, format: str = None, lazy: bool = False):
         self.file_path = file_path
-        self.format = format
+        self.format = get_format(file_path, format)
         self.row_config = row_config
         self.rows = []
 
@@ -309,54 +463,131 @@ class TriageFile:
             logging.error(f"File {file_path} does not exist.")
             sys.exit(1)
 
-        # Load the data from the file
-        if format == 'csv':
-            self.load_csv()
-        else:
-            logging.error(f"Unsupported file format: {format}")
+        self.readers = {
+            FORMAT_CSV: self.iter_csv,
+            FORMAT_JSONL: self.iter_jsonl,
+            FORMAT_XLSX: self.iter_xlsx,
+            FORMAT_PARQUET: self.iter_parquet,
+        }
+        if self.format not in self.readers:
+            logging.error(f"Unsupported file format: {self.format}")
             sys.exit(1)
 
-    def load_csv(self):
+        # Load the data from the file
+        if not lazy:
+            self.load()
+
+    def load(self):
+        """
+        Load all the rows from the file.
+        """
+        # Rows hold no reference cycles, so pause the cyclic garbage collector rather than let it
+        # repeatedly scan the growing list of rows
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.rows = list(self.readers[self.format]())
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    @profiler.timed('triage_file.read_csv')
+    def iter_csv(self):
         """
-        Load data from a CSV file, using the row configuration to map columns to properties.
+        Read the rows of a CSV file one at a time. The column each CSV column is stored in and how its values
+        are converted is worked out once from the header row, then applied to every row.
         """
         with open(self.file_path, 'r', newline='', encoding='utf-8') as file:
             reader = csv.reader(file)
-            headers = next(reader)  # Read the CSV header row
-
-            # Create a mapping from the header label (in CSV) to the row configuration keys
-            header_map = {getattr(self.row_config, key).label: key for key in vars(self.row_config.__class__) if
-                          isinstance(getattr(self.row_config, key), RowHeader)}
-
-            # Read each row and create a new Row object
-            for row in reader:
-                new_row = Row(self.row_config)
-                for header, value in zip(headers, row):
-                    if header in header_map:
-                        key = header_map[header]
-
-                        # Retrieve the expected type from the row configuration
-                        expected_type = getattr(self.row_config, key).type
-
-                        # Define a mapping for type conversions
-                        type_conversions = {
-                            bool: lambda v: v.upper() == 'TRUE' if v else False,
-                            str: lambda v: v if v else "",
-                            int: lambda v: int(v) if v else 0,
-                        }
-
-                        try:
-                            # Perform the conversion using the type_conversions dictionary
-                            new_value = type_conversions.get(expected_type, expected_type)(value)
-                        except ValueError as e:
-                            logging.error(f"Error converting value '{value}' to type {expected_type}: {e} for '{key}'")
-
-                        try:
-                            setattr(new_row, key, new_value)
-                        except TypeError as e:
-                            logging.error(f"Error setting value '{value}' for '{key}': {e}")
-
-                self.rows.append(new_row)
+            headers = next(reader, [])  # Read the CSV header row
+
+            # Map the header labels (in CSV) to the row configuration columns, ignoring unknown headers
+            label_map = {getattr(self.row_config, key).label: index for index, key in enumerate(self.row_config.keys)}
+            sources = [source for source, header in enumerate(headers) if header in label_map]
+            targets = [label_map[headers[source]] for source in sources]
+            conversions = [(target, self.row_config.keys[target], TYPE_CONVERSIONS[self.row_config.types[target]])
+                           for target in targets if self.row_config.types[target] in TYPE_CONVERSIONS]
+
+            defaults = self.row_config.defaults
+            # Whether the sheet has every column in order with nothing else, as written by code triage
+            in_order = targets == list(range(len(defaults))) and sources == targets
+            width = len(defaults)
+
+            for record in reader:
+                if in_order and len(record) == width:
+                    values = record
+                else:
+                    values = list(defaults)
+                    for source, target in zip(sources, targets):
+                        if source < len(record):
+                            values[target] = record[source]
+
+                for target, key, convert in conversions:
+                    if not isinstance(values[target], str):
+                        continue  # A default for a column missing from this record
+                    try:
+                        values[target] = convert(values[target])
+                    except ValueError as e:
+                        logging.error(f"Error converting value '{values[target]}' to type "
+                                      f"{self.row_config.types[target]}: {e} for '{key}'")
+                        values[target] = defaults[target]
+
+                yield Row.from_values(self.row_config, values)
+
+    @profiler.timed('triage_file.read_jsonl')
+    def iter_jsonl(self):
+        """
+        Read the rows of a JSON Lines file, one JSON object keyed by column key per line.
+        """
+        with open(self.file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield self.build_row(json.loads(line))
+
+    @profiler.timed('triage_file.read_xlsx')
+    def iter_xlsx(self):
+        """
+        Read the rows of the first sheet of an Excel workbook, with the column labels in the first row.
+        """
+        openpyxl = import_optional('openpyxl', 'XLSX', 'xlsx')
+        workbook = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            records = workbook.worksheets[0].iter_rows(values_only=True)
+            label_map = {getattr(self.row_config, key).label: key for key in self.row_config.keys}
+            keys = [label_map.get(label) for label in next(records, ())]
+            for record in records:
+                if any(value is not None for value in record):
+                    yield self.build_row({key: value for key, value in zip(keys, record) if key})
+        finally:
+            workbook.close()
+
+    @profiler.timed('triage_file.read_parquet')
+    def iter_parquet(self):
+        """
+        Read the rows of a Parquet file a batch at a time, with a column per column key.
+        """
+        import_optional('pyarrow', 'Parquet', 'parquet')
+        import pyarrow.parquet
+
+        parquet_file = pyarrow.parquet.ParquetFile(self.file_path)
+        columns = [key for key in self.row_config.keys if key in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(columns=columns):
+            for record in batch.to_pylist():
+                yield self.build_row(record)
+
+    def build_row(self, record: dict) -> Row:
+        """
+        Create a row from a record keyed by column key, as read from a typed file format.
+        """
+        values = []
+        for key, expected_type, default in zip(self.row_config.keys, self.row_config.types, self.row_config.defaults):
+            value = record.get(key)
+            try:
+                values.append(coerce(value, expected_type, default))
+            except ValueError as e:
+                logging.error(f"Error converting value '{value}' to type {expected_type}: {e} for '{key}'")
+                values.append(default)
+        return Row.from_values(self.row_config, values)
 
     def get_data(self):
         """
@@ -364,5 +595,16 @@ class TriageFile:
         """
         return self.rows
 
+    def iter_data(self):
+        """
+        Return the rows one at a time, read from the file if it hasn't been loaded.
+        """
+        return iter(self.rows) if self.rows else self.readers[self.format]()
 
 
+WRITERS = {
+    FORMAT_CSV: CsvWriter,
+    FORMAT_JSONL: JsonLinesWriter,
+    FORMAT_XLSX: XlsxWriter,
+    FORMAT_PARQUET: ParquetWriter,
+}
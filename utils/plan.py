@@ -0,0 +1,153 @@
+from scm.scm import PULL_MODE_FULL, PULL_MODE_SINGLE_BRANCH, PULL_MODE_SHALLOW, PULL_MODE_TAG, PULL_MODE_ARCHIVE
+from utils.table import format_table
+
+import heapq
+import os
+import shutil
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# What to do when a plan doesn't fit in the free space of the destination
+ON_NO_SPACE_REFUSE = 'refuse'  # Pull nothing
+ON_NO_SPACE_TRIM = 'trim'  # Leave out the largest repositories until the rest fit
+ON_NO_SPACE = (ON_NO_SPACE_REFUSE, ON_NO_SPACE_TRIM)
+
+# Bytes left free in the destination after the pull, for everything else on the disk
+DEFAULT_MIN_FREE = 1024 ** 3
+
+# Disk space a pull takes up relative to the repository size the SCM reports (its packed history). Clones check
+# out a working tree next to their history, which is about as large again, while shallow clones and archives are
+# mostly the working tree
+MODE_FACTORS = {
+    PULL_MODE_FULL: 2.0,
+    PULL_MODE_SINGLE_BRANCH: 2.0,
+    PULL_MODE_TAG: 2.0,
+    PULL_MODE_SHALLOW: 1.0,
+    PULL_MODE_ARCHIVE: 1.0,
+}
+# Partial clones leave out the contents of the files not checked out, keeping little more than the working tree
+PARTIAL_CLONE_FACTOR = 1.0
+
+
+def estimate_size(job) -> int:
+    """
+    Estimate the bytes a pull job will take up on disk from the repository size, 0 if the size isn't known.
+    """
+    factor = MODE_FACTORS.get(job.mode, max(MODE_FACTORS.values()))
+    if job.filter or job.sparse_paths:
+        factor = min(factor, PARTIAL_CLONE_FACTOR)
+    return int(job.size * 1024 * factor)
+
+
+def get_free_space(folder: str) -> int:
+    """
+    Return the bytes free on the disk a folder is (or will be created) on.
+    """
+    folder = os.path.abspath(folder)
+    while not os.path.exists(folder):
+        folder = os.path.dirname(folder)
+    return shutil.disk_usage(folder).free
+
+
+def get_makespan(estimates: list, workers: int) -> int:
+    """
+    Return the largest share of the estimates a worker gets when each one is handed to the next free worker in
+    the order given, the bytes the slowest worker has to pull.
+    """
+    loads = [0] * max(1, workers)
+    for estimate in estimates:
+        heapq.heapreplace(loads, loads[0] + estimate)
+    return max(loads)
+
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+class PullPlan:
+    """
+    The pull jobs to run, largest first so the big clones start early and the small ones fill in around them
+    rather than one large clone being left running on its own at the end, with the disk space they should take.
+
+    Jobs for repositories already in the destination (to sync, or pulled by an earlier run) are expected to take
+    no more space. With trim, the largest jobs are left out (in skipped) until the rest fit in the free space.
+    """
+
+    def __init__(self, jobs: list, destination_folder: str, workers: int, min_free: int = DEFAULT_MIN_FREE,
+                 on_no_space: str = ON_NO_SPACE_REFUSE):
+        self.destination_folder = destination_folder
+        self.workers = workers
+        self.min_free = min_free
+        self.free = get_free_space(destination_folder)
+        self.existing = {job.name for job in jobs if os.path.exists(os.path.join(destination_folder, job.name))}
+        self.unknown = [job for job in jobs if not job.size and job.name not in self.existing]
+        self.estimates = {job.name: 0 if job.name in self.existing else estimate_size(job) for job in jobs}
+
+        # Sorting is stable, so jobs of the same size (e.g. unknown) keep their order
+        self.jobs = sorted(jobs, key=lambda job: self.estimates[job.name], reverse=True)
+        self.skipped = []
+        if on_no_space == ON_NO_SPACE_TRIM and not self.fits():
+            # Keep the most repositories that fit, the smallest ones
+            available = self.available
+            self.jobs.reverse()
+            for index, job in enumerate(self.jobs):
+                available -= self.estimates[job.name]
+                if available < 0:
+                    self.jobs, self.skipped = self.jobs[:index], self.jobs[index:]
+                    break
+            self.jobs.reverse()
+            self.skipped.reverse()
+
+    @property
+    def total(self) -> int:
+        """
+        The bytes the jobs to run are estimated to take up.
+        """
+        return sum(self.estimates[job.name] for job in self.jobs)
+
+    @property
+    def available(self) -> int:
+        """
+        The bytes that can be pulled while leaving min_free free.
+        """
+        return max(0, self.free - self.min_free)
+
+    @property
+    def makespan(self) -> int:
+        return get_makespan([self.estimates[job.name] for job in self.jobs], self.workers)
+
+    def fits(self) -> bool:
+        return self.total <= self.available
+
+    def format(self) -> str:
+        """
+        Format the jobs to run in the order they will be started, followed by the totals.
+        """
+        rows = [('Repo', 'Branch/Tag', 'Mode', 'Estimate')]
+        for job in self.jobs:
+            if job.name in self.existing:
+                estimate = 'on disk'
+            else:
+                estimate = format_bytes(self.estimates[job.name]) if job.size else 'unknown'
+            rows.append((f"{job.owner}/{job.name}", job.branch, job.mode, estimate))
+
+        lines = format_table(rows)
+
+        lines.append(f"{len(self.jobs)} repos, {format_bytes(self.total)} estimated, "
+                     f"{format_bytes(self.available)} available ({format_bytes(self.free)} free less "
+                     f"{format_bytes(self.min_free)} kept free), {format_bytes(self.makespan)} for the busiest of "
+                     f"{self.workers} workers")
+        if self.unknown:
+            lines.append(f"{len(self.unknown)} repos of unknown size, not included in the estimate")
+        if self.skipped:
+            lines.append(f"{len(self.skipped)} repos left out to fit, {format_bytes(self.get_skipped_total())}: "
+                         f"{', '.join(job.name for job in self.skipped)}")
+        return '\n'.join(line.rstrip() for line in lines)
+
+    def get_skipped_total(self) -> int:
+        return sum(self.estimates[job.name] for job in self.skipped)
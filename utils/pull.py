@@ -0,0 +1,171 @@
+from concurrent.futures import ThreadPoolExecutor
+from scm.scm import PullError, PullSkipped, PULL_MODE_FULL, DEFAULT_SHALLOW_DEPTH
+from scm.archive import read_archive_file
+from utils.table import format_table
+from utils.journal import STATE_PENDING, STATE_IN_PROGRESS, STATE_DONE, STATE_SKIPPED, STATE_FAILED
+
+import os
+import shutil
+import time
+import logging
+import pygit2
+
+logging.basicConfig(level=logging.INFO)
+
+PULL_SUCCESS = 'success'
+PULL_SKIPPED = 'skipped'
+PULL_FAILED = 'failed'
+PULL_EXISTING = 'existing'  # Already pulled by an earlier run
+PULL_UPDATED = 'updated'  # Synced to a new commit
+PULL_UP_TO_DATE = 'up-to-date'  # Synced, no new commits
+
+# Journal states of folders that can be synced, an interrupted clone is removed and cloned again. Folders
+# the journal doesn't know (e.g. pulled before journals were kept) are synced if they are a clone of the repo
+SYNCABLE_STATES = (STATE_PENDING, STATE_DONE, STATE_SKIPPED)
+
+# Number of repositories cloned at once in pull mode
+DEFAULT_PULL_JOBS = 4
+
+
+class PullJob:
+    """
+    A repository to pull, the branch or tag to check out and how much of it to fetch.
+    """
+
+    def __init__(self, owner: str, name: str, clone_url: str, branch: str, mode: str = PULL_MODE_FULL,
+                 depth: int = DEFAULT_SHALLOW_DEPTH, filter: str = None, sparse_paths: list = None, size: int = 0):
+        self.owner = owner
+        self.name = name
+        self.clone_url = clone_url
+        self.branch = branch
+        self.mode = mode
+        self.depth = depth
+        self.filter = filter  # Partial clone filter (PULL_FILTERS), None to clone every object
+        self.sparse_paths = sparse_paths  # Paths to check out, None for all of them
+        self.size = size  # Kilobytes as reported by the SCM, 0 if not known
+
+
+class PullResult:
+    """
+    The outcome of a PullJob, with the reason it was skipped or failed.
+    """
+
+    def __init__(self, job: PullJob, status: str, reason: str = '', duration: float = 0.0, old_commit: str = '',
+                 new_commit: str = ''):
+        self.job = job
+        self.status = status
+        self.reason = reason
+        self.duration = duration
+        self.old_commit = old_commit
+        self.new_commit = new_commit
+
+
+def get_head_commit(repo_path: str) -> str:
+    """
+    Return the commit checked out in a repository (or an archive snapshot was downloaded from), or an empty
+    string if there is none (e.g. an empty repository).
+    """
+    snapshot = read_archive_file(repo_path)
+    if snapshot:
+        return snapshot['commit']
+    try:
+        return str(pygit2.Repository(repo_path).head.target)
+    except (pygit2.GitError, KeyError):
+        return ''
+
+
+def pull_one(scm, job: PullJob, destination_folder: str, journal=None, sync: bool = False) -> PullResult:
+    """
+    Pull a single repository, capturing any error in the result so it can't stop the other pulls.
+
+    With a journal, repositories already pulled are skipped and the folders of interrupted or failed pulls
+    are removed before trying again. With sync, repositories already on disk are updated in place instead.
+    """
+    repo_path = os.path.join(destination_folder, job.name)
+    if journal:
+        if journal.is_done(job) and not sync:
+            commit = journal.get(job.name).get('commit', '')
+            logging.info(f"Already pulled {job.name} at {commit or 'empty'}, skipping")
+            return PullResult(job, PULL_EXISTING, f"Pulled by an earlier run at {commit}" if commit else '')
+
+        syncable = sync and journal.get(job.name).get('state', STATE_PENDING) in SYNCABLE_STATES
+        if os.path.exists(repo_path) and not syncable:
+            if not journal.is_known(job.name):
+                reason = f"{repo_path} already exists and was not pulled by code triage"
+                logging.error(reason)
+                return PullResult(job, PULL_FAILED, reason)
+            logging.info(f"Removing incomplete pull of {job.name}...")
+            shutil.rmtree(repo_path)
+
+        if not os.path.exists(repo_path):
+            journal.set_state(job.name, STATE_IN_PROGRESS, branch=job.branch, mode=job.mode, commit='', reason='')
+
+    syncing = sync and os.path.exists(repo_path)
+    start = time.monotonic()
+    old_commit = new_commit = ''
+    try:
+        if syncing:
+            logging.info(f"Updating repo: {job.name}...")
+            old_commit, new_commit = scm.sync_repo(job.owner, job.name, job.clone_url, job.branch,
+                                                   destination_folder, job.mode, job.depth, filter=job.filter,
+                                                   sparse_paths=job.sparse_paths)
+            if old_commit == new_commit:
+                status, reason = PULL_UP_TO_DATE, f"At {new_commit[:7]}"
+            else:
+                status, reason = PULL_UPDATED, f"{old_commit[:7] or 'empty'} -> {new_commit[:7]}"
+            logging.info(f"{job.name}: {reason}")
+        else:
+            logging.info(f"Pulling repo: {job.name}...")
+            scm.pull_repo(job.owner, job.name, job.clone_url, job.branch, destination_folder, job.mode, job.depth,
+                          filter=job.filter, sparse_paths=job.sparse_paths)
+            status, reason = PULL_SUCCESS, ''
+        state = STATE_DONE
+    except PullSkipped as e:
+        logging.warning(f"{e} - skipping")
+        status, reason, state = PULL_SKIPPED, str(e), STATE_SKIPPED
+    except PullError as e:
+        logging.error(str(e))
+        status, reason, state = PULL_FAILED, str(e), STATE_FAILED
+    except Exception as e:
+        logging.exception(f"Unexpected error pulling {job.name}")
+        status, reason, state = PULL_FAILED, f"{type(e).__name__}: {e}", STATE_FAILED
+
+    if journal and not (syncing and state != STATE_DONE):
+        # A failed update leaves the folder as it was, so its journal entry stays as it was too
+        commit = get_head_commit(repo_path) if state == STATE_DONE else ''
+        journal.set_state(job.name, state, branch=job.branch, mode=job.mode, commit=commit,
+                          reason=reason if state != STATE_DONE else '')
+
+    return PullResult(job, status, reason, time.monotonic() - start, old_commit, new_commit)
+
+
+def run_pull_jobs(scm, jobs: list, destination_folder: str, workers: int = DEFAULT_PULL_JOBS, journal=None,
+                  sync: bool = False) -> list:
+    """
+    Pull (or with sync, update) the repositories with a pool of workers, returning a PullResult per job in the
+    order given.
+    """
+    if journal:
+        journal.add_pending(jobs)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda job: pull_one(scm, job, destination_folder, journal, sync), jobs))
+
+
+def format_summary(results: list) -> str:
+    """
+    Format the pull results as a table, followed by the totals for each status.
+    """
+    rows = [('Repo', 'Branch/Tag', 'Mode', 'Status', 'Time', 'Reason')]
+    for result in results:
+        rows.append((f"{result.job.owner}/{result.job.name}", result.job.branch, result.job.mode, result.status,
+                     f"{result.duration:.1f}s", result.reason))
+
+    lines = format_table(rows)
+
+    totals = {status: sum(1 for result in results if result.status == status)
+              for status in (PULL_SUCCESS, PULL_EXISTING, PULL_UPDATED, PULL_UP_TO_DATE, PULL_SKIPPED, PULL_FAILED)}
+    # Only mention the sync statuses when repositories were synced
+    lines.append(', '.join(f"{count} {status}" for status, count in totals.items()
+                           if count or status not in (PULL_UPDATED, PULL_UP_TO_DATE)))
+    return '\n'.join(line.rstrip() for line in lines)
@@ -0,0 +1,9 @@
+def format_table(rows: list) -> list:
+    """
+    Format rows of strings as the lines of a table, the first row being the header, underlined, and each column
+    padded to its widest value.
+    """
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    lines = ['  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return lines